@@ -0,0 +1,53 @@
+"""add audit event keyset indexes
+
+Revision ID: a41fb3b80a11
+Revises: ffaa0130cdeb
+Create Date: 2026-10-18 16:05:12.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a41fb3b80a11"  # pragma: allowlist secret
+down_revision = "ffaa0130cdeb"  # pragma: allowlist secret
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "audit_events_time_created_id",
+        "audit_events",
+        ["time_created", "id"],
+        unique=False,
+    )
+    # these lead with the columns of the indexes they replace
+    op.create_index(
+        "audit_events_portfolio_time_created_id",
+        "audit_events",
+        ["portfolio_id", "time_created", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "audit_events_application_time_created_id",
+        "audit_events",
+        ["application_id", "time_created", "id"],
+        unique=False,
+    )
+    op.drop_index("ix_audit_events_portfolio_id", table_name="audit_events")
+    op.drop_index("ix_audit_events_application_id", table_name="audit_events")
+
+
+def downgrade():
+    op.create_index(
+        "ix_audit_events_application_id",
+        "audit_events",
+        ["application_id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_audit_events_portfolio_id", "audit_events", ["portfolio_id"], unique=False
+    )
+    op.drop_index("audit_events_application_time_created_id", table_name="audit_events")
+    op.drop_index("audit_events_portfolio_time_created_id", table_name="audit_events")
+    op.drop_index("audit_events_time_created_id", table_name="audit_events")
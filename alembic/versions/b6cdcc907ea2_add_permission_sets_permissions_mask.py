@@ -0,0 +1,79 @@
+"""add permission_sets permissions_mask
+
+Revision ID: b6cdcc907ea2
+Revises: 3bd8552f1c57
+Create Date: 2026-10-18 06:38:26.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "b6cdcc907ea2"  # pragma: allowlist secret
+down_revision = "3bd8552f1c57"  # pragma: allowlist secret
+branch_labels = None
+depends_on = None
+
+
+# atst.models.permissions.PERMISSION_BITS as of this revision
+PERMISSION_BITS = [
+    "view_audit_log",
+    "view_ccpo_user",
+    "create_ccpo_user",
+    "edit_ccpo_user",
+    "delete_ccpo_user",
+    "view_portfolio",
+    "view_application",
+    "edit_application",
+    "create_application",
+    "delete_application",
+    "view_application_member",
+    "edit_application_member",
+    "delete_application_member",
+    "create_application_member",
+    "view_environment",
+    "edit_environment",
+    "create_environment",
+    "delete_environment",
+    "assign_environment_member",
+    "view_application_activity_log",
+    "view_portfolio_funding",
+    "create_task_order",
+    "view_task_order_details",
+    "edit_task_order_details",
+    "view_portfolio_reports",
+    "view_portfolio_admin",
+    "view_portfolio_name",
+    "edit_portfolio_name",
+    "view_portfolio_users",
+    "edit_portfolio_users",
+    "create_portfolio_users",
+    "view_portfolio_activity_log",
+    "view_portfolio_poc",
+    "edit_portfolio_poc",
+    "archive_portfolio",
+]
+
+
+def upgrade():
+    op.add_column(
+        "permission_sets",
+        sa.Column(
+            "permissions_mask", sa.BigInteger(), server_default="0", nullable=False
+        ),
+    )
+
+    conn = op.get_bind()
+    for bit, permission in enumerate(PERMISSION_BITS):
+        conn.execute(
+            """
+            UPDATE permission_sets
+            SET permissions_mask = permissions_mask | (1::bigint << %s)
+            WHERE %s = ANY(permissions)
+            """,
+            [bit, permission],
+        )
+
+
+def downgrade():
+    op.drop_column("permission_sets", "permissions_mask")
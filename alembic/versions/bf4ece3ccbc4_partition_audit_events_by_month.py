@@ -0,0 +1,180 @@
+"""partition audit events by month
+
+Revision ID: bf4ece3ccbc4
+Revises: a41fb3b80a11
+Create Date: 2026-10-18 17:40:03.000000
+
+"""
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "bf4ece3ccbc4"  # pragma: allowlist secret
+down_revision = "a41fb3b80a11"  # pragma: allowlist secret
+branch_labels = None
+depends_on = None
+
+# partitions are created this many months ahead
+MONTHS_AHEAD = 3
+
+INDEXES = [
+    ("audit_events_time_created_id", ["time_created", "id"], False),
+    (
+        "audit_events_portfolio_time_created_id",
+        ["portfolio_id", "time_created", "id"],
+        False,
+    ),
+    (
+        "audit_events_application_time_created_id",
+        ["application_id", "time_created", "id"],
+        False,
+    ),
+    ("ix_audit_events_resource_id", ["resource_id"], False),
+    ("ix_audit_events_user_id", ["user_id"], False),
+]
+
+COLUMNS = (
+    "time_created, time_updated, id, user_id, portfolio_id, application_id, "
+    "changed_state, event_details, resource_type, resource_id, display_name, "
+    "action, stream_id"
+)
+
+
+def _columns():
+    return [
+        sa.Column(
+            "time_created",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "time_updated",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "id",
+            postgresql.UUID(as_uuid=True),
+            server_default=sa.text("uuid_generate_v4()"),
+            nullable=False,
+        ),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("portfolio_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("application_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column(
+            "changed_state", postgresql.JSONB(astext_type=sa.Text()), nullable=True
+        ),
+        sa.Column(
+            "event_details", postgresql.JSONB(astext_type=sa.Text()), nullable=True
+        ),
+        sa.Column("resource_type", sa.String(), nullable=False),
+        sa.Column("resource_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("display_name", sa.String(), nullable=True),
+        sa.Column("action", sa.String(), nullable=False),
+        sa.Column("stream_id", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["application_id"],
+            ["applications.id"],
+            name="audit_events_application_id_fkey",
+        ),
+        sa.ForeignKeyConstraint(
+            ["portfolio_id"], ["portfolios.id"], name="audit_events_portfolio_id_fkey"
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"], ["users.id"], name="audit_events_user_id_fkey"
+        ),
+    ]
+
+
+def _add_month(month):
+    if month.month == 12:
+        return date(month.year + 1, 1, 1)
+    return date(month.year, month.month + 1, 1)
+
+
+def _rename_indexes(suffix_from, suffix_to, names):
+    for name in names:
+        op.execute(
+            "ALTER INDEX {}{} RENAME TO {}{}".format(name, suffix_from, name, suffix_to)
+        )
+
+
+def upgrade():
+    connection = op.get_bind()
+
+    op.rename_table("audit_events", "audit_events_unpartitioned")
+    _rename_indexes(
+        "",
+        "_unpartitioned",
+        ["audit_events_pkey", "ix_audit_events_stream_id"]
+        + [name for (name, _columns, _unique) in INDEXES],
+    )
+
+    op.create_table(
+        "audit_events",
+        *_columns(),
+        sa.PrimaryKeyConstraint("id", "time_created"),
+        postgresql_partition_by="RANGE (time_created)",
+    )
+    for (name, columns, unique) in INDEXES:
+        op.create_index(name, "audit_events", columns, unique=unique)
+    op.create_index(
+        "audit_events_stream_id_time_created",
+        "audit_events",
+        ["stream_id", "time_created"],
+        unique=True,
+    )
+
+    oldest = connection.execute(
+        "SELECT min(time_created) FROM audit_events_unpartitioned"
+    ).scalar()
+    today = datetime.now(timezone.utc).date()
+    month = (oldest.astimezone(timezone.utc).date() if oldest else today).replace(day=1)
+    last_month = today.replace(day=1)
+    for _ in range(MONTHS_AHEAD):
+        last_month = _add_month(last_month)
+
+    while month <= last_month:
+        op.execute(
+            "CREATE TABLE audit_events_p{:%Y_%m} PARTITION OF audit_events "
+            "FOR VALUES FROM ('{:%Y-%m-%d} 00:00+00') TO ('{:%Y-%m-%d} 00:00+00')".format(
+                month, month, _add_month(month)
+            )
+        )
+        month = _add_month(month)
+    op.execute("CREATE TABLE audit_events_default PARTITION OF audit_events DEFAULT")
+
+    op.execute(
+        "INSERT INTO audit_events ({columns}) "
+        "SELECT {columns} FROM audit_events_unpartitioned".format(columns=COLUMNS)
+    )
+    op.drop_table("audit_events_unpartitioned")
+
+
+def downgrade():
+    op.rename_table("audit_events", "audit_events_partitioned")
+    _rename_indexes(
+        "",
+        "_partitioned",
+        ["audit_events_pkey", "audit_events_stream_id_time_created"]
+        + [name for (name, _columns, _unique) in INDEXES],
+    )
+
+    op.create_table("audit_events", *_columns(), sa.PrimaryKeyConstraint("id"))
+    for (name, columns, unique) in INDEXES:
+        op.create_index(name, "audit_events", columns, unique=unique)
+    op.create_index(
+        "ix_audit_events_stream_id", "audit_events", ["stream_id"], unique=True
+    )
+
+    op.execute(
+        "INSERT INTO audit_events ({columns}) "
+        "SELECT {columns} FROM audit_events_partitioned".format(columns=COLUMNS)
+    )
+    # drops the partitions with it
+    op.drop_table("audit_events_partitioned")
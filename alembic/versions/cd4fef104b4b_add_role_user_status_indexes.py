@@ -0,0 +1,37 @@
+"""add role user status indexes
+
+Revision ID: cd4fef104b4b
+Revises: b6cdcc907ea2
+Create Date: 2026-10-18 08:02:11.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "cd4fef104b4b"  # pragma: allowlist secret
+down_revision = "b6cdcc907ea2"  # pragma: allowlist secret
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "application_role_user_status_deleted_application",
+        "application_roles",
+        ["user_id", "status", "deleted", "application_id"],
+        unique=False,
+    )
+    op.create_index(
+        "portfolio_role_user_status_portfolio",
+        "portfolio_roles",
+        ["user_id", "status", "portfolio_id"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("portfolio_role_user_status_portfolio", table_name="portfolio_roles")
+    op.drop_index(
+        "application_role_user_status_deleted_application",
+        table_name="application_roles",
+    )
@@ -0,0 +1,40 @@
+"""add audit event outbox
+
+Revision ID: ffaa0130cdeb
+Revises: cd4fef104b4b
+Create Date: 2026-10-18 14:21:37.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "ffaa0130cdeb"  # pragma: allowlist secret
+down_revision = "cd4fef104b4b"  # pragma: allowlist secret
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("audit_events", sa.Column("stream_id", sa.String(), nullable=True))
+    op.create_index(
+        op.f("ix_audit_events_stream_id"), "audit_events", ["stream_id"], unique=True
+    )
+    op.create_table(
+        "audit_event_outbox",
+        sa.Column(
+            "time_created",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("event", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade():
+    op.drop_table("audit_event_outbox")
+    op.drop_index(op.f("ix_audit_events_stream_id"), table_name="audit_events")
+    op.drop_column("audit_events", "stream_id")
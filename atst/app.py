@@ -20,11 +20,12 @@ from atst.routes.dev import bp as dev_routes
 from atst.routes.users import bp as user_routes
 from atst.routes.errors import make_error_pages
 from atst.routes.ccpo import bp as ccpo_routes
+from atst.domain.audit_stream import AuditStream
 from atst.domain.authnid.crl import CRLCache, NoOpCRLCache
 from atst.domain.auth import apply_authentication
 from atst.domain.authz import Authorization
 from atst.domain.csp import make_csp_provider
-from atst.domain.portfolios import Portfolios
+from atst.domain.portfolios.sidebar import LazyList, SidebarPortfolios
 from atst.models.permissions import Permissions
 from atst.queue import celery, update_celery
 from atst.utils import mailer
@@ -32,11 +33,14 @@ from atst.utils.form_cache import FormCache
 from atst.utils.json import CustomJSONEncoder, sqlalchemy_dumps
 from atst.utils.notification_sender import NotificationSender
 from atst.utils.session_limiter import SessionLimiter
+from atst.utils.ttl_cache import TTLCache
 
 from logging.config import dictConfig
 from atst.utils.logging import JsonFormatter, RequestContextFilter
+from atst.utils.sql_instrumentation import instrument_sql
 
 from atst.utils.context_processors import assign_resources
+from atst.domain.portfolios.scopes import clear_scoped_resources
 
 
 ENV = os.getenv("FLASK_ENV", "dev")
@@ -71,6 +75,7 @@ def make_app(config):
     make_notification_sender(app)
 
     db.init_app(app)
+    instrument_sql(app)
     csrf.init_app(app)
     Session(app)
     make_session_limiter(app, session, config)
@@ -88,13 +93,17 @@ def make_app(config):
         app.register_blueprint(dev_routes)
 
     app.form_cache = FormCache(app.redis)
+    app.audit_stream = AuditStream(app.redis)
+    make_sidebar_portfolios(app)
 
     apply_authentication(app)
     set_default_headers(app)
 
     @app.before_request
     def _set_resources():
-        assign_resources(request.view_args)
+        assign_resources(request.view_args, request.endpoint)
+
+    app.teardown_request(clear_scoped_resources)
 
     return app
 
@@ -114,8 +123,8 @@ def make_flask_callbacks(app):
         if not g.current_user:
             return {}
 
-        portfolios = Portfolios.for_user(g.current_user)
-        return {"portfolios": portfolios}
+        user = g.current_user
+        return {"portfolios": LazyList(lambda: app.sidebar_portfolios.for_user(user))}
 
     @app.after_request
     def _cleanup(response):
@@ -156,6 +165,10 @@ def map_config(config):
     return {
         **config["default"],
         "USE_AUDIT_LOG": config["default"].getboolean("USE_AUDIT_LOG"),
+        "AUDIT_LOG_ASYNC": config["default"].getboolean("AUDIT_LOG_ASYNC"),
+        "AUDIT_LOG_RETENTION_MONTHS": config.getint(
+            "default", "AUDIT_LOG_RETENTION_MONTHS"
+        ),
         "ENV": config["default"]["ENVIRONMENT"],
         "BROKER_URL": config["default"]["REDIS_URI"],
         "DEBUG": config["default"].getboolean("DEBUG"),
@@ -176,7 +189,16 @@ def map_config(config):
         ),
         "DISABLE_CRL_CHECK": config.getboolean("default", "DISABLE_CRL_CHECK"),
         "CRL_FAIL_OPEN": config.getboolean("default", "CRL_FAIL_OPEN"),
+        "CRL_REFRESH_INTERVAL": config.getint("default", "CRL_REFRESH_INTERVAL"),
+        "CRL_VERIFICATION_CACHE_TTL": config.getint(
+            "default", "CRL_VERIFICATION_CACHE_TTL"
+        ),
         "LOG_JSON": config.getboolean("default", "LOG_JSON"),
+        "SIDEBAR_PORTFOLIOS_CACHE_TTL": config.getint(
+            "default", "SIDEBAR_PORTFOLIOS_CACHE_TTL"
+        ),
+        "SQL_INSTRUMENTATION": config.getboolean("default", "SQL_INSTRUMENTATION"),
+        "SQL_SERVER_TIMING": config.getboolean("default", "SQL_SERVER_TIMING"),
         "LIMIT_CONCURRENT_SESSIONS": config.getboolean(
             "default", "LIMIT_CONCURRENT_SESSIONS"
         ),
@@ -285,7 +307,36 @@ def make_crl_validator(app):
         if not os.path.isdir(crl_dir):
             os.makedirs(crl_dir, exist_ok=True)
 
-        app.crl_cache = CRLCache(app.config["CA_CHAIN"], crl_dir, logger=app.logger,)
+        verification_cache = None
+        if app.config.get("CRL_VERIFICATION_CACHE_TTL"):
+            verification_cache = TTLCache(
+                app.config["CRL_VERIFICATION_CACHE_TTL"],
+                redis=app.redis,
+                key_prefix="crl-verification",
+            )
+
+        app.crl_cache = CRLCache(
+            app.config["CA_CHAIN"],
+            crl_dir,
+            logger=app.logger,
+            verification_cache=verification_cache,
+        )
+        if app.config.get("CRL_REFRESH_INTERVAL"):
+            app.crl_cache.refresh_in_background(
+                app.config["CRL_REFRESH_INTERVAL"], redis=app.redis
+            )
+
+
+def make_sidebar_portfolios(app):
+    cache = None
+    if app.config.get("SIDEBAR_PORTFOLIOS_CACHE_TTL"):
+        cache = TTLCache(
+            app.config["SIDEBAR_PORTFOLIOS_CACHE_TTL"],
+            redis=app.redis,
+            key_prefix="sidebar-portfolios",
+        )
+
+    app.sidebar_portfolios = SidebarPortfolios(cache, redis=app.redis)
 
 
 def make_mailer(app):
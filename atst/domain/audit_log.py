@@ -1,34 +1,61 @@
 from atst.database import db
-from atst.domain.common import Query
+from atst.domain.common import KeysetPaginator, Query
 from atst.models.audit_event import AuditEvent
 
+# exported audit events are read from the database this many at a time
+EXPORT_BATCH_SIZE = 1000
+
 
 class AuditEventQuery(Query):
     model = AuditEvent
 
+    @classmethod
+    def paginate(cls, query, pagination_opts):
+        return KeysetPaginator.paginate(
+            query, (cls.model.time_created, cls.model.id), pagination_opts
+        )
+
     @classmethod
     def get_all(cls, pagination_opts):
-        query = db.session.query(cls.model).order_by(cls.model.time_created.desc())
+        query = db.session.query(cls.model)
         return cls.paginate(query, pagination_opts)
 
     @classmethod
     def get_portfolio_events(cls, portfolio_id, pagination_opts):
-        query = (
-            db.session.query(cls.model)
-            .filter(cls.model.portfolio_id == portfolio_id)
-            .order_by(cls.model.time_created.desc())
+        query = db.session.query(cls.model).filter(
+            cls.model.portfolio_id == portfolio_id
         )
         return cls.paginate(query, pagination_opts)
 
     @classmethod
     def get_application_events(cls, application_id, pagination_opts):
-        query = (
-            db.session.query(cls.model)
-            .filter(cls.model.application_id == application_id)
-            .order_by(cls.model.time_created.desc())
+        query = db.session.query(cls.model).filter(
+            cls.model.application_id == application_id
         )
         return cls.paginate(query, pagination_opts)
 
+    @classmethod
+    def get_events_for_export(
+        cls, portfolio_id=None, application_id=None, user_id=None, start=None, end=None
+    ):
+        query = db.session.query(cls.model)
+        if portfolio_id:
+            query = query.filter(cls.model.portfolio_id == portfolio_id)
+        if application_id:
+            query = query.filter(cls.model.application_id == application_id)
+        if user_id:
+            query = query.filter(cls.model.user_id == user_id)
+        if start:
+            query = query.filter(cls.model.time_created >= start)
+        if end:
+            query = query.filter(cls.model.time_created < end)
+
+        # yield_per reads the events with a server-side cursor, so only one
+        # batch of them is held in memory at a time
+        return query.order_by(cls.model.time_created, cls.model.id).yield_per(
+            EXPORT_BATCH_SIZE
+        )
+
 
 class AuditLog(object):
     @classmethod
@@ -48,6 +75,16 @@ class AuditLog(object):
     def get_application_events(cls, application, pagination_opts=None):
         return AuditEventQuery.get_application_events(application.id, pagination_opts)
 
+    @classmethod
+    def export_events(cls, **filters):
+        """
+        Generate the log of every audit event matching the filters, oldest
+        first. The filters are `portfolio_id`, `application_id`, `user_id`,
+        and `start` and `end` times, `end` being exclusive.
+        """
+        for audit_event in AuditEventQuery.get_events_for_export(**filters):
+            yield audit_event.log
+
     @classmethod
     def get_by_resource(cls, resource_id):
         return (
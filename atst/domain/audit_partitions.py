@@ -0,0 +1,169 @@
+import gzip
+import os
+import re
+
+from atst.database import db
+from atst.utils.clock import Clock
+
+
+PARTITION_NAME = re.compile(r"^audit_events_p(\d{4})_(\d{2})$")
+DEFAULT_PARTITION = "audit_events_default"
+# partitions are created this many months ahead, so that the default
+# partition is only written to if creating them fails for that long
+MONTHS_AHEAD = 3
+
+
+def _add_months(month, months):
+    year, index = divmod(month.year * 12 + month.month - 1 + months, 12)
+    return month.replace(year=year, month=index + 1, day=1)
+
+
+def partition_name(month):
+    return "audit_events_p{:%Y_%m}".format(month)
+
+
+class AuditEventPartitions(object):
+    """
+    `audit_events` is partitioned by month of `time_created`. Events outside
+    of every monthly partition go to the default partition.
+
+    Old partitions are archived by detaching them from `audit_events`,
+    exporting their rows to gzipped JSON lines files, one event per line, and
+    dropping them. A partition that was detached but not yet exported, for
+    instance because the worker crashed, is exported the next time.
+    """
+
+    @classmethod
+    def attached(cls):
+        """
+        The names of the monthly partitions of `audit_events`, oldest first.
+        """
+        names = db.session.execute(
+            """
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = 'audit_events'
+            """
+        ).fetchall()
+        return sorted(name for (name,) in names if PARTITION_NAME.match(name))
+
+    @classmethod
+    def detached(cls):
+        """
+        The names of monthly partitions that have been detached from
+        `audit_events` but not yet archived.
+        """
+        names = db.session.execute(
+            "SELECT tablename FROM pg_tables WHERE schemaname = current_schema()"
+        ).fetchall()
+        attached = set(cls.attached())
+        return sorted(
+            name
+            for (name,) in names
+            if PARTITION_NAME.match(name) and name not in attached
+        )
+
+    @classmethod
+    def create(cls, months_ahead=MONTHS_AHEAD):
+        """
+        Create the partitions for this month and the next `months_ahead`
+        months that don't exist yet. Events already saved to the default
+        partition for one of those months are moved into it. Returns the
+        names of the partitions created.
+        """
+        this_month = Clock.today().replace(day=1)
+        existing = set(cls.attached()) | set(cls.detached())
+
+        created = []
+        for months in range(months_ahead + 1):
+            month = _add_months(this_month, months)
+            name = partition_name(month)
+            if name not in existing:
+                cls._create_partition(name, month, _add_months(month, 1))
+                created.append(name)
+
+        db.session.commit()
+        return created
+
+    @classmethod
+    def archive(cls, archive_dir, retention_months):
+        """
+        Archive the partitions for months that ended more than
+        `retention_months` months ago to `archive_dir`. Returns the paths of
+        the archives written.
+        """
+        # names sort by month
+        cutoff = partition_name(
+            _add_months(Clock.today().replace(day=1), -retention_months)
+        )
+        for name in cls.attached():
+            if name < cutoff:
+                db.session.execute(
+                    "ALTER TABLE audit_events DETACH PARTITION {}".format(name)
+                )
+        db.session.commit()
+
+        os.makedirs(archive_dir, exist_ok=True)
+        archives = []
+        for name in cls.detached():
+            archives.append(cls._export(name, archive_dir))
+            db.session.execute("DROP TABLE {}".format(name))
+            db.session.commit()
+
+        return archives
+
+    @classmethod
+    def _create_partition(cls, name, start, end):
+        bounds = {"start": start.isoformat(), "end": end.isoformat()}
+        in_range = "time_created >= :start AND time_created < :end"
+
+        # a partition can't be created while the default partition holds
+        # events that belong in it, so they are set aside until it exists
+        db.session.execute(
+            "CREATE TEMPORARY TABLE audit_events_moved (LIKE audit_events)"
+        )
+        db.session.execute(
+            """
+            WITH moved AS (
+                DELETE FROM {} WHERE {} RETURNING *
+            )
+            INSERT INTO audit_events_moved SELECT * FROM moved
+            """.format(
+                DEFAULT_PARTITION, in_range
+            ),
+            bounds,
+        )
+        db.session.execute(
+            "CREATE TABLE {} PARTITION OF audit_events "
+            "FOR VALUES FROM ('{} 00:00+00') TO ('{} 00:00+00')".format(
+                name, bounds["start"], bounds["end"]
+            )
+        )
+        db.session.execute("INSERT INTO audit_events SELECT * FROM audit_events_moved")
+        db.session.execute("DROP TABLE audit_events_moved")
+
+    @classmethod
+    def _export(cls, name, archive_dir):
+        path = os.path.join(archive_dir, "{}.jsonl.gz".format(name))
+        partial_path = path + ".partial"
+
+        # rows are read with a server-side cursor, so a partition is never
+        # held in memory
+        rows = (
+            db.session.connection()
+            .execution_options(stream_results=True)
+            .execute(
+                "SELECT row_to_json(event)::text FROM {} event "
+                "ORDER BY time_created, id".format(name)
+            )
+        )
+        with open(partial_path, "wb") as archive_file:
+            with gzip.GzipFile(fileobj=archive_file, mode="wb") as archive:
+                for (row,) in rows:
+                    archive.write(row.encode())
+                    archive.write(b"\n")
+            os.fsync(archive_file.fileno())
+        os.replace(partial_path, path)
+
+        return path
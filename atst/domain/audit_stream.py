@@ -0,0 +1,268 @@
+import json
+import time
+from datetime import date, datetime, timedelta, timezone
+from enum import Enum
+from uuid import UUID
+
+from flask import current_app as app
+from redis.exceptions import RedisError, ResponseError
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from atst.database import db
+from atst.models.audit_event import AuditEvent, AuditEventOutbox
+
+
+STREAM_KEY = "audit-events"
+CONSUMER_GROUP = "audit-log"
+BATCH_SIZE = 500
+# entries delivered to a consumer that hasn't acknowledged them for this long
+# are assumed to belong to a worker that crashed, and are loaded again
+CLAIM_IDLE_MS = 5 * 60 * 1000
+OUTBOX_PREFIX = "outbox:"
+
+
+def _default(obj):
+    if isinstance(obj, UUID):
+        return str(obj)
+    elif isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    elif isinstance(obj, Enum):
+        return obj.name
+    else:
+        raise TypeError()
+
+
+def encode_event(audit_event):
+    return json.dumps(audit_event, default=_default)
+
+
+def decode_event(encoded):
+    return json.loads(encoded)
+
+
+class AuditStream(object):
+    """
+    Audit events logged asynchronously, when AUDIT_LOG_ASYNC is set. Events
+    are saved to the audit event outbox table in the transaction they
+    happened in, so they are committed or rolled back with it. Once it is
+    committed they are added to a Redis stream, and loaded from there into
+    the audit log in batches by the `load_audit_events` task, which deletes
+    their outbox rows as it saves them. Events that never make it to the
+    stream, because Redis is unavailable or the process dies first, are
+    loaded from the outbox by the same task once they have been there for
+    longer than `claim_idle_ms`.
+
+    Stream entries are only acknowledged after the events have been saved,
+    and each event is saved with the ID of the outbox row it came from, so a
+    worker that crashes part way through a batch loses nothing and
+    duplicates nothing: its entries are claimed and loaded again by the next
+    worker, and an event loaded from both the stream and the outbox is only
+    saved once.
+    """
+
+    def __init__(
+        self,
+        redis,
+        key=STREAM_KEY,
+        group=CONSUMER_GROUP,
+        batch_size=BATCH_SIZE,
+        claim_idle_ms=CLAIM_IDLE_MS,
+    ):
+        self.redis = redis
+        self.key = key
+        self.group = group
+        self.batch_size = batch_size
+        self.claim_idle_ms = claim_idle_ms
+
+    def save_to_outbox(self, connection, audit_events):
+        """
+        Save the audit events to the outbox with `connection`, as part of its
+        transaction. Returns the `(id, event)` pairs of the outbox rows, to
+        be published once the transaction is committed.
+        """
+        return connection.execute(
+            AuditEventOutbox.__table__.insert()
+            .values([{"event": encode_event(event)} for event in audit_events])
+            .returning(AuditEventOutbox.id, AuditEventOutbox.event)
+        ).fetchall()
+
+    def publish(self, outbox_rows):
+        """
+        Add committed outbox rows to the stream, all together or not at all.
+        The rows stay in the outbox until the events are loaded, from the
+        stream or, if they can't be added to it, from the outbox.
+        """
+        try:
+            pipeline = self.redis.pipeline()
+            for (id_, event) in outbox_rows:
+                pipeline.xadd(self.key, {"event": event, "outbox_id": id_})
+            pipeline.execute()
+        except RedisError as error:
+            app.logger.warning(
+                "Could not add {} audit events to the stream, leaving them in the outbox: {}".format(
+                    len(outbox_rows), error
+                ),
+                extra={"tags": ["audit_stream"]},
+            )
+
+    def create_group(self):
+        try:
+            self.redis.xgroup_create(self.key, self.group, id="0", mkstream=True)
+        except ResponseError as error:
+            if "BUSYGROUP" not in str(error):
+                raise
+
+    def load(self, consumer):
+        """
+        Load all the events waiting in the stream and the outbox into the
+        audit log, as `consumer` in the stream's consumer group. Returns the
+        number of events loaded.
+        """
+        self.create_group()
+
+        loaded = 0
+        while True:
+            entries = self._claim(consumer) or self._read(consumer)
+            if not entries:
+                break
+            loaded += self._load_entries(entries)
+
+        return loaded + self._load_outbox()
+
+    def lag(self):
+        """
+        How far behind the audit log is: the events waiting to be loaded,
+        those delivered to a worker but not yet saved, and how long the
+        oldest of them has been waiting, in seconds.
+        """
+        self.create_group()
+
+        oldest_entry = self.redis.xrange(self.key, count=1)
+        outbox_length, outbox_oldest = db.session.query(
+            func.count(AuditEventOutbox.id), func.min(AuditEventOutbox.time_created)
+        ).one()
+
+        return {
+            "stream_length": self.redis.xlen(self.key),
+            "pending": self.redis.xpending(self.key, self.group)["pending"],
+            "oldest_age_seconds": _entry_age(oldest_entry[0][0]) if oldest_entry else 0,
+            "outbox_length": outbox_length,
+            "outbox_oldest_age_seconds": (
+                datetime.now(timezone.utc) - outbox_oldest
+            ).total_seconds()
+            if outbox_oldest
+            else 0,
+        }
+
+    def _claim(self, consumer):
+        pending = self.redis.xpending_range(
+            self.key, self.group, "-", "+", self.batch_size
+        )
+        stale_ids = [
+            entry["message_id"]
+            for entry in pending
+            if entry["time_since_delivered"] >= self.claim_idle_ms
+        ]
+        if not stale_ids:
+            return []
+
+        return self.redis.xclaim(
+            self.key, self.group, consumer, self.claim_idle_ms, stale_ids
+        )
+
+    def _read(self, consumer):
+        streams = self.redis.xreadgroup(
+            self.group, consumer, {self.key: ">"}, count=self.batch_size
+        )
+        return streams[0][1] if streams else []
+
+    def _load_entries(self, entries):
+        # entries deleted from the stream are claimed without their fields
+        entries_with_fields = [
+            (entry_id, fields) for (entry_id, fields) in entries if fields
+        ]
+        audit_events = [
+            dict(decode_event(fields[b"event"]), stream_id=_stream_id(entry_id, fields))
+            for (entry_id, fields) in entries_with_fields
+        ]
+        _save(audit_events)
+        _delete_from_outbox(
+            [
+                int(fields[b"outbox_id"])
+                for (_entry_id, fields) in entries_with_fields
+                if b"outbox_id" in fields
+            ]
+        )
+        db.session.commit()
+
+        self._acknowledge([entry_id for (entry_id, _fields) in entries])
+
+        return len(audit_events)
+
+    def _acknowledge(self, entry_ids):
+        pipeline = self.redis.pipeline()
+        pipeline.xack(self.key, self.group, *entry_ids)
+        pipeline.xdel(self.key, *entry_ids)
+        pipeline.execute()
+
+    def _load_outbox(self):
+        # rows whose events are on their way through the stream are left to it
+        added_before = func.now() - timedelta(milliseconds=self.claim_idle_ms)
+        loaded = 0
+        while True:
+            rows = (
+                db.session.query(AuditEventOutbox.id, AuditEventOutbox.event)
+                .filter(AuditEventOutbox.time_created <= added_before)
+                .order_by(AuditEventOutbox.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            if not rows:
+                break
+
+            _save(
+                [
+                    dict(decode_event(event), stream_id=OUTBOX_PREFIX + str(id_))
+                    for (id_, event) in rows
+                ]
+            )
+            _delete_from_outbox([id_ for (id_, _event) in rows])
+            db.session.commit()
+            loaded += len(rows)
+
+        return loaded
+
+
+def _stream_id(entry_id, fields):
+    # an event published from the outbox has the ID of its outbox row, so it
+    # is saved once whether it is loaded from the stream, the outbox or both
+    if b"outbox_id" in fields:
+        return OUTBOX_PREFIX + fields[b"outbox_id"].decode()
+    return entry_id.decode()
+
+
+def _entry_age(entry_id):
+    milliseconds = int(entry_id.split(b"-")[0])
+    return max(time.time() - milliseconds / 1000, 0)
+
+
+def _delete_from_outbox(ids):
+    if not ids:
+        return
+
+    db.session.query(AuditEventOutbox).filter(AuditEventOutbox.id.in_(ids)).delete(
+        synchronize_session=False
+    )
+
+
+def _save(audit_events):
+    if not audit_events:
+        return
+
+    db.session.execute(
+        insert(AuditEvent.__table__)
+        .values(audit_events)
+        .on_conflict_do_nothing(index_elements=["stream_id", "time_created"])
+    )
@@ -1,5 +1,6 @@
 from flask import g, redirect, url_for, session, request
 
+from atst.domain.authz.principal import clear_principals
 from atst.domain.users import Users
 
 
@@ -30,6 +31,8 @@ def apply_authentication(app):
         elif not _unprotected_route(request):
             return redirect(url_for("atst.root", next=request.path))
 
+    app.teardown_request(clear_principals)
+
 
 def should_redirect_to_user_profile(request, user):
     has_complete_profile = user.profile_complete
@@ -1,6 +1,6 @@
 from atst.domain.exceptions import UnauthenticatedError, NotFoundError
 from atst.domain.users import Users
-from .utils import parse_sdn, email_from_certificate
+from .utils import parse_sdn, ParsedCertificate
 from .crl import CRLRevocationException, CRLInvalidException
 
 
@@ -16,6 +16,7 @@ class AuthenticationContext:
         self.sdn = sdn
         self.cert = cert.encode()
         self._parsed_sdn = None
+        self._certificate = None
 
     def authenticate(self):
         if not self.auth_status == "SUCCESS":
@@ -34,20 +35,27 @@ class AuthenticationContext:
             return Users.create(permission_sets=[], email=email, **self.parsed_sdn)
 
     def _get_user_email(self):
-        try:
-            return email_from_certificate(self.cert)
-
-        # this just means it is not an email certificate; we might choose to
+        # None just means it is not an email certificate; we might choose to
         # log in that case
-        except ValueError:
-            return None
+        return self.certificate.email
 
     def _crl_check(self):
         try:
-            self.crl_cache.crl_check(self.cert)
+            self.crl_cache.crl_check(self.certificate)
         except CRLRevocationException as exc:
             raise UnauthenticatedError("CRL check failed. " + str(exc))
 
+    @property
+    def certificate(self):
+        """
+        The client certificate, parsed once and shared by the CRL check and
+        user lookup.
+        """
+        if not self._certificate:
+            self._certificate = ParsedCertificate(self.cert)
+
+        return self._certificate
+
     @property
     def parsed_sdn(self):
         if not self._parsed_sdn:
@@ -2,15 +2,31 @@ import os
 import re
 import hashlib
 import logging
+import threading
+import time
 
 from OpenSSL import crypto, SSL
 from datetime import datetime
 from flask import current_app as app
 
-from .util import load_crl_locations_cache, serialize_crl_locations_cache, CRL_LIST
+from .util import (
+    load_crl_locations_cache,
+    serialize_crl_locations_cache,
+    crl_index_path,
+    crl_next_update,
+    crl_manifest_path,
+    load_crl_manifest,
+    CRLIndex,
+    CRLParseError,
+    CRL_LIST,
+    CRL_UPDATE_CHANNEL,
+)
+from ..utils import ParsedCertificate
 
 # error codes from OpenSSL: https://github.com/openssl/openssl/blob/2c75f03b39de2fa7d006bc0f0d7c58235a54d9bb/include/openssl/x509_vfy.h#L111
 CRL_EXPIRED_ERROR_CODE = 12
+# X509_V_FLAG_USE_DELTAS, which pyOpenSSL does not expose
+USE_DELTAS_FLAG = 0x2000
 
 
 def get_common_name(x509_name_object):
@@ -19,6 +35,12 @@ def get_common_name(x509_name_object):
             return comp[1].decode()
 
 
+def _version_string(version):
+    if isinstance(version, tuple):
+        return "-".join(_version_string(part) for part in version)
+    return str(version)
+
+
 class CRLRevocationException(Exception):
     pass
 
@@ -33,9 +55,11 @@ class CRLInterface:
     def __init__(self, *args, logger=None, **kwargs):
         self.logger = logger
 
-    def _log(self, message, level=logging.INFO):
+    def _log(self, message, level=logging.INFO, **extra):
         if self.logger:
-            self.logger.log(level, message, extra={"tags": ["authorization", "crl"]})
+            self.logger.log(
+                level, message, extra={"tags": ["authorization", "crl"], **extra}
+            )
 
     def crl_check(self, cert):
         raise NotImplementedError()
@@ -44,8 +68,7 @@ class CRLInterface:
 class NoOpCRLCache(CRLInterface):
     def _get_cn(self, cert):
         try:
-            parsed = crypto.load_certificate(crypto.FILETYPE_PEM, cert)
-            return get_common_name(parsed.get_subject())
+            return get_common_name(ParsedCertificate.load(cert).subject)
         except crypto.Error:
             pass
 
@@ -76,17 +99,274 @@ class CRLCache(CRLInterface):
         store_class=crypto.X509Store,
         logger=None,
         crl_list=CRL_LIST,
+        verification_cache=None,
     ):
         self._crl_dir = crl_dir
+        self.verification_cache = verification_cache
         self.logger = logger
         self.store_class = store_class
         self.certificate_authorities = {}
         self.crl_list = crl_list
+        self.manifest_version = None
+        self._manifest_file_version = None
+        self._published = {}
+        self._cached = {}
+        self._cache_locks = {}
+        self._cache_locks_lock = threading.Lock()
+        self._refresh_interval = None
+        self._refresh_redis = None
+        self._refresh_pid = None
+        self._stop_refresh = threading.Event()
+        self.refresh_stats = {
+            "refreshes": 0,
+            "failures": 0,
+            "rebuilt": 0,
+            "last_duration": None,
+            "total_duration": 0.0,
+            "last_refresh_at": None,
+        }
         self._load_roots(root_location)
         self._build_crl_cache()
 
+    def _get_cached(self, key, version, build):
+        """
+        Return the `(version, value)` cached under `key` if it was built for
+        `version`, otherwise build it. Only one thread builds a given key;
+        the others wait and pick up the result. When a background refresh is
+        running it is responsible for replacing stale values, so any cached
+        value is returned as is, with the version it was built for.
+        """
+        cached = self._cached.get(key)
+        if cached and (cached[0] == version or self._refresh_interval):
+            return cached
+
+        with self._cache_lock(key):
+            cached = self._cached.get(key)
+            if cached and cached[0] == version:
+                return cached
+
+            cached = (version, build())
+            self._cached[key] = cached
+            return cached
+
+    def _cache_lock(self, key):
+        with self._cache_locks_lock:
+            return self._cache_locks.setdefault(key, threading.Lock())
+
+    def _file_version(self, location):
+        stat = os.stat(location)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _crl_version(self, crl_location, published=None):
+        # CRLs published through the manifest are named after their content
+        # hash and never change in place.
+        if published is None:
+            published = self._published
+        if crl_location in published:
+            return published[crl_location]["version"]
+        return self._file_version(crl_location)
+
+    def _store_for(self, crl_location, published=None):
+        if published is None:
+            published = self._published
+        delta_location = published.get(crl_location, {}).get("delta")
+        return (
+            self._crl_version(crl_location, published),
+            lambda: self._build_store(crl_location, delta_location),
+        )
+
+    def _index_for(self, crl_location, published=None):
+        if published is None:
+            published = self._published
+        index_location = published.get(crl_location, {}).get(
+            "index", crl_index_path(crl_location)
+        )
+        if not os.path.isfile(index_location):
+            return None
+
+        return (
+            (
+                self._file_version(index_location),
+                self._crl_version(crl_location, published),
+            ),
+            lambda: self._load_index(index_location),
+        )
+
     def _get_store(self, cert):
-        return self._build_store(cert.get_issuer())
+        """
+        Return the X509Store for the certificate's issuer, building it only if
+        the issuer's CRL file has changed since the store was last built.
+        """
+        return self._get_store_entry(cert)[1]
+
+    def _get_store_entry(self, cert):
+        issuer = cert.get_issuer()
+        crl_location = self._get_crl_location(issuer)
+        return self._get_cached(("store", issuer.der()), *self._store_for(crl_location))
+
+    def _get_chain_store(self, issuer):
+        """
+        Return an X509Store holding only the issuer's certificate chain, used
+        to verify certificates whose revocation is checked against an index.
+        """
+        return self._get_cached(
+            ("chain", issuer.der()),
+            None,
+            lambda: self._add_certificate_chain_to_store(self.store_class(), issuer),
+        )[1]
+
+    def _get_index(self, issuer):
+        """
+        Return the revoked-serial index for the issuer's CRL, or None if
+        there is no usable index and the full CRL has to be checked instead.
+        """
+        entry = self._get_index_entry(issuer)
+        return entry[1] if entry else None
+
+    def _get_index_entry(self, issuer):
+        crl_location = self._get_crl_location(issuer)
+        index_for = self._index_for(crl_location)
+        if index_for is None:
+            return None
+
+        version, index = self._get_cached(("index", issuer.der()), *index_for)
+        if index is None:
+            return None
+
+        # An index left over from a previous CRL is ignored. Published CRLs
+        # and their indexes share a content hash, so they always match.
+        if crl_location in self._published or index.crl_size == os.path.getsize(
+            crl_location
+        ):
+            return (version, index)
+
+    def _load_index(self, index_location):
+        # without an index the full CRL is checked instead, through a store
+        # built from it
+        try:
+            return CRLIndex(index_location)
+        except (CRLParseError, OSError, ValueError) as err:
+            self._log(
+                "Could not load CRL index at location {}: {}".format(
+                    index_location, err
+                ),
+                level=logging.WARNING,
+            )
+
+    def refresh_in_background(self, interval, redis=None):
+        """
+        Keep CRL stores and indexes current from a background thread instead
+        of on the request path. The thread checks for a new manifest every
+        `interval` seconds, or as soon as the CRL sync publishes to
+        CRL_UPDATE_CHANNEL if a Redis client is given. It is started on the
+        first check in each process, so it also runs in forked workers.
+        """
+        self._refresh_interval = interval
+        self._refresh_redis = redis
+
+    def stop_background_refresh(self):
+        self._stop_refresh.set()
+
+    def _ensure_refresh_thread(self):
+        if not self._refresh_interval or self._refresh_pid == os.getpid():
+            return
+
+        with self._cache_locks_lock:
+            if self._refresh_pid != os.getpid():
+                self._refresh_pid = os.getpid()
+                self._stop_refresh = threading.Event()
+                thread = threading.Thread(
+                    target=self._refresh_loop, name="crl-refresh", daemon=True
+                )
+                thread.start()
+
+    def _refresh_loop(self):
+        pubsub = None
+        if self._refresh_redis:
+            try:
+                pubsub = self._refresh_redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CRL_UPDATE_CHANNEL)
+            except Exception:
+                self._log(
+                    "Could not subscribe to CRL updates, polling instead",
+                    level=logging.WARNING,
+                )
+                pubsub = None
+
+        while not self._stop_refresh.is_set():
+            if pubsub:
+                try:
+                    pubsub.get_message(timeout=self._refresh_interval)
+                except Exception:
+                    self._log(
+                        "Lost CRL update subscription, polling instead",
+                        level=logging.WARNING,
+                    )
+                    pubsub = None
+            else:
+                self._stop_refresh.wait(self._refresh_interval)
+
+            if self._stop_refresh.is_set():
+                break
+
+            try:
+                self.refresh()
+            except Exception as err:
+                self._log(
+                    "CRL refresh failed: {}".format(err),
+                    level=logging.ERROR,
+                    crl_refresh=dict(self.refresh_stats),
+                )
+
+        if pubsub:
+            pubsub.close()
+
+    def refresh(self):
+        """
+        Reload the CRL locations and rebuild every cached store and index
+        whose CRL has changed, then swap the results in together.
+        """
+        start = time.monotonic()
+        try:
+            crl_cache, published, manifest_version = self._read_crl_locations()
+            keys = list(self._cached) + [("index", issuer) for issuer in crl_cache]
+            staged = {}
+            for kind, issuer_der in keys:
+                crl_location = crl_cache.get(issuer_der)
+                if kind == "chain" or not crl_location or (kind, issuer_der) in staged:
+                    continue
+
+                versioned = getattr(self, "_{}_for".format(kind))(
+                    crl_location, published
+                )
+                if versioned is None:
+                    continue
+
+                version, build = versioned
+                cached = self._cached.get((kind, issuer_der))
+                if not cached or cached[0] != version:
+                    staged[(kind, issuer_der)] = (version, build())
+
+            self._cached.update(staged)
+            self._published = published
+            self.crl_cache = crl_cache
+            self.manifest_version = manifest_version
+        except Exception:
+            self.refresh_stats["failures"] += 1
+            raise
+
+        duration = time.monotonic() - start
+        self.refresh_stats["refreshes"] += 1
+        self.refresh_stats["rebuilt"] = len(staged)
+        self.refresh_stats["last_duration"] = duration
+        self.refresh_stats["total_duration"] += duration
+        self.refresh_stats["last_refresh_at"] = time.time()
+        self._log(
+            "Refreshed {} CRL stores and indexes for manifest version {} in {:.3f}s".format(
+                len(staged), manifest_version, duration
+            ),
+            crl_refresh=dict(self.refresh_stats),
+        )
 
     def _load_roots(self, root_location):
         with open(root_location, "rb") as f:
@@ -98,6 +378,12 @@ class CRLCache(CRLInterface):
         return [match.group(0) for match in self._PEM_RE.finditer(root_str)]
 
     def _build_crl_cache(self):
+        try:
+            self._load_manifest()
+            return
+        except FileNotFoundError:
+            pass
+
         try:
             self.crl_cache = load_crl_locations_cache(self._crl_dir)
         except FileNotFoundError:
@@ -105,6 +391,71 @@ class CRLCache(CRLInterface):
                 self._crl_dir, crl_list=self.crl_list
             )
 
+    def _read_manifest(self):
+        file_version = self._file_version(crl_manifest_path(self._crl_dir))
+        manifest = load_crl_manifest(self._crl_dir)
+        crl_cache = {}
+        published = {}
+        for entry in manifest["crls"]:
+            crl_location = os.path.join(self._crl_dir, entry["path"])
+            crl_cache[bytes.fromhex(entry["issuer"])] = crl_location
+            published[crl_location] = self._published_crl(entry)
+
+        self._manifest_file_version = file_version
+        return (crl_cache, published, manifest["version"])
+
+    def _published_crl(self, entry):
+        """
+        The version, index and delta CRL of a manifest entry. A CRL with a
+        delta CRL is checked against the index of both merged together, and
+        its version changes whenever either of them does.
+        """
+        delta = entry.get("delta")
+        if not delta:
+            return {
+                "version": entry["sha256"],
+                "index": crl_index_path(os.path.join(self._crl_dir, entry["path"])),
+            }
+
+        return {
+            "version": "{}+{}".format(entry["sha256"], delta["sha256"]),
+            "index": os.path.join(self._crl_dir, delta["index"]),
+            "delta": os.path.join(self._crl_dir, delta["path"]),
+        }
+
+    def _read_crl_locations(self):
+        try:
+            return self._read_manifest()
+        except FileNotFoundError:
+            pass
+
+        try:
+            return (load_crl_locations_cache(self._crl_dir), {}, None)
+        except FileNotFoundError:
+            return (self.crl_cache, {}, None)
+
+    def _load_manifest(self):
+        (
+            self.crl_cache,
+            self._published,
+            self.manifest_version,
+        ) = self._read_manifest()
+
+    def _refresh_manifest(self):
+        """
+        Pick up a manifest published by the CRL sync since the last check.
+        This costs a single stat when nothing has changed. Cached stores and
+        indexes are keyed by CRL hash, so only issuers whose CRL changed are
+        rebuilt.
+        """
+        try:
+            file_version = self._file_version(crl_manifest_path(self._crl_dir))
+        except FileNotFoundError:
+            return
+
+        if file_version != self._manifest_file_version:
+            self._load_manifest()
+
     def _load_crl(self, crl_location):
         with open(crl_location, "rb") as crl_file:
             try:
@@ -115,22 +466,37 @@ class CRLCache(CRLInterface):
                     level=logging.WARNING,
                 )
 
-    def _build_store(self, issuer):
-        store = self.store_class()
-        self._log("STORE ID: {}. Building store.".format(id(store)))
-        store.set_flags(crypto.X509StoreFlags.CRL_CHECK)
+    def _get_crl_location(self, issuer):
         crl_location = self.crl_cache.get(issuer.der())
-        issuer_name = get_common_name(issuer)
 
         if not crl_location:
             raise CRLInvalidException(
                 "Could not find matching CRL for issuer with Common Name {}".format(
-                    issuer_name
+                    get_common_name(issuer)
                 )
             )
 
+        return crl_location
+
+    def _build_store(self, crl_location, delta_location=None):
+        store = self.store_class()
+        self._log("STORE ID: {}. Building store.".format(id(store)))
+        store.set_flags(crypto.X509StoreFlags.CRL_CHECK)
+
         crl = self._load_crl(crl_location)
         store.add_crl(crl)
+        next_updates = [crl_next_update(crl.to_cryptography())]
+        # OpenSSL only pairs a delta with a base CRL added before it
+        if delta_location:
+            delta = self._load_crl(delta_location)
+            store.set_flags(crypto.X509StoreFlags.CRL_CHECK | USE_DELTAS_FLAG)
+            store.add_crl(delta)
+            next_updates.append(crl_next_update(delta.to_cryptography()))
+        # when the store's CRLs expire, so do the results cached for it
+        store.crl_next_update = min(
+            (next_update for next_update in next_updates if next_update), default=0
+        )
+        issuer_name = get_common_name(crl.get_issuer())
 
         self._log(
             "STORE ID: {}. Adding CRL with issuer Common Name {}".format(
@@ -161,27 +527,109 @@ class CRLCache(CRLInterface):
             return self._add_certificate_chain_to_store(store, ca.get_issuer())
 
     def crl_check(self, cert):
-        parsed = crypto.load_certificate(crypto.FILETYPE_PEM, cert)
-        store = self._get_store(parsed)
+        certificate = ParsedCertificate.load(cert)
+        parsed = certificate.x509
+        if self._refresh_interval:
+            self._ensure_refresh_thread()
+        else:
+            self._refresh_manifest()
+
+        index_entry = self._get_index_entry(certificate.issuer)
+        if index_entry is not None:
+            version, index = index_entry
+            verification_key = self._verification_key(certificate, version)
+            if self._previously_verified(verification_key):
+                return True
+            return self._index_check(parsed, index, verification_key)
+
+        version, store = self._get_store_entry(parsed)
+        verification_key = self._verification_key(certificate, version)
+        if self._previously_verified(verification_key):
+            return True
+
         context = crypto.X509StoreContext(store, parsed)
         try:
             context.verify_certificate()
-            return True
-
         except crypto.X509StoreContextError as err:
             if err.args[0][0] == CRL_EXPIRED_ERROR_CODE:
-                if app.config.get("CRL_FAIL_OPEN"):
-                    self._log(
-                        "Encountered expired CRL for certificate with CN {} and issuer CN {}, failing open.".format(
-                            parsed.get_subject().CN, parsed.get_issuer().CN
-                        ),
-                        level=logging.WARNING,
-                    )
-                    return True
-                else:
-                    raise CRLInvalidException("CRL expired. Args: {}".format(err.args))
+                return self._expired_crl(parsed, err.args)
             raise CRLRevocationException(
                 "Certificate revoked or errored. Error: {}. Args: {}".format(
                     type(err), err.args
                 )
             )
+
+        return self._verified(verification_key, store.crl_next_update)
+
+    def _index_check(self, parsed, index, verification_key=None):
+        store = self._get_chain_store(parsed.get_issuer())
+        context = crypto.X509StoreContext(store, parsed)
+        try:
+            context.verify_certificate()
+        except crypto.X509StoreContextError as err:
+            raise CRLRevocationException(
+                "Certificate revoked or errored. Error: {}. Args: {}".format(
+                    type(err), err.args
+                )
+            )
+
+        if index.is_revoked(parsed.get_serial_number()):
+            raise CRLRevocationException(
+                "Certificate revoked or errored. Serial: {}".format(
+                    parsed.get_serial_number()
+                )
+            )
+
+        if index.is_expired():
+            return self._expired_crl(parsed, (index.next_update,))
+
+        return self._verified(verification_key, index.next_update)
+
+    def _verification_key(self, certificate, version):
+        """
+        Key for a certificate's cached verification result: its SHA-256
+        fingerprint plus the version of the store or index that checked it.
+        That is the version the store or index was loaded for, which may be
+        older than the CRL on disk while a background refresh catches up, so
+        a result is never recorded under a newer CRL than it was checked
+        against.
+        """
+        if self.verification_cache is None:
+            return None
+
+        return "{}:{}".format(certificate.fingerprint, _version_string(version))
+
+    def _previously_verified(self, verification_key):
+        """
+        Whether the certificate passed a check recorded under the key, against
+        a CRL that has not expired since. Once it has, the certificate is
+        checked again, so that an expired CRL is still reported.
+        """
+        if not verification_key:
+            return False
+
+        verified = self.verification_cache.get(verification_key)
+        if not isinstance(verified, dict):
+            return False
+
+        next_update = verified.get("next_update")
+        return not next_update or next_update > time.time()
+
+    def _verified(self, verification_key, next_update):
+        # only clean passes are cached; certificates checked against an
+        # expired CRL are checked again every time
+        if verification_key:
+            self.verification_cache.set(verification_key, {"next_update": next_update})
+        return True
+
+    def _expired_crl(self, parsed, args):
+        if app.config.get("CRL_FAIL_OPEN"):
+            self._log(
+                "Encountered expired CRL for certificate with CN {} and issuer CN {}, failing open.".format(
+                    parsed.get_subject().CN, parsed.get_issuer().CN
+                ),
+                level=logging.WARNING,
+            )
+            return True
+        else:
+            raise CRLInvalidException("CRL expired. Args: {}".format(args))
@@ -1,9 +1,22 @@
+import bisect
+import calendar
+import fcntl
+import hashlib
 import json
+import logging
+import mmap
 import os
 import re
+import shutil
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 import pendulum
 import requests
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
 
 
 class CRLNotFoundError(Exception):
@@ -14,8 +27,17 @@ class CRLParseError(Exception):
     pass
 
 
+class CRLDeltaBaseError(Exception):
+    # the delta CRL is based on a newer CRL than the published base
+    pass
+
+
 MODIFIED_TIME_BUFFER = 15 * 60
 
+# default number of CRLs downloaded at once by sync_crls
+CRL_SYNC_CONCURRENCY = 8
+CRL_CHUNK_SIZE = 64 * 1024
+
 
 CRL_LIST = [
     (
@@ -239,6 +261,26 @@ CRL_LIST = [
 
 JSON_CACHE = "crl_locations.json"
 
+# sync_crls publishes each CRL under the SHA-256 of its content and then
+# atomically replaces this manifest, which lists the current CRL for every
+# issuer. Readers never see a partially written CRL, and a changed CRL always
+# has a new hash.
+CRL_MANIFEST = "crl_manifest.json"
+# the CRL sync publishes the new manifest version here so that web workers
+# can pick it up without waiting for their next poll
+CRL_UPDATE_CHANNEL = "crl-updates"
+# A CRL with a delta CRL also has a merged index of its own revoked serials
+# and the delta's, named after both of their hashes.
+HASHED_CRL_RE = re.compile(r"^[0-9a-f]{64}(\.crl(\.idx)?|\.[0-9a-f]{64}\.idx)$")
+
+# A revoked-serial index is written next to each synced CRL. It is a fixed
+# header followed by the CRL's revoked serial numbers as sorted, fixed-width,
+# big-endian integers, so it can be memory-mapped and binary searched.
+CRL_INDEX_SUFFIX = ".idx"
+CRL_INDEX_MAGIC = b"ATATCRL1"
+# magic, nextUpdate (unix seconds), CRL size in bytes, serial width, count
+CRL_INDEX_HEADER = struct.Struct(">8sqQHQ")
+
 
 def _deserialize_cache_items(cache):
     return {bytes.fromhex(der): data for (der, data) in cache.items()}
@@ -271,8 +313,351 @@ def crl_local_path(out_dir, crl_location):
     return crl
 
 
+def crl_index_path(crl_path):
+    return crl_path + CRL_INDEX_SUFFIX
+
+
+_PEM_CERTIFICATE_RE = re.compile(
+    b"-----BEGIN CERTIFICATE-----.+?-----END CERTIFICATE-----", re.DOTALL
+)
+
+
+def ca_certificates_by_subject(certificates):
+    """
+    Group CA certificates by the DER encoding of their subject, which is how
+    a CRL names its issuer. A CA can have more than one certificate, for
+    instance after it is rekeyed.
+    """
+    by_subject = {}
+    for certificate in certificates:
+        subject = certificate.subject.public_bytes(default_backend())
+        by_subject.setdefault(subject, []).append(certificate)
+    return by_subject
+
+
+def load_ca_certificates(ca_location):
+    """
+    Load the PEM-encoded CA certificates at `ca_location`, grouped by subject.
+    CRLs are only indexed if they are signed by one of them.
+    """
+    with open(ca_location, "rb") as ca_file:
+        pem = ca_file.read()
+
+    return ca_certificates_by_subject(
+        x509.load_pem_x509_certificate(match.group(0), default_backend())
+        for match in _PEM_CERTIFICATE_RE.finditer(pem)
+    )
+
+
+def _load_crl_file(crl_path):
+    with open(crl_path, "rb") as crl_file:
+        crl_bytes = crl_file.read()
+
+    try:
+        return (x509.load_der_x509_crl(crl_bytes, default_backend()), len(crl_bytes))
+    except ValueError:
+        raise CRLParseError("Could not parse CRL at {}".format(crl_path))
+
+
+def _verify_crl(crl, crl_path, ca_certificates, issuer=None):
+    """
+    Check that the CRL was issued by `issuer`, given as the hex-encoded DER
+    of its name, and signed by a certificate in `ca_certificates`. The index
+    is checked instead of the CRL, so a CRL that fails either check must
+    never be indexed.
+    """
+    crl_issuer = crl.issuer.public_bytes(default_backend())
+    if issuer is not None and crl_issuer.hex() != issuer:
+        raise CRLParseError("CRL at {} has the wrong issuer".format(crl_path))
+
+    if not any(
+        crl.is_signature_valid(ca.public_key())
+        for ca in ca_certificates.get(crl_issuer, [])
+    ):
+        raise CRLParseError(
+            "CRL at {} is not signed by a known certificate authority".format(crl_path)
+        )
+
+
+def crl_next_update(crl):
+    return calendar.timegm(crl.next_update.utctimetuple()) if crl.next_update else 0
+
+
+def _crl_extension(crl, extension_class):
+    try:
+        return crl.extensions.get_extension_for_class(extension_class).value
+    except x509.ExtensionNotFound:
+        return None
+
+
+def _write_index(index_path, serials, next_update, crl_size):
+    width = max([(serial.bit_length() + 7) // 8 for serial in serials] + [1])
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "wb") as index_file:
+        index_file.write(
+            CRL_INDEX_HEADER.pack(
+                CRL_INDEX_MAGIC, next_update, crl_size, width, len(serials)
+            )
+        )
+        for serial in serials:
+            index_file.write(serial.to_bytes(width, "big"))
+
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+def write_crl_index(crl_path, ca_certificates, issuer=None):
+    """
+    Write a revoked-serial index for the DER-encoded CRL at `crl_path`, once
+    its issuer and signature are verified against `ca_certificates` (see
+    `_verify_crl`). The index is written to a temporary file and moved into
+    place so that readers which have the previous index mapped never see a
+    partial file.
+    """
+    crl, crl_size = _load_crl_file(crl_path)
+    _verify_crl(crl, crl_path, ca_certificates, issuer)
+    serials = sorted(revoked.serial_number for revoked in crl)
+    return _write_index(
+        crl_index_path(crl_path), serials, crl_next_update(crl), crl_size
+    )
+
+
+def write_delta_crl_index(
+    delta_path, base_path, base_crl_number, issuer, ca_certificates
+):
+    """
+    Merge the delta CRL at `delta_path` into the revoked serials of its base
+    CRL and index the result next to the delta. The base serials are read
+    from the base CRL's index, so the base CRL itself is not parsed again.
+    Entries with the removeFromCRL reason are taken out of the merged set.
+    """
+    delta, _ = _load_crl_file(delta_path)
+    indicator = _crl_extension(delta, x509.DeltaCRLIndicator)
+    if indicator is None:
+        raise CRLParseError("{} is not a delta CRL".format(delta_path))
+    _verify_crl(delta, delta_path, ca_certificates, issuer)
+    if base_crl_number is None or indicator.crl_number > base_crl_number:
+        raise CRLDeltaBaseError(
+            "Delta CRL at {} requires base CRL number {}, have {}".format(
+                delta_path, indicator.crl_number, base_crl_number
+            )
+        )
+
+    added = set()
+    removed = set()
+    for revoked in delta:
+        reason = None
+        for extension in revoked.extensions:
+            if isinstance(extension.value, x509.CRLReason):
+                reason = extension.value.reason
+        if reason == x509.ReasonFlags.remove_from_crl:
+            removed.add(revoked.serial_number)
+        else:
+            added.add(revoked.serial_number)
+
+    base_index = CRLIndex(crl_index_path(base_path))
+    serials = sorted((set(base_index.serials()) | added) - removed)
+    # the merged serials are only current until either CRL expires
+    updates = [
+        update for update in (base_index.next_update, crl_next_update(delta)) if update
+    ]
+    next_update = min(updates) if updates else 0
+    return _write_index(
+        crl_index_path(delta_path), serials, next_update, base_index.crl_size
+    )
+
+
+def crl_delta_info(crl_path):
+    """
+    Return the CRL number of the CRL at `crl_path` and the URI of its delta
+    CRL from the freshestCRL extension, either of which may be None.
+    """
+    crl, _ = _load_crl_file(crl_path)
+    number = _crl_extension(crl, x509.CRLNumber)
+    freshest = _crl_extension(crl, x509.FreshestCRL)
+    delta_uris = [
+        name.value
+        for point in (freshest or [])
+        for name in (point.full_name or [])
+        if isinstance(name, x509.UniformResourceIdentifier)
+    ]
+    return (
+        number.crl_number if number else None,
+        delta_uris[0] if delta_uris else None,
+    )
+
+
+class _IndexedSerials:
+    """Sequence view over the serial records of a mapped index."""
+
+    def __init__(self, buf, offset, width, count):
+        self._buf = buf
+        self._offset = offset
+        self._width = width
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        start = self._offset + i * self._width
+        return self._buf[start : start + self._width]
+
+
+class CRLIndex:
+    """
+    Read-only, memory-mapped view of a revoked-serial index. Mapping the file
+    lets every worker process share the same pages through the OS page cache.
+    """
+
+    def __init__(self, index_path):
+        with open(index_path, "rb") as index_file:
+            # an empty file can't be mapped at all
+            if os.fstat(index_file.fileno()).st_size < CRL_INDEX_HEADER.size:
+                raise CRLParseError("Truncated CRL index at {}".format(index_path))
+            self._map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic,
+            self.next_update,
+            self.crl_size,
+            self._width,
+            count,
+        ) = CRL_INDEX_HEADER.unpack_from(self._map)
+
+        if (
+            magic != CRL_INDEX_MAGIC
+            or len(self._map) != CRL_INDEX_HEADER.size + self._width * count
+        ):
+            raise CRLParseError("Invalid CRL index at {}".format(index_path))
+
+        self._serials = _IndexedSerials(
+            self._map, CRL_INDEX_HEADER.size, self._width, count
+        )
+
+    def __len__(self):
+        return len(self._serials)
+
+    def serials(self):
+        for i in range(len(self._serials)):
+            yield int.from_bytes(self._serials[i], "big")
+
+    def is_revoked(self, serial):
+        if serial.bit_length() > self._width * 8:
+            return False
+
+        target = serial.to_bytes(self._width, "big")
+        i = bisect.bisect_left(self._serials, target)
+        return i < len(self._serials) and self._serials[i] == target
+
+    def is_expired(self):
+        return bool(self.next_update) and self.next_update < pendulum.now().timestamp()
+
+
+def crl_manifest_path(crl_dir):
+    return os.path.join(crl_dir, CRL_MANIFEST)
+
+
+def load_crl_manifest(crl_dir):
+    with open(crl_manifest_path(crl_dir), "r") as manifest_file:
+        return json.load(manifest_file)
+
+
+def _tmp_path(path):
+    return os.path.join(os.path.dirname(path), ".{}.tmp".format(os.path.basename(path)))
+
+
+def write_crl_manifest(crl_dir, manifest):
+    manifest_path = crl_manifest_path(crl_dir)
+    tmp_path = _tmp_path(manifest_path)
+    with open(tmp_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as crl_file:
+        for chunk in iter(lambda: crl_file.read(CRL_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def publish_crl(crl_path, final_dir, crl_uri, crl_issuer):
+    """
+    Copy a downloaded CRL and its index into `final_dir` under the CRL's
+    content hash and return its manifest entry. Each file is copied to a
+    temporary name and renamed, so it appears in `final_dir` complete.
+    """
+    index = CRLIndex(crl_index_path(crl_path))
+    crl_number, delta_uri = crl_delta_info(crl_path)
+    sha256 = _file_sha256(crl_path)
+    name = "{}.crl".format(sha256)
+    _publish_file(crl_path, final_dir, name)
+    _publish_file(crl_index_path(crl_path), final_dir, crl_index_path(name))
+
+    return {
+        "uri": crl_uri,
+        "issuer": crl_issuer,
+        "sha256": sha256,
+        "path": name,
+        "size": index.crl_size,
+        "next_update": index.next_update,
+        "crl_number": crl_number,
+        "delta_uri": delta_uri,
+    }
+
+
+def publish_delta_crl(delta_path, final_dir, entry):
+    """
+    Publish a downloaded delta CRL and its merged index alongside the base
+    CRL in `entry`, and return the entry with the delta added.
+    """
+    index = CRLIndex(crl_index_path(delta_path))
+    sha256 = _file_sha256(delta_path)
+    name = "{}.crl".format(sha256)
+    index_name = "{}.{}{}".format(entry["sha256"], sha256, CRL_INDEX_SUFFIX)
+    _publish_file(delta_path, final_dir, name)
+    _publish_file(crl_index_path(delta_path), final_dir, index_name)
+
+    return dict(
+        entry,
+        delta={
+            "sha256": sha256,
+            "path": name,
+            "index": index_name,
+            "next_update": index.next_update,
+        },
+    )
+
+
+def _publish_file(source, final_dir, name):
+    target_path = os.path.join(final_dir, name)
+    if not os.path.exists(target_path):
+        shutil.copyfile(source, _tmp_path(target_path))
+        os.replace(_tmp_path(target_path), target_path)
+
+
+def remove_unpublished_crls(final_dir, *manifests):
+    """
+    Delete content-hashed CRLs and indexes in `final_dir` that none of the
+    given manifests refer to. Callers pass the previous manifest as well as
+    the new one so that workers still reading it can finish.
+    """
+    keep = set()
+    for manifest in manifests:
+        for entry in manifest["crls"]:
+            keep.update([entry["path"], crl_index_path(entry["path"])])
+            if entry.get("delta"):
+                keep.update([entry["delta"]["path"], entry["delta"]["index"]])
+
+    for name in os.listdir(final_dir):
+        if HASHED_CRL_RE.match(name) and name not in keep:
+            os.remove(os.path.join(final_dir, name))
+
+
 def existing_crl_modification_time(crl):
-    if os.path.exists(crl):
+    if crl and os.path.exists(crl):
         prev_time = os.path.getmtime(crl)
         buffered = prev_time + MODIFIED_TIME_BUFFER
         mod_time = prev_time if pendulum.now().timestamp() < buffered else buffered
@@ -283,27 +668,28 @@ def existing_crl_modification_time(crl):
         return False
 
 
-def write_crl(out_dir, target_dir, crl_location):
+def write_crl(out_dir, existing, crl_location, session=requests):
     crl = crl_local_path(out_dir, crl_location)
-    existing = crl_local_path(target_dir, crl_location)
     options = {"stream": True}
     mod_time = existing_crl_modification_time(existing)
     if mod_time:
         options["headers"] = {"If-Modified-Since": mod_time}
 
-    with requests.get(crl_location, **options) as response:
+    with session.get(crl_location, **options) as response:
         if response.status_code > 399:
             raise CRLNotFoundError()
 
         if response.status_code == 304:
-            return (False, existing)
+            return (False, 0)
 
+        size = 0
         with open(crl, "wb") as crl_file:
-            for chunk in response.iter_content(chunk_size=1024):
+            for chunk in response.iter_content(chunk_size=CRL_CHUNK_SIZE):
                 if chunk:
                     crl_file.write(chunk)
+                    size += len(chunk)
 
-    return (True, existing)
+    return (True, size)
 
 
 def remove_bad_crl(out_dir, crl_location):
@@ -320,14 +706,34 @@ def log_error(logger, crl_location):
         )
 
 
-def refresh_crl(out_dir, target_dir, crl_uri, logger):
+def refresh_crl(out_dir, existing, crl_uri, logger, index, session=requests):
+    """
+    Download the CRL at `crl_uri` into `out_dir` and index it with `index`,
+    unless it has not changed since `existing` was published. Returns the
+    path of the new CRL, or None if there is nothing new to publish.
+    """
     logger.info("updating CRL from {}".format(crl_uri))
+    start = time.monotonic()
     try:
-        was_updated, crl_path = write_crl(out_dir, target_dir, crl_uri)
-        if was_updated:
-            logger.info("successfully synced CRL from {}".format(crl_uri))
-        else:
-            logger.info("no updates for CRL from {}".format(crl_uri))
+        was_updated, size = write_crl(out_dir, existing, crl_uri, session=session)
+        duration = time.monotonic() - start
+        if not was_updated:
+            logger.info(
+                "no updates for CRL from {} ({:.2f}s)".format(crl_uri, duration)
+            )
+            return None
+
+        logger.info(
+            "successfully synced CRL from {} ({} bytes in {:.2f}s)".format(
+                crl_uri, size, duration
+            )
+        )
+        crl_path = crl_local_path(out_dir, crl_uri)
+        try:
+            index(crl_path)
+        except CRLParseError as err:
+            logger.error("Error indexing CRL from {}: {}".format(crl_uri, err))
+            return None
 
         return crl_path
     except requests.exceptions.ChunkedEncodingError:
@@ -337,20 +743,230 @@ def refresh_crl(out_dir, target_dir, crl_uri, logger):
         log_error(logger, crl_uri)
 
 
-def sync_crls(tmp_location, final_location):
-    crl_cache = {}
-    for crl_uri, crl_issuer in CRL_LIST:
-        crl_path = refresh_crl(tmp_location, final_location, crl_uri, logger)
-        crl_cache[crl_issuer] = crl_path
+def make_crl_session(concurrency=CRL_SYNC_CONCURRENCY):
+    """
+    Build an HTTP session whose connection pool is large enough for one
+    connection per download thread.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=concurrency, pool_maxsize=concurrency
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _sync_base_crl(
+    tmp_location,
+    final_location,
+    crl_uri,
+    crl_issuer,
+    existing,
+    ca_certificates,
+    logger,
+    session,
+):
+    existing_path = os.path.join(final_location, existing["path"]) if existing else None
+    crl_path = refresh_crl(
+        tmp_location,
+        existing_path,
+        crl_uri,
+        logger,
+        lambda path: write_crl_index(path, ca_certificates, crl_issuer),
+        session=session,
+    )
+    if crl_path:
+        return publish_crl(crl_path, final_location, crl_uri, crl_issuer)
+    return existing
+
+
+def _sync_delta_crl(
+    tmp_location, final_location, entry, ca_certificates, logger, session
+):
+    delta = entry.get("delta")
+    existing_path = os.path.join(final_location, delta["path"]) if delta else None
+    base_path = os.path.join(final_location, entry["path"])
+    delta_path = refresh_crl(
+        tmp_location,
+        existing_path,
+        entry["delta_uri"],
+        logger,
+        lambda path: write_delta_crl_index(
+            path, base_path, entry["crl_number"], entry["issuer"], ca_certificates
+        ),
+        session=session,
+    )
+    if delta_path:
+        return publish_delta_crl(delta_path, final_location, entry)
+    return entry
+
+
+def _crl_expired(entry):
+    return bool(entry["next_update"]) and entry["next_update"] < time.time()
+
+
+def sync_crl(
+    tmp_location,
+    final_location,
+    crl_uri,
+    crl_issuer,
+    existing,
+    ca_certificates,
+    logger,
+    session=requests,
+    deltas_only=False,
+):
+    """
+    Bring one CRL and its delta CRL, if it has one, up to date and return its
+    manifest entry, or None if it has never been synced. Deltas are merged
+    into the base CRL's revoked serials, so they are cheap to fetch often.
+    With `deltas_only`, the base CRL is only downloaded again once it expires
+    or when its delta turns out to be based on a newer base CRL.
+    """
+    entry = existing
+    if not (
+        deltas_only
+        and existing
+        and existing.get("delta_uri")
+        and not _crl_expired(existing)
+    ):
+        entry = _sync_base_crl(
+            tmp_location,
+            final_location,
+            crl_uri,
+            crl_issuer,
+            existing,
+            ca_certificates,
+            logger,
+            session,
+        )
 
-    json_location = "{}/{}".format(final_location, JSON_CACHE)
-    with open(json_location, "w") as json_file:
-        json.dump(crl_cache, json_file)
+    if not entry or not entry.get("delta_uri"):
+        return entry
+
+    try:
+        return _sync_delta_crl(
+            tmp_location, final_location, entry, ca_certificates, logger, session
+        )
+    except CRLDeltaBaseError as err:
+        logger.warning(str(err))
+
+    if entry is existing:
+        entry = _sync_base_crl(
+            tmp_location,
+            final_location,
+            crl_uri,
+            crl_issuer,
+            existing,
+            ca_certificates,
+            logger,
+            session,
+        )
+        if entry is not existing:
+            try:
+                return _sync_delta_crl(
+                    tmp_location,
+                    final_location,
+                    entry,
+                    ca_certificates,
+                    logger,
+                    session,
+                )
+            except CRLDeltaBaseError as err:
+                logger.warning(str(err))
+
+    return entry
+
+
+CRL_SYNC_LOCK = ".sync.lock"
+
+
+@contextmanager
+def crl_sync_lock(final_location):
+    """
+    Hold an exclusive lock on `final_location` for the length of a sync,
+    waiting for any sync already running against it to finish. Each sync
+    reads, updates and rewrites the manifest and then removes the CRLs it no
+    longer refers to, so two running at once could publish the same version
+    or remove CRLs the other's manifest refers to.
+    """
+    with open(os.path.join(final_location, CRL_SYNC_LOCK), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def sync_crls(
+    tmp_location,
+    final_location,
+    ca_certificates,
+    crl_list=CRL_LIST,
+    concurrency=CRL_SYNC_CONCURRENCY,
+    logger=logging.getLogger(__name__),
+    deltas_only=False,
+):
+    """
+    Download the CRLs in `crl_list` and publish any that changed to
+    `final_location`. A CRL that could not be downloaded, or is not signed by
+    one of `ca_certificates`, keeps its previously published version. The manifest version only changes when a CRL does.
+    With `deltas_only`, base CRLs that have a delta CRL are only downloaded
+    again once they expire; see `sync_crl`. Only one sync runs against
+    `final_location` at a time; see `crl_sync_lock`.
+    """
+    with crl_sync_lock(final_location):
+        try:
+            previous = load_crl_manifest(final_location)
+        except FileNotFoundError:
+            previous = {"version": 0, "crls": []}
+        published = {entry["uri"]: entry for entry in previous["crls"]}
+
+        start = time.monotonic()
+        with make_crl_session(concurrency) as session:
+
+            def _sync(crl):
+                crl_uri, crl_issuer = crl
+                return sync_crl(
+                    tmp_location,
+                    final_location,
+                    crl_uri,
+                    crl_issuer,
+                    published.get(crl_uri),
+                    ca_certificates,
+                    logger,
+                    session=session,
+                    deltas_only=deltas_only,
+                )
+
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                entries = [entry for entry in executor.map(_sync, crl_list) if entry]
+
+        logger.info(
+            "synced {} CRLs in {:.2f}s".format(len(crl_list), time.monotonic() - start)
+        )
+
+        if entries == previous["crls"]:
+            logger.info(
+                "CRL manifest version {} is current".format(previous["version"])
+            )
+            return previous
+
+        manifest = {
+            "version": previous["version"] + 1,
+            "generated_at": pendulum.now("UTC").to_iso8601_string(),
+            "crls": entries,
+        }
+        write_crl_manifest(final_location, manifest)
+        remove_unpublished_crls(final_location, previous, manifest)
+        logger.info("published CRL manifest version {}".format(manifest["version"]))
+
+        return manifest
 
 
 if __name__ == "__main__":
     import sys
-    import logging
 
     logging.basicConfig(
         level=logging.INFO, format="[%(asctime)s]:%(levelname)s: %(message)s"
@@ -360,7 +976,19 @@ if __name__ == "__main__":
     try:
         tmp_location = sys.argv[1]
         final_location = sys.argv[2]
-        sync_crls(tmp_location, final_location)
+        deltas_only = "--deltas-only" in sys.argv[3:]
+        concurrency = int(os.getenv("CRL_SYNC_CONCURRENCY", CRL_SYNC_CONCURRENCY))
+        ca_certificates = load_ca_certificates(
+            os.getenv("CA_CHAIN", "ssl/server-certs/ca-chain.pem")
+        )
+        sync_crls(
+            tmp_location,
+            final_location,
+            ca_certificates,
+            concurrency=concurrency,
+            logger=logger,
+            deltas_only=deltas_only,
+        )
     except Exception as err:
         logger.exception("Fatal error encountered, stopping")
         sys.exit(1)
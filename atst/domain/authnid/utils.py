@@ -1,23 +1,36 @@
+import hashlib
 import re
 
 import cryptography.x509 as x509
 from cryptography.hazmat.backends import default_backend
+from OpenSSL import crypto
 
 
 def parse_sdn(sdn):
     try:
         parts = sdn.split(",")
         cn_string = [piece for piece in parts if re.match("^CN=", piece)][0]
-        cn = cn_string.split("=")[-1]
+        return parse_common_name(cn_string.split("=")[-1])
+
+    except (IndexError, AttributeError):
+        raise ValueError("'{}' is not a valid SDN".format(sdn))
+
+
+def parse_common_name(cn):
+    try:
         info = cn.split(".")
         return {"last_name": info[0], "first_name": info[1], "dod_id": info[-1]}
 
     except (IndexError, AttributeError):
-        raise ValueError("'{}' is not a valid SDN".format(sdn))
+        raise ValueError("'{}' is not a valid DoD Common Name".format(cn))
 
 
 def email_from_certificate(cert_file):
     cert = x509.load_pem_x509_certificate(cert_file, default_backend())
+    return _email_from_x509(cert)
+
+
+def _email_from_x509(cert):
     try:
         ext = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName)
         email = ext.value.get_values_for_type(x509.RFC822Name)
@@ -37,3 +50,80 @@ def email_from_certificate(cert_file):
                 cert.serial_number
             )
         )
+
+
+class ParsedCertificate:
+    """
+    A client certificate decoded once, exposing the fields needed for the CRL
+    check, user lookup and logging so that none of them has to parse the PEM
+    again.
+    """
+
+    def __init__(self, cert):
+        if isinstance(cert, str):
+            cert = cert.encode()
+
+        self.pem = cert
+        self.x509 = crypto.load_certificate(crypto.FILETYPE_PEM, cert)
+        self._subject = None
+        self._issuer = None
+        self._fingerprint = None
+        self._email = False
+
+    @classmethod
+    def load(cls, cert):
+        if isinstance(cert, cls):
+            return cert
+        return cls(cert)
+
+    @property
+    def subject(self):
+        if self._subject is None:
+            self._subject = self.x509.get_subject()
+        return self._subject
+
+    @property
+    def issuer(self):
+        if self._issuer is None:
+            self._issuer = self.x509.get_issuer()
+        return self._issuer
+
+    @property
+    def issuer_der(self):
+        return self.issuer.der()
+
+    @property
+    def common_name(self):
+        return self.subject.CN
+
+    @property
+    def serial_number(self):
+        return self.x509.get_serial_number()
+
+    @property
+    def fingerprint(self):
+        if self._fingerprint is None:
+            der = crypto.dump_certificate(crypto.FILETYPE_ASN1, self.x509)
+            self._fingerprint = hashlib.sha256(der).hexdigest()
+        return self._fingerprint
+
+    @property
+    def email(self):
+        """
+        The first email address in the subjectAltName, or None if the
+        certificate does not have one.
+        """
+        if self._email is False:
+            try:
+                self._email = _email_from_x509(self.x509.to_cryptography())
+            except ValueError:
+                self._email = None
+        return self._email
+
+    @property
+    def sdn_info(self):
+        return parse_common_name(self.common_name)
+
+    @property
+    def dod_id(self):
+        return self.sdn_info["dod_id"]
@@ -1,42 +1,61 @@
-from atst.utils import first_or_none
+from atst.database import db
+from atst.models.application import Application
 from atst.models.permissions import Permissions
 from atst.domain.exceptions import UnauthorizedError
-from atst.models.portfolio_role import Status as PortfolioRoleStatus
-from atst.models.application_role import Status as ApplicationRoleStatus
+from .principal import get_principal
 
 
 class Authorization(object):
     @classmethod
     def has_atat_permission(cls, user, permission):
-        return permission in user.permissions
+        return get_principal(user).has_atat_permission(permission)
 
     @classmethod
     def has_portfolio_permission(cls, user, portfolio, permission):
-        if Authorization.has_atat_permission(user, permission):
-            return True
+        principal = get_principal(user)
+        return principal.has_atat_permission(
+            permission
+        ) or principal.has_portfolio_permission(portfolio.id, permission)
 
-        port_role = first_or_none(
-            lambda pr: pr.portfolio == portfolio, user.portfolio_roles
+    @classmethod
+    def has_application_permission(cls, user, application, permission):
+        principal = get_principal(user)
+        return (
+            principal.has_atat_permission(permission)
+            or principal.has_portfolio_permission(application.portfolio_id, permission)
+            or principal.has_application_permission(application.id, permission)
         )
-        if port_role and port_role.status is not PortfolioRoleStatus.DISABLED:
-            return permission in port_role.permissions
-        else:
-            return False
 
     @classmethod
-    def has_application_permission(cls, user, application, permission):
-        if Authorization.has_portfolio_permission(
-            user, application.portfolio, permission
-        ):
-            return True
+    def allowed_application_ids(
+        cls, user, permission, application_ids, active_only=False
+    ):
+        """
+        Return the subset of `application_ids` in which the user has
+        `permission`, either through their application role or through their
+        role in the application's portfolio. This takes at most one query, to
+        find which of the applications belong to those portfolios. With
+        `active_only`, pending roles are ignored.
+        """
+        principal = get_principal(user)
+        application_ids = set(application_ids)
+        if principal.has_atat_permission(permission):
+            return application_ids
 
-        app_role = first_or_none(
-            lambda app_role: app_role.application == application, user.application_roles
+        allowed = application_ids & principal.application_ids_with(
+            permission, active_only
         )
-        if app_role and app_role.status is not ApplicationRoleStatus.DISABLED:
-            return permission in app_role.permissions
-        else:
-            return False
+        remaining = application_ids - allowed
+        portfolio_ids = principal.portfolio_ids_with(permission, active_only)
+        if remaining and portfolio_ids:
+            allowed.update(
+                id_
+                for (id_,) in db.session.query(Application.id)
+                .filter(Application.id.in_(remaining))
+                .filter(Application.portfolio_id.in_(portfolio_ids))
+            )
+
+        return allowed
 
     @classmethod
     def check_atat_permission(cls, user, permission, message):
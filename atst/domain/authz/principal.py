@@ -0,0 +1,173 @@
+from flask import g, has_request_context
+from sqlalchemy import cast, event, func, null, true
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Session
+
+from atst.database import db
+from atst.models.application_role import (
+    ApplicationRole,
+    Status as ApplicationRoleStatus,
+    application_roles_permission_sets,
+)
+from atst.models.permission_set import PermissionSet
+from atst.models.permissions import permission_bit
+from atst.models.portfolio_role import (
+    PortfolioRole,
+    Status as PortfolioRoleStatus,
+    portfolio_roles_permission_sets,
+)
+from atst.models.user import User, users_permission_sets
+
+
+class Principal(object):
+    """
+    Everything needed to authorize a user: a permissions mask for their
+    site-wide permissions and one for each portfolio and application role
+    that is not disabled. It is loaded with a single query and shared by every
+    authorization check for the user during a request.
+
+    Pending roles grant their permissions like active ones, but are also
+    recorded in `pending` for callers that only want accepted roles.
+    """
+
+    def __init__(
+        self, user_id, atat=0, portfolios=None, applications=None, pending=None
+    ):
+        self.user_id = user_id
+        self.atat = atat
+        self.portfolios = portfolios or {}
+        self.applications = applications or {}
+        self.pending = pending or set()
+
+    @classmethod
+    def load(cls, user):
+        no_id = cast(null(), UUID(as_uuid=True))
+        mask = func.bit_or(PermissionSet.permissions_mask)
+        atat = (
+            db.session.query(no_id, no_id, mask, true())
+            .join(
+                users_permission_sets,
+                users_permission_sets.c.permission_set_id == PermissionSet.id,
+            )
+            .filter(users_permission_sets.c.user_id == user.id)
+            .group_by(users_permission_sets.c.user_id)
+        )
+        portfolios = (
+            db.session.query(
+                PortfolioRole.portfolio_id,
+                no_id,
+                mask,
+                func.bool_or(PortfolioRole.status == PortfolioRoleStatus.ACTIVE),
+            )
+            .join(
+                portfolio_roles_permission_sets,
+                portfolio_roles_permission_sets.c.portfolio_role_id == PortfolioRole.id,
+            )
+            .join(
+                PermissionSet,
+                PermissionSet.id == portfolio_roles_permission_sets.c.permission_set_id,
+            )
+            .filter(PortfolioRole.user_id == user.id)
+            .filter(PortfolioRole.status != PortfolioRoleStatus.DISABLED)
+            .group_by(PortfolioRole.portfolio_id)
+        )
+        applications = (
+            db.session.query(
+                no_id,
+                ApplicationRole.application_id,
+                mask,
+                func.bool_or(ApplicationRole.status == ApplicationRoleStatus.ACTIVE),
+            )
+            .join(
+                application_roles_permission_sets,
+                application_roles_permission_sets.c.application_role_id
+                == ApplicationRole.id,
+            )
+            .join(
+                PermissionSet,
+                PermissionSet.id
+                == application_roles_permission_sets.c.permission_set_id,
+            )
+            .filter(ApplicationRole.user_id == user.id)
+            .filter(ApplicationRole.status != ApplicationRoleStatus.DISABLED)
+            .filter(ApplicationRole.deleted == False)
+            .group_by(ApplicationRole.application_id)
+        )
+
+        principal = cls(user.id)
+        for portfolio_id, application_id, permissions_mask, active in atat.union_all(
+            portfolios, applications
+        ):
+            if application_id:
+                principal.applications[application_id] = permissions_mask
+            elif portfolio_id:
+                principal.portfolios[portfolio_id] = permissions_mask
+            else:
+                principal.atat = permissions_mask
+
+            if not active:
+                principal.pending.add(application_id or portfolio_id)
+
+        return principal
+
+    def has_atat_permission(self, permission):
+        return bool(self.atat & permission_bit(permission))
+
+    def has_portfolio_permission(self, portfolio_id, permission):
+        return bool(self.portfolios.get(portfolio_id, 0) & permission_bit(permission))
+
+    def has_application_permission(self, application_id, permission):
+        return bool(
+            self.applications.get(application_id, 0) & permission_bit(permission)
+        )
+
+    def portfolio_ids_with(self, permission, active_only=False):
+        return self._ids_with(self.portfolios, permission, active_only)
+
+    def application_ids_with(self, permission, active_only=False):
+        return self._ids_with(self.applications, permission, active_only)
+
+    def _ids_with(self, masks, permission, active_only):
+        bit = permission_bit(permission)
+        return {
+            id_
+            for id_, mask in masks.items()
+            if mask & bit and not (active_only and id_ in self.pending)
+        }
+
+
+def get_principal(user):
+    """
+    Return the user's Principal. During a request it is loaded once and kept
+    on `g`; outside of one it is loaded every time.
+    """
+    if not has_request_context():
+        return Principal.load(user)
+
+    principals = g.setdefault("principals", {})
+    if user.id not in principals:
+        principals[user.id] = Principal.load(user)
+
+    return principals[user.id]
+
+
+def clear_principals(*args):
+    g.pop("principals", None)
+
+
+@event.listens_for(Session, "after_flush")
+def invalidate_principals(session, flush_context):
+    """
+    Drop the cached Principal of any user whose roles or permission sets
+    were changed in this request, so that later checks see the change.
+    """
+    if not has_request_context() or not g.get("principals"):
+        return
+
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, (PortfolioRole, ApplicationRole)):
+            g.principals.pop(obj.user_id, None)
+        elif isinstance(obj, User):
+            g.principals.pop(obj.id, None)
+        elif isinstance(obj, PermissionSet):
+            g.principals.clear()
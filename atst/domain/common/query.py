@@ -1,3 +1,12 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from math import ceil
+from uuid import UUID
+
+from sqlalchemy import DateTime, func, literal, tuple_
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.exc import DataError
 from sqlalchemy.orm.exc import NoResultFound
 
@@ -22,6 +31,7 @@ class Paginator(object):
         return {
             "page": int(request.args.get("page", default_page)),
             "per_page": int(request.args.get("perPage", default_per_page)),
+            "cursor": request.args.get("cursor"),
         }
 
     @classmethod
@@ -35,6 +45,12 @@ class Paginator(object):
         else:
             return query.all()
 
+    def page_params(self, page):
+        """
+        The query string parameters of the link to a page.
+        """
+        return {"page": page}
+
     def __getattr__(self, name):
         return getattr(self.query_set, name)
 
@@ -45,6 +61,186 @@ class Paginator(object):
         return self.items.__len__()
 
 
+# results with up to this many rows are counted; past that, pages only link
+# to their neighbours
+EXACT_COUNT_LIMIT = 10000
+
+
+def bounded_count(query):
+    """
+    The number of rows the query returns, or None if there are more than
+    EXACT_COUNT_LIMIT, without counting every row.
+    """
+    count = (
+        db.session.query(func.count())
+        .select_from(query.order_by(None).limit(EXACT_COUNT_LIMIT + 1).subquery())
+        .scalar()
+    )
+    if count <= EXACT_COUNT_LIMIT:
+        return count
+
+
+def _encode_cursor_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    elif isinstance(value, UUID):
+        return str(value)
+    else:
+        raise TypeError()
+
+
+def _decode_cursor_value(value, key):
+    if not isinstance(value, str):
+        raise TypeError()
+    elif isinstance(key.type, DateTime):
+        return datetime.fromisoformat(value)
+    elif isinstance(key.type, PG_UUID):
+        return UUID(value)
+    else:
+        raise TypeError()
+
+
+class KeysetPaginator(Paginator):
+    """
+    Paginates a query ordered by `keys`, newest first, by seeking past the
+    rows of the page the user came from instead of with OFFSET. Links to
+    other pages carry a cursor: the page they were made on and the keys of
+    its first or last row. Only pages in the window around it are skipped
+    over with OFFSET, and the last page is read from the other end, so the
+    cost of a page doesn't grow with how far into the results it is. A page
+    requested without a cursor is read with OFFSET.
+
+    Results of more than EXACT_COUNT_LIMIT rows aren't counted, so `total`
+    and `pages` are None and there is no last page to link to. Each page
+    then reads one row more than it shows to find out whether there is a
+    next one.
+    """
+
+    def __init__(self, query, keys, page=1, per_page=100, cursor=None):
+        self.keys = keys
+        self.page = max(page, 1)
+        self.per_page = per_page
+        self.cursor = cursor
+        self.total = bounded_count(query)
+        self._has_next = False
+        self.items = self._fetch(query.order_by(None))
+
+    @classmethod
+    def paginate(cls, query, keys, pagination_opts=None):
+        if pagination_opts is not None:
+            return cls(
+                query,
+                keys,
+                page=pagination_opts["page"],
+                per_page=pagination_opts["per_page"],
+                cursor=pagination_opts.get("cursor"),
+            )
+        else:
+            return query.order_by(*[key.desc() for key in keys]).all()
+
+    def __getattr__(self, name):
+        # nothing to proxy to
+        raise AttributeError(name)
+
+    @property
+    def pages(self):
+        if self.total is not None:
+            return max(ceil(self.total / self.per_page), 1)
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        if self.total is None:
+            return self._has_next
+        return self.page < self.pages
+
+    def page_params(self, page):
+        if page == self.page and self.cursor:
+            return {"page": page, "cursor": self.cursor}
+        elif page in (1, self.page, self.pages) or not self.items:
+            return {"page": page}
+
+        row = self.items[-1] if page > self.page else self.items[0]
+        values = [getattr(row, key.key) for key in self.keys]
+        cursor = json.dumps([self.page, values], default=_encode_cursor_value)
+
+        return {
+            "page": page,
+            "cursor": base64.urlsafe_b64encode(cursor.encode()).decode(),
+        }
+
+    def _decode_cursor(self):
+        """
+        The page and keys in the cursor, or None if it isn't one this
+        paginator made. The keys are parsed here rather than by the database,
+        so that a tampered cursor is ignored instead of failing the query.
+        """
+        try:
+            page, values = json.loads(base64.urlsafe_b64decode(self.cursor.encode()))
+            if (
+                not isinstance(page, int)
+                or not isinstance(values, list)
+                or len(values) != len(self.keys)
+            ):
+                return None
+
+            values = [
+                _decode_cursor_value(value, key)
+                for (key, value) in zip(self.keys, values)
+            ]
+        except (binascii.Error, TypeError, ValueError):
+            return None
+
+        return (
+            page,
+            tuple_(
+                *[literal(value, key.type) for (key, value) in zip(self.keys, values)]
+            ),
+        )
+
+    def _fetch(self, query):
+        newest_first = [key.desc() for key in self.keys]
+        oldest_first = [key.asc() for key in self.keys]
+        cursor = self.cursor and self._decode_cursor()
+
+        if self.page > 1 and self.page == self.pages:
+            last_page_size = self.total - (self.pages - 1) * self.per_page
+            return list(
+                reversed(query.order_by(*oldest_first).limit(last_page_size).all())
+            )
+        elif self.page > 1 and cursor and cursor[0] != self.page:
+            from_page, values = cursor
+            if self.page > from_page:
+                return self._read_page(
+                    query.filter(tuple_(*self.keys) < values)
+                    .order_by(*newest_first)
+                    .offset((self.page - from_page - 1) * self.per_page)
+                )
+            else:
+                self._has_next = True
+                return list(
+                    reversed(
+                        query.filter(tuple_(*self.keys) > values)
+                        .order_by(*oldest_first)
+                        .offset((from_page - self.page - 1) * self.per_page)
+                        .limit(self.per_page)
+                        .all()
+                    )
+                )
+        else:
+            return self._read_page(
+                query.order_by(*newest_first).offset((self.page - 1) * self.per_page)
+            )
+
+    def _read_page(self, query):
+        rows = query.limit(self.per_page + 1).all()
+        self._has_next = len(rows) > self.per_page
+        return rows[: self.per_page]
+
+
 class Query(object):
 
     model = None
@@ -1,4 +1,11 @@
-from sqlalchemy.orm.exc import NoResultFound
+import threading
+import time
+from copy import copy
+
+from flask import current_app as app
+from redis.exceptions import RedisError
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 from atst.database import db
 from atst.models.permissions import Permissions
@@ -25,31 +32,165 @@ class PermissionSets(object):
     EDIT_APPLICATION_TEAM = "edit_application_team"
     DELETE_APPLICATION_ENVIRONMENTS = "delete_application_environments"
 
+    # Permission sets are seed data, so every worker keeps a detached copy of
+    # each one, keyed by name. `get`, `get_many` and `get_all` merge the
+    # copies into the current session without querying. Every worker's copy
+    # is dropped when a permission set is changed (see
+    # `_clear_cache_on_change`) or `clear_cache` is called, as
+    # script/seed_roles.py does, by bumping a version number in Redis. Lookups
+    # check that version at most every VERSION_CHECK_INTERVAL seconds, and
+    # keep serving the copies while Redis is unavailable.
+    CACHE_VERSION_KEY = "permission-sets-version"
+    VERSION_CHECK_INTERVAL = 5
+    _cache = None
+    _cache_version = None
+    _version_checked_at = None
+    _cache_lock = threading.Lock()
+
     @classmethod
     def get(cls, perms_set_name):
-        try:
-            role = db.session.query(PermissionSet).filter_by(name=perms_set_name).one()
-        except NoResultFound:
+        permission_set = cls._cached(perms_set_name)
+        if permission_set is None:
             raise NotFoundError("permission_set")
 
-        return role
+        return db.session.merge(permission_set, load=False)
 
     @classmethod
     def get_all(cls):
-        return db.session.query(PermissionSet).all()
+        return [
+            db.session.merge(permission_set, load=False)
+            for permission_set in cls._load_cache().values()
+        ]
 
     @classmethod
     def get_many(cls, perms_set_names):
-        permission_sets = (
-            db.session.query(PermissionSet)
-            .filter(PermissionSet.name.in_(perms_set_names))
-            .all()
-        )
+        cache = cls._load_cache()
+        if not set(perms_set_names) <= cache.keys():
+            # some of the sets may have been seeded since the cache was loaded
+            cls._drop_local_cache()
+            cache = cls._load_cache()
+            if not set(perms_set_names) <= cache.keys():
+                raise NotFoundError("permission_set")
 
+        # in the order they were loaded, like the query this replaced
+        permission_sets = [
+            permission_set
+            for name, permission_set in cache.items()
+            if name in perms_set_names
+        ]
         if len(permission_sets) != len(perms_set_names):
             raise NotFoundError("permission_set")
 
-        return permission_sets
+        return [
+            db.session.merge(permission_set, load=False)
+            for permission_set in permission_sets
+        ]
+
+    @classmethod
+    def clear_cache(cls):
+        """
+        Drop the cached permission sets in every worker.
+        """
+        cls._drop_local_cache()
+        try:
+            app.redis.incr(cls.CACHE_VERSION_KEY)
+        except RedisError as error:
+            app.logger.warning(
+                "Could not clear the permission set cache of other workers: {}".format(
+                    error
+                )
+            )
+
+    @classmethod
+    def _drop_local_cache(cls):
+        cls._cache = None
+
+    @classmethod
+    def _current_version(cls):
+        try:
+            return app.redis.get(cls.CACHE_VERSION_KEY)
+        except RedisError:
+            return _UNKNOWN_VERSION
+
+    @classmethod
+    def _load_cache(cls):
+        cache = cls._cache
+        if cache is not None and not cls._version_check_due():
+            return cache
+
+        # read before the permission sets are, so that a change made while
+        # they load leaves them cached under an outdated version
+        version = cls._current_version()
+        with cls._cache_lock:
+            cache = cls._cache
+            if cache is None or not cls._is_current(version):
+                cache = {
+                    permission_set.name: _detached_copy(permission_set)
+                    for permission_set in db.session.query(PermissionSet)
+                }
+                cls._cache = cache
+                cls._cache_version = version
+            cls._version_checked_at = time.monotonic()
+
+        return cache
+
+    @classmethod
+    def _version_check_due(cls):
+        return (
+            cls._version_checked_at is None
+            or time.monotonic() - cls._version_checked_at >= cls.VERSION_CHECK_INTERVAL
+        )
+
+    @classmethod
+    def _is_current(cls, version):
+        # without a version to check against, the cache is kept until Redis
+        # is back; a cache loaded meanwhile is then reloaded once
+        return version is _UNKNOWN_VERSION or version == cls._cache_version
+
+    @classmethod
+    def _cached(cls, name):
+        permission_set = cls._load_cache().get(name)
+        if permission_set is None:
+            # the set may have been seeded since the cache was loaded
+            cls._drop_local_cache()
+            permission_set = cls._load_cache().get(name)
+
+        return permission_set
+
+
+_UNKNOWN_VERSION = object()
+
+
+def _detached_copy(permission_set):
+    columns = {
+        attr.key: copy(getattr(permission_set, attr.key))
+        for attr in inspect(PermissionSet).column_attrs
+    }
+    permission_set = PermissionSet(**columns)
+    make_transient_to_detached(permission_set)
+    return permission_set
+
+
+@event.listens_for(Session, "after_flush")
+def _clear_cache_on_change(session, flush_context):
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, PermissionSet):
+            # other workers can only load the change once it is committed
+            PermissionSets._drop_local_cache()
+            session.info["permission_sets_changed"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _clear_other_caches_on_commit(session):
+    if session.info.pop("permission_sets_changed", False):
+        PermissionSets.clear_cache()
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_cache_on_rollback(session):
+    if session.info.pop("permission_sets_changed", False):
+        PermissionSets._drop_local_cache()
 
 
 ATAT_PERMISSION_SETS = [
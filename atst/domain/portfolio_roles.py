@@ -1,7 +1,12 @@
 from sqlalchemy.orm.exc import NoResultFound
 
 from atst.database import db
-from atst.models.portfolio_role import PortfolioRole, Status as PortfolioRoleStatus
+from atst.models.permission_set import PermissionSet
+from atst.models.portfolio_role import (
+    PortfolioRole,
+    Status as PortfolioRoleStatus,
+    portfolio_roles_permission_sets,
+)
 from atst.models.user import User
 
 from .permission_sets import PermissionSets
@@ -30,6 +35,30 @@ class PortfolioRoles(object):
         except NoResultFound:
             raise NotFoundError("portfolio_role")
 
+    @classmethod
+    def users_with_permission(cls, portfolio_id, permission):
+        """
+        The users whose role in the portfolio grants `permission`. Disabled
+        roles grant nothing.
+        """
+        return (
+            db.session.query(User)
+            .join(PortfolioRole, PortfolioRole.user_id == User.id)
+            .join(
+                portfolio_roles_permission_sets,
+                portfolio_roles_permission_sets.c.portfolio_role_id == PortfolioRole.id,
+            )
+            .join(
+                PermissionSet,
+                PermissionSet.id == portfolio_roles_permission_sets.c.permission_set_id,
+            )
+            .filter(PortfolioRole.portfolio_id == portfolio_id)
+            .filter(PortfolioRole.status != PortfolioRoleStatus.DISABLED)
+            .filter(PermissionSet.grants(permission))
+            .distinct()
+            .all()
+        )
+
     @classmethod
     def add(cls, user, portfolio_id, permission_sets=None):
         new_portfolio_role = None
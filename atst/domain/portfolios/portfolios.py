@@ -34,7 +34,7 @@ class Portfolios(object):
     @classmethod
     def get(cls, user, portfolio_id):
         portfolio = PortfoliosQuery.get(portfolio_id)
-        return ScopedPortfolio(user, portfolio)
+        return ScopedPortfolio.for_request(user, portfolio)
 
     @classmethod
     def delete(cls, portfolio):
@@ -65,6 +65,20 @@ class Portfolios(object):
             portfolios = PortfoliosQuery.get_for_user(user)
         return portfolios
 
+    @classmethod
+    def names_for_user(cls, user):
+        """
+        Like `for_user`, but only the id and name of each portfolio.
+        """
+        if Authorization.has_atat_permission(user, Permissions.VIEW_PORTFOLIO):
+            return PortfoliosQuery.get_all_names()
+        else:
+            return PortfoliosQuery.get_names_for_user(user)
+
+    @classmethod
+    def funding_versions(cls, portfolio):
+        return PortfoliosQuery.get_funding_versions(portfolio.id)
+
     @classmethod
     def add_member(cls, portfolio, member, permission_sets=None):
         portfolio_role = PortfolioRoles.add(member, portfolio.id, permission_sets)
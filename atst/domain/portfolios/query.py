@@ -1,4 +1,4 @@
-from sqlalchemy import or_
+from sqlalchemy import and_, exists, func, literal
 from atst.database import db
 from atst.domain.common import Query
 from atst.models.portfolio import Portfolio
@@ -8,52 +8,90 @@ from atst.models.application_role import (
     Status as ApplicationRoleStatus,
 )
 from atst.models.application import Application
+from atst.models.clin import CLIN
+from atst.models.environment import Environment
+from atst.models.task_order import TaskOrder
 
 
 class PortfoliosQuery(Query):
     model = Portfolio
 
     @classmethod
-    def get_for_user(cls, user):
-        return (
-            db.session.query(Portfolio)
-            .filter(
-                or_(
-                    Portfolio.id.in_(
-                        db.session.query(Portfolio.id)
-                        .join(Application)
-                        .filter(Portfolio.id == Application.portfolio_id)
-                        .filter(
-                            Application.id.in_(
-                                db.session.query(Application.id)
-                                .join(ApplicationRole)
-                                .filter(
-                                    ApplicationRole.application_id == Application.id
-                                )
-                                .filter(ApplicationRole.user_id == user.id)
-                                .filter(
-                                    ApplicationRole.status
-                                    == ApplicationRoleStatus.ACTIVE
-                                )
-                                .filter(ApplicationRole.deleted == False)
-                                .subquery()
-                            )
-                        )
-                    ),
-                    Portfolio.id.in_(
-                        db.session.query(Portfolio.id)
-                        .join(PortfolioRole)
-                        .filter(PortfolioRole.user == user)
-                        .filter(PortfolioRole.status == PortfolioRoleStatus.ACTIVE)
-                        .subquery()
-                    ),
+    def _portfolio_ids_for_user(cls, user):
+        """
+        The ids of portfolios where the user has an active portfolio role, or
+        an active role in one of the portfolio's applications. Each side of
+        the UNION is a semi-join on a (user_id, status, ...) index.
+        """
+        application_portfolio_ids = db.session.query(Application.portfolio_id).filter(
+            exists().where(
+                and_(
+                    ApplicationRole.application_id == Application.id,
+                    ApplicationRole.user_id == user.id,
+                    ApplicationRole.status == ApplicationRoleStatus.ACTIVE,
+                    ApplicationRole.deleted == False,
                 )
             )
+        )
+        portfolio_role_ids = (
+            db.session.query(PortfolioRole.portfolio_id)
+            .filter(PortfolioRole.user_id == user.id)
+            .filter(PortfolioRole.status == PortfolioRoleStatus.ACTIVE)
+        )
+        return application_portfolio_ids.union(portfolio_role_ids)
+
+    @classmethod
+    def _filter_for_user(cls, query, user):
+        return (
+            query.filter(Portfolio.id.in_(cls._portfolio_ids_for_user(user)))
             .filter(Portfolio.deleted == False)
             .order_by(Portfolio.name.asc())
-            .all()
         )
 
+    @classmethod
+    def get_for_user(cls, user):
+        return cls._filter_for_user(db.session.query(Portfolio), user).all()
+
+    @classmethod
+    def get_names_for_user(cls, user):
+        return cls._filter_for_user(
+            db.session.query(Portfolio.id, Portfolio.name), user
+        ).all()
+
+    @classmethod
+    def get_all_names(cls):
+        return db.session.query(Portfolio.id, Portfolio.name).all()
+
+    @classmethod
+    def get_funding_versions(cls, portfolio_id):
+        """
+        The latest `time_updated` and the number of rows for the portfolio
+        and each kind of resource its funding and reports pages show. The
+        counts catch deleted rows, which leave no newer timestamp behind.
+        """
+        portfolio = db.session.query(
+            func.max(Portfolio.time_updated), func.count(literal(1))
+        ).filter(Portfolio.id == portfolio_id)
+        applications = db.session.query(
+            func.max(Application.time_updated), func.count(Application.id)
+        ).filter(Application.portfolio_id == portfolio_id)
+        environments = (
+            db.session.query(
+                func.max(Environment.time_updated), func.count(Environment.id)
+            )
+            .join(Application, Application.id == Environment.application_id)
+            .filter(Application.portfolio_id == portfolio_id)
+        )
+        task_orders = db.session.query(
+            func.max(TaskOrder.time_updated), func.count(TaskOrder.id)
+        ).filter(TaskOrder.portfolio_id == portfolio_id)
+        clins = (
+            db.session.query(func.max(CLIN.time_updated), func.count(CLIN.id))
+            .join(TaskOrder, TaskOrder.id == CLIN.task_order_id)
+            .filter(TaskOrder.portfolio_id == portfolio_id)
+        )
+        return portfolio.union_all(applications, environments, task_orders, clins).all()
+
     @classmethod
     def create_portfolio_role(cls, user, portfolio, **kwargs):
         return PortfolioRole(user=user, portfolio=portfolio, **kwargs)
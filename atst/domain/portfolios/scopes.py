@@ -1,6 +1,49 @@
+from functools import wraps
+
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
 from atst.domain.authz import Authorization
+from atst.models.application import Application
+from atst.models.application_role import ApplicationRole
+from atst.models.permission_set import PermissionSet
 from atst.models.permissions import Permissions
-from atst.domain.applications import Applications
+from atst.models.portfolio import Portfolio
+from atst.models.portfolio_role import PortfolioRole
+
+
+class ResourceAttribute(object):
+    """
+    An attribute read straight from the wrapped resource. Commonly used
+    attributes are declared with it so they are found by normal attribute
+    lookup instead of falling through to `ScopedResource.__getattr__`.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, scoped, owner):
+        if scoped is None:
+            return self
+        return getattr(scoped.resource, self.name)
+
+
+def scoped_collection(method):
+    """
+    A property that is computed once and kept until the scoped resource's
+    memo is cleared.
+    """
+    name = method.__name__
+
+    @property
+    @wraps(method)
+    def _scoped_collection(self):
+        if name not in self._memo:
+            self._memo[name] = method(self)
+        return self._memo[name]
+
+    return _scoped_collection
 
 
 class ScopedResource(object):
@@ -9,7 +52,11 @@ class ScopedResource(object):
     in some way by the priveleges of the user viewing that resource.
     """
 
+    id = ResourceAttribute("id")
+    name = ResourceAttribute("name")
+
     def __init__(self, user, resource):
+        self._memo = {}
         self.user = user
         self.resource = resource
 
@@ -19,6 +66,27 @@ class ScopedResource(object):
     def __eq__(self, other):
         return self.resource == other
 
+    def clear_memo(self):
+        self._memo.clear()
+
+    @classmethod
+    def for_request(cls, user, resource):
+        """
+        Return the scoped resource for the user, shared by everything that
+        asks for it during a request so that its scoped collections are only
+        computed once. Outside of a request a new one is returned every time.
+        """
+        if not has_request_context():
+            return cls(user, resource)
+
+        scoped_resources = g.setdefault("scoped_resources", {})
+        key = (cls, user.id, resource.id)
+        scoped = scoped_resources.get(key)
+        if scoped is None or scoped.resource is not resource:
+            scoped = scoped_resources[key] = cls(user, resource)
+
+        return scoped
+
 
 class ScopedPortfolio(ScopedResource):
     """
@@ -27,7 +95,12 @@ class ScopedPortfolio(ScopedResource):
     that the given user is allowed to see.
     """
 
-    @property
+    owner = ResourceAttribute("owner")
+    members = ResourceAttribute("members")
+    task_orders = ResourceAttribute("task_orders")
+    active_task_orders = ResourceAttribute("active_task_orders")
+
+    @scoped_collection
     def applications(self):
         can_view_all_applications = Authorization.has_portfolio_permission(
             self.user, self.resource, Permissions.VIEW_APPLICATION
@@ -36,4 +109,38 @@ class ScopedPortfolio(ScopedResource):
         if can_view_all_applications:
             return self.resource.applications
         else:
-            return Applications.for_user(self.user, self.resource)
+            allowed = Authorization.allowed_application_ids(
+                self.user,
+                Permissions.VIEW_APPLICATION,
+                [application.id for application in self.resource.applications],
+                active_only=True,
+            )
+            return [
+                application
+                for application in self.resource.applications
+                if application.id in allowed
+            ]
+
+
+def clear_scoped_resources(*args):
+    g.pop("scoped_resources", None)
+
+
+SCOPE_MODELS = (Application, ApplicationRole, PermissionSet, Portfolio, PortfolioRole)
+
+
+@event.listens_for(Session, "after_flush")
+def _clear_scoped_collections(session, flush_context):
+    """
+    Recompute scoped collections after any change that could affect them,
+    such as a new application or a changed role.
+    """
+    if not has_request_context() or not g.get("scoped_resources"):
+        return
+
+    if any(
+        isinstance(obj, SCOPE_MODELS)
+        for obj in session.new | session.dirty | session.deleted
+    ):
+        for scoped in g.scoped_resources.values():
+            scoped.clear_memo()
@@ -0,0 +1,144 @@
+from collections import namedtuple
+
+from flask import current_app as app, has_app_context
+from redis.exceptions import RedisError
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from atst.models.application_role import ApplicationRole
+from atst.models.portfolio import Portfolio
+from atst.models.portfolio_role import PortfolioRole
+from atst.models.user import User
+
+from .portfolios import Portfolios
+
+
+SidebarPortfolio = namedtuple("SidebarPortfolio", ["id", "name"])
+
+
+class SidebarPortfolios(object):
+    """
+    The id and name of each portfolio in a user's sidebar.
+
+    Lists are cached under a key that includes two version counters kept in
+    Redis: one per user, bumped when their roles or permission sets change,
+    and a global one, bumped when a portfolio is created, renamed or deleted.
+    Bumping a counter invalidates the cached lists in every worker at once.
+    Without a cache, or if Redis can't be reached, lists are always loaded
+    from the database.
+    """
+
+    VERSION_KEY = "sidebar-portfolios-version"
+
+    def __init__(self, cache=None, redis=None):
+        self.cache = cache
+        self.redis = redis
+
+    def for_user(self, user):
+        key = self._cache_key(user.id)
+        portfolios = self.cache.get(key) if key else None
+        if portfolios is None:
+            portfolios = [
+                [str(id_), name] for (id_, name) in Portfolios.names_for_user(user)
+            ]
+            if key:
+                self.cache.set(key, portfolios)
+
+        return [SidebarPortfolio(*portfolio) for portfolio in portfolios]
+
+    def invalidate(self, user_ids=(), all_users=False):
+        if self.cache is None:
+            return
+
+        try:
+            pipeline = self.redis.pipeline()
+            if all_users:
+                pipeline.incr(self.VERSION_KEY)
+            for user_id in user_ids:
+                user_key = self._user_version_key(user_id)
+                pipeline.incr(user_key)
+                # lists cached before the first bump expire before the
+                # counter does, so it can safely start over from zero
+                pipeline.expire(user_key, self.cache.ttl)
+            pipeline.execute()
+        except RedisError:
+            pass
+
+    def _cache_key(self, user_id):
+        if self.cache is None:
+            return None
+
+        try:
+            versions = self.redis.mget(
+                self.VERSION_KEY, self._user_version_key(user_id)
+            )
+        except RedisError:
+            return None
+
+        return "{}:{}".format(
+            user_id, ":".join(str(int(version or 0)) for version in versions)
+        )
+
+    def _user_version_key(self, user_id):
+        return "{}:{}".format(self.VERSION_KEY, user_id)
+
+
+class LazyList(object):
+    """
+    A list that is only built the first time it is used, so that templates
+    that never show it don't pay for it.
+    """
+
+    def __init__(self, load):
+        self._load = load
+        self._items = None
+
+    @property
+    def items(self):
+        if self._items is None:
+            self._items = self._load()
+        return self._items
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+
+def _changed(obj, *keys):
+    state = inspect(obj)
+    return any(state.attrs[key].history.has_changes() for key in keys)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_sidebar_changes(session, flush_context):
+    user_ids = session.info.setdefault("sidebar_user_ids", set())
+    dirty = session.dirty
+    for obj in session.new | dirty | session.deleted:
+        if isinstance(obj, (PortfolioRole, ApplicationRole)):
+            user_ids.add(obj.user_id)
+        elif isinstance(obj, User) and obj in dirty:
+            user_ids.add(obj.id)
+        elif isinstance(obj, Portfolio) and (
+            obj not in dirty or _changed(obj, "name", "deleted")
+        ):
+            session.info["sidebar_all_users"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_sidebars(session):
+    user_ids = session.info.pop("sidebar_user_ids", set())
+    all_users = session.info.pop("sidebar_all_users", False)
+    sidebar_portfolios = has_app_context() and getattr(app, "sidebar_portfolios", None)
+    if sidebar_portfolios and (user_ids or all_users):
+        sidebar_portfolios.invalidate(user_ids, all_users=all_users)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_sidebar_changes(session):
+    session.info.pop("sidebar_user_ids", None)
+    session.info.pop("sidebar_all_users", None)
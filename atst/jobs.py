@@ -1,3 +1,5 @@
+import socket
+
 from flask import current_app as app
 import pendulum
 
@@ -8,6 +10,7 @@ from atst.models import (
     EnvironmentRoleJobFailure,
     EnvironmentRole,
 )
+from atst.domain.audit_partitions import AuditEventPartitions
 from atst.domain.csp.cloud import CloudProviderInterface, GeneralCSPException
 from atst.domain.environments import Environments
 from atst.domain.environment_roles import EnvironmentRoles
@@ -166,3 +169,34 @@ def dispatch_provision_user(self):
         environment_role_id
     ) in EnvironmentRoles.get_environment_roles_pending_creation():
         provision_user.delay(environment_role_id=environment_role_id)
+
+
+@celery.task(bind=True)
+def load_audit_events(self):
+    app.audit_stream.load(self.request.hostname or socket.gethostname())
+
+    lag = app.audit_stream.lag()
+    app.logger.info(
+        "Audit event stream: {} waiting, {} in the outbox".format(
+            lag["stream_length"], lag["outbox_length"]
+        ),
+        extra={"tags": ["audit_stream"], "audit_stream": lag},
+    )
+
+
+@celery.task(bind=True)
+def create_audit_event_partitions(self):
+    for name in AuditEventPartitions.create():
+        app.logger.info("Created audit event partition {}".format(name))
+
+
+@celery.task(bind=True)
+def archive_audit_event_partitions(self):
+    retention_months = app.config.get("AUDIT_LOG_RETENTION_MONTHS")
+    if not retention_months:
+        return
+
+    for path in AuditEventPartitions.archive(
+        app.config["AUDIT_LOG_ARCHIVE_DIR"], retention_months
+    ):
+        app.logger.info("Archived audit events to {}".format(path))
@@ -3,7 +3,7 @@ from .application import Application
 from .application_invitation import ApplicationInvitation
 from .application_role import ApplicationRole, Status as ApplicationRoleStatus
 from .attachment import Attachment
-from .audit_event import AuditEvent
+from .audit_event import AuditEvent, AuditEventOutbox
 from .clin import CLIN, JEDICLINType
 from .environment import Environment
 from .environment_role import EnvironmentRole, CSPRole
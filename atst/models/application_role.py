@@ -1,7 +1,7 @@
 from enum import Enum
 from sqlalchemy import Index, ForeignKey, Column, Enum as SQLAEnum, Table
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import column_property, relationship
 from sqlalchemy.event import listen
 
 from atst.utils import first_or_none
@@ -35,6 +35,7 @@ class ApplicationRole(
     mixins.DeletableMixin,
 ):
     __tablename__ = "application_roles"
+    audit_relationships = ("application.portfolio", "user")
 
     id = types.Id()
     application_id = Column(
@@ -46,8 +47,13 @@ class ApplicationRole(
         UUID(as_uuid=True), ForeignKey("users.id"), index=True, nullable=True
     )
 
-    status = Column(
-        SQLAEnum(Status, native_enum=False), default=Status.PENDING, nullable=False
+    # the previous status is needed for the audit log even when it was never
+    # loaded before being changed
+    status = column_property(
+        Column(
+            SQLAEnum(Status, native_enum=False), default=Status.PENDING, nullable=False
+        ),
+        active_history=True,
     )
 
     permission_sets = relationship(
@@ -141,6 +147,14 @@ Index(
     unique=True,
 )
 
+Index(
+    "application_role_user_status_deleted_application",
+    ApplicationRole.user_id,
+    ApplicationRole.status,
+    ApplicationRole.deleted,
+    ApplicationRole.application_id,
+)
+
 
 listen(
     ApplicationRole.permission_sets,
@@ -1,4 +1,4 @@
-from sqlalchemy import String, Column, ForeignKey, inspect
+from sqlalchemy import BigInteger, Column, ForeignKey, Index, String, TIMESTAMP, func
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 
@@ -7,20 +7,31 @@ import atst.models.types as types
 from atst.models.mixins.timestamps import TimestampsMixin
 
 
+def _str_or_none(value):
+    return str(value) if value is not None else None
+
+
 class AuditEvent(Base, TimestampsMixin):
     __tablename__ = "audit_events"
+    # partitioned by month, see atst.domain.audit_partitions
+    __table_args__ = {"postgresql_partition_by": "RANGE (time_created)"}
 
     id = types.Id()
+    # the partition key is part of every unique index
+    time_created = Column(
+        TIMESTAMP(timezone=True),
+        primary_key=True,
+        nullable=False,
+        server_default=func.now(),
+    )
 
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), index=True)
     user = relationship("User", backref="audit_events")
 
-    portfolio_id = Column(UUID(as_uuid=True), ForeignKey("portfolios.id"), index=True)
+    portfolio_id = Column(UUID(as_uuid=True), ForeignKey("portfolios.id"))
     portfolio = relationship("Portfolio", backref="audit_events")
 
-    application_id = Column(
-        UUID(as_uuid=True), ForeignKey("applications.id"), index=True
-    )
+    application_id = Column(UUID(as_uuid=True), ForeignKey("applications.id"))
     application = relationship("Application", backref="audit_events")
 
     changed_state = Column(JSONB())
@@ -32,11 +43,18 @@ class AuditEvent(Base, TimestampsMixin):
     display_name = Column(String())
     action = Column(String(), nullable=False)
 
+    # the stream entry or outbox row an asynchronously logged event was
+    # loaded from, so that loading it again has no effect
+    stream_id = Column(String())
+
     @property
     def log(self):
         return {
-            "portfolio_id": str(self.portfolio_id),
-            "application_id": str(self.application_id),
+            "id": str(self.id),
+            "time_created": self.time_created.isoformat(),
+            "user_id": _str_or_none(self.user_id),
+            "portfolio_id": _str_or_none(self.portfolio_id),
+            "application_id": _str_or_none(self.application_id),
             "changed_state": self.changed_state,
             "event_details": self.event_details,
             "resource_type": self.resource_type,
@@ -45,12 +63,56 @@ class AuditEvent(Base, TimestampsMixin):
             "action": self.action,
         }
 
-    def save(self, connection):
-        attrs = inspect(self).dict
-
-        connection.execute(self.__table__.insert(), **attrs)
+    @classmethod
+    def save_all(cls, connection, audit_events):
+        """
+        Insert the audit events, given as dictionaries of column values, with
+        a single multi-row INSERT.
+        """
+        connection.execute(cls.__table__.insert().values(audit_events))
 
     def __repr__(self):  # pragma: no cover
         return "<AuditEvent(name='{}', action='{}', id='{}')>".format(
             self.display_name, self.action, self.id
         )
+
+
+# the audit log is paginated by (time_created, id), newest first
+Index("audit_events_time_created_id", AuditEvent.time_created, AuditEvent.id)
+
+Index(
+    "audit_events_portfolio_time_created_id",
+    AuditEvent.portfolio_id,
+    AuditEvent.time_created,
+    AuditEvent.id,
+)
+
+Index(
+    "audit_events_application_time_created_id",
+    AuditEvent.application_id,
+    AuditEvent.time_created,
+    AuditEvent.id,
+)
+
+Index(
+    "audit_events_stream_id_time_created",
+    AuditEvent.stream_id,
+    AuditEvent.time_created,
+    unique=True,
+)
+
+
+class AuditEventOutbox(Base):
+    """
+    Audit events that could not be added to the audit event stream, kept
+    until they are loaded into the audit log. `event` is the event encoded
+    the same way as on the stream.
+    """
+
+    __tablename__ = "audit_event_outbox"
+
+    id = Column(BigInteger, primary_key=True)
+    time_created = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=func.now()
+    )
+    event = Column(String(), nullable=False)
@@ -12,6 +12,7 @@ class Environment(
     Base, mixins.TimestampsMixin, mixins.AuditableMixin, mixins.DeletableMixin
 ):
     __tablename__ = "environments"
+    audit_relationships = ("application",)
 
     id = types.Id()
     name = Column(String, nullable=False)
@@ -19,6 +19,7 @@ class EnvironmentRole(
     Base, mixins.TimestampsMixin, mixins.AuditableMixin, mixins.DeletableMixin
 ):
     __tablename__ = "environment_roles"
+    audit_relationships = ("environment.application.portfolio", "application_role.user")
 
     id = types.Id()
     environment_id = Column(
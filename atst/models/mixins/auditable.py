@@ -1,4 +1,9 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
 from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, joinedload, object_session
+from sqlalchemy.orm.interfaces import MANYTOONE
 from flask import g, current_app as app
 
 from atst.models.audit_event import AuditEvent
@@ -10,37 +15,25 @@ ACTION_DELETE = "delete"
 
 
 class AuditableMixin(object):
+    # Many-to-one relationship paths that `portfolio_id`, `application_id`,
+    # `displayname` and `event_details` follow. They are loaded for all of a
+    # flush's audit events at once instead of lazily, one row at a time.
+    audit_relationships = ()
+
     @staticmethod
     def create_audit_event(connection, resource, action, changed_state=None):
-        user_id = getattr_path(g, "current_user.id")
-
+        """
+        Queue an audit event for the resource on its session. Queued events
+        are logged and saved together when the session is flushed.
+        """
         if changed_state is None:
             changed_state = resource.history if action == ACTION_UPDATE else None
 
-        log_data = {
-            "user_id": user_id,
-            "portfolio_id": resource.portfolio_id,
-            "application_id": resource.application_id,
-            "resource_type": resource.resource_type,
-            "resource_id": resource.id,
-            "display_name": resource.displayname,
-            "action": action,
-            "changed_state": changed_state,
-            "event_details": resource.event_details,
-        }
-
-        app.logger.info(
-            "Audit Event {}".format(action),
-            extra={
-                "audit_event": {key: str(value) for key, value in log_data.items()},
-                "tags": ["audit_event", action],
-            },
+        session = object_session(resource)
+        session.info.setdefault("audit_events", []).append(
+            (resource, action, changed_state, getattr_path(g, "current_user.id"))
         )
 
-        if app.config.get("USE_AUDIT_LOG", False):
-            audit_event = AuditEvent(**log_data)
-            audit_event.save(connection)
-
     @classmethod
     def __declare_last__(cls):
         event.listen(cls, "after_insert", cls.audit_insert)
@@ -119,3 +112,147 @@ def record_permission_sets_updates(instance_state, permission_sets, initiator):
             ACTION_UPDATE,
             changed_state=changed_state,
         )
+
+
+def _path_loaded(obj, keys):
+    for key in keys:
+        state = inspect(obj)
+        if key in state.unloaded:
+            return False
+        obj = state.dict.get(key)
+        if obj is None:
+            return True
+    return True
+
+
+def _load_audit_relationships(session, resources):
+    """
+    Load the `audit_relationships` of the resources with one query per
+    relationship path, so that building their audit events finds every
+    related row in the identity map. The loaded rows are returned because
+    the identity map only keeps them while they are referenced.
+    """
+    loaded = []
+    by_type = {}
+    for resource in resources:
+        by_type.setdefault(type(resource), set()).add(resource)
+
+    for resource_type, typed_resources in by_type.items():
+        mapper = inspect(resource_type)
+        for path in resource_type.audit_relationships:
+            first, *rest = path.split(".")
+            relationship = mapper.relationships[first]
+            if relationship.direction != MANYTOONE:  # pragma: no cover
+                continue
+
+            target = relationship.mapper
+            (column,) = [
+                local
+                for (local, remote) in relationship.local_remote_pairs
+                if remote in target.primary_key
+            ]
+            key = mapper.get_property_by_column(column).key
+            ids = {
+                getattr(resource, key)
+                for resource in typed_resources
+                if not _path_loaded(resource, path.split("."))
+            } - {None}
+            if not ids:
+                continue
+
+            query = session.query(target).filter(target.primary_key[0].in_(ids))
+            if rest:
+                option = joinedload(rest[0])
+                for related in rest[1:]:
+                    option = option.joinedload(related)
+                query = query.options(option)
+            loaded.extend(query.all())
+
+    return loaded
+
+
+@event.listens_for(Session, "after_flush")
+def _save_audit_events(session, flush_context):
+    queued = session.info.pop("audit_events", None)
+    if not queued:
+        return
+
+    # referenced until the events are built, so they stay in the identity map
+    session.info["audit_related_rows"] = _load_audit_relationships(
+        session, [resource for (resource, *_) in queued]
+    )
+
+    audit_events = []
+    for resource, action, changed_state, user_id in queued:
+        log_data = {
+            "user_id": user_id,
+            "portfolio_id": resource.portfolio_id,
+            "application_id": resource.application_id,
+            "resource_type": resource.resource_type,
+            "resource_id": resource.id,
+            "display_name": resource.displayname,
+            "action": action,
+            "changed_state": changed_state,
+            "event_details": resource.event_details,
+        }
+
+        app.logger.info(
+            "Audit Event {}".format(action),
+            extra={
+                "audit_event": {key: str(value) for key, value in log_data.items()},
+                "tags": ["audit_event", action],
+            },
+        )
+        audit_events.append(log_data)
+
+    session.info.pop("audit_related_rows")
+
+    if not app.config.get("USE_AUDIT_LOG", False):
+        return
+
+    if app.config.get("AUDIT_LOG_ASYNC", False):
+        for log_data, time_created in zip(
+            audit_events, _EventClock.times(len(audit_events))
+        ):
+            log_data["time_created"] = time_created
+        session.info.setdefault("audit_events_to_publish", []).extend(
+            app.audit_stream.save_to_outbox(session.connection(), audit_events)
+        )
+    else:
+        AuditEvent.save_all(session.connection(), audit_events)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_audit_events(session):
+    outbox_rows = session.info.pop("audit_events_to_publish", None)
+    if outbox_rows:
+        app.audit_stream.publish(outbox_rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_audit_events(session):
+    session.info.pop("audit_events", None)
+    session.info.pop("audit_related_rows", None)
+    session.info.pop("audit_events_to_publish", None)
+
+
+class _EventClock(object):
+    """
+    Times for asynchronously logged events, each later than any given out
+    before. The events reach the audit log in no particular order, so they
+    are ordered by these times instead.
+    """
+
+    _last = datetime.min.replace(tzinfo=timezone.utc)
+    _lock = threading.Lock()
+
+    @classmethod
+    def times(cls, count):
+        with cls._lock:
+            start = max(
+                datetime.now(timezone.utc), cls._last + timedelta(microseconds=1)
+            )
+            times = [start + timedelta(microseconds=i) for i in range(count)]
+            cls._last = times[-1]
+
+        return times
@@ -1,6 +1,16 @@
+from functools import reduce
+from operator import or_
+
+
 class PermissionsMixin(object):
     @property
     def permissions(self):
         return [
             perm for permset in self.permission_sets for perm in permset.permissions
         ]
+
+    @property
+    def permissions_mask(self):
+        return reduce(
+            or_, (permset.permissions_mask for permset in self.permission_sets), 0
+        )
@@ -1,9 +1,11 @@
-from sqlalchemy import String, Column
+from sqlalchemy import BigInteger, String, Column
 from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import validates
 
 from atst.models.base import Base
 import atst.models.mixins as mixins
 import atst.models.types as types
+from atst.models.permissions import permission_bit, permissions_mask
 
 
 class PermissionSet(Base, mixins.TimestampsMixin):
@@ -14,6 +16,22 @@ class PermissionSet(Base, mixins.TimestampsMixin):
     display_name = Column(String, nullable=False)
     description = Column(String, nullable=False)
     permissions = Column(ARRAY(String), index=True, server_default="{}", nullable=False)
+    # denormalized from `permissions` so that checks and queries can use
+    # bitwise operations; see atst.models.permissions.PERMISSION_BITS
+    permissions_mask = Column(BigInteger, server_default="0", nullable=False)
+
+    @validates("permissions")
+    def _update_permissions_mask(self, key, permissions):
+        self.permissions_mask = permissions_mask(permissions)
+        return permissions
+
+    @classmethod
+    def grants(cls, permission):
+        """
+        A SQL expression that is true for permission sets that include
+        `permission`.
+        """
+        return cls.permissions_mask.op("&")(permission_bit(permission)) != 0
 
     def __repr__(self):
         return "<PermissionSet(name='{}', description='{}', permissions='{}', id='{}')>".format(
@@ -49,3 +49,59 @@ class Permissions(object):
     # portfolio POC
     EDIT_PORTFOLIO_POC = "edit_portfolio_poc"
     ARCHIVE_PORTFOLIO = "archive_portfolio"
+
+
+# The bit position of each permission in a permissions mask. Masks are stored
+# in the database, so permissions may only ever be appended to this list.
+PERMISSION_BITS = [
+    Permissions.VIEW_AUDIT_LOG,
+    Permissions.VIEW_CCPO_USER,
+    Permissions.CREATE_CCPO_USER,
+    Permissions.EDIT_CCPO_USER,
+    Permissions.DELETE_CCPO_USER,
+    Permissions.VIEW_PORTFOLIO,
+    Permissions.VIEW_APPLICATION,
+    Permissions.EDIT_APPLICATION,
+    Permissions.CREATE_APPLICATION,
+    Permissions.DELETE_APPLICATION,
+    Permissions.VIEW_APPLICATION_MEMBER,
+    Permissions.EDIT_APPLICATION_MEMBER,
+    Permissions.DELETE_APPLICATION_MEMBER,
+    Permissions.CREATE_APPLICATION_MEMBER,
+    Permissions.VIEW_ENVIRONMENT,
+    Permissions.EDIT_ENVIRONMENT,
+    Permissions.CREATE_ENVIRONMENT,
+    Permissions.DELETE_ENVIRONMENT,
+    Permissions.ASSIGN_ENVIRONMENT_MEMBER,
+    Permissions.VIEW_APPLICATION_ACTIVITY_LOG,
+    Permissions.VIEW_PORTFOLIO_FUNDING,
+    Permissions.CREATE_TASK_ORDER,
+    Permissions.VIEW_TASK_ORDER_DETAILS,
+    Permissions.EDIT_TASK_ORDER_DETAILS,
+    Permissions.VIEW_PORTFOLIO_REPORTS,
+    Permissions.VIEW_PORTFOLIO_ADMIN,
+    Permissions.VIEW_PORTFOLIO_NAME,
+    Permissions.EDIT_PORTFOLIO_NAME,
+    Permissions.VIEW_PORTFOLIO_USERS,
+    Permissions.EDIT_PORTFOLIO_USERS,
+    Permissions.CREATE_PORTFOLIO_USERS,
+    Permissions.VIEW_PORTFOLIO_ACTIVITY_LOG,
+    Permissions.VIEW_PORTFOLIO_POC,
+    Permissions.EDIT_PORTFOLIO_POC,
+    Permissions.ARCHIVE_PORTFOLIO,
+]
+
+_PERMISSION_MASKS = {
+    permission: 1 << bit for bit, permission in enumerate(PERMISSION_BITS)
+}
+
+
+def permission_bit(permission):
+    return _PERMISSION_MASKS[permission]
+
+
+def permissions_mask(permissions):
+    mask = 0
+    for permission in permissions:
+        mask |= _PERMISSION_MASKS[permission]
+    return mask
@@ -1,7 +1,7 @@
 from enum import Enum
 from sqlalchemy import Index, ForeignKey, Column, Enum as SQLAEnum, Table
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import column_property, relationship
 from sqlalchemy.event import listen
 
 from atst.models.base import Base
@@ -41,6 +41,7 @@ class PortfolioRole(
     Base, mixins.TimestampsMixin, mixins.AuditableMixin, mixins.PermissionsMixin
 ):
     __tablename__ = "portfolio_roles"
+    audit_relationships = ("user",)
 
     id = types.Id()
     portfolio_id = Column(
@@ -52,8 +53,13 @@ class PortfolioRole(
         UUID(as_uuid=True), ForeignKey("users.id"), index=True, nullable=True
     )
 
-    status = Column(
-        SQLAEnum(Status, native_enum=False), default=Status.PENDING, nullable=False
+    # the previous status is needed for the audit log even when it was never
+    # loaded before being changed
+    status = column_property(
+        Column(
+            SQLAEnum(Status, native_enum=False), default=Status.PENDING, nullable=False
+        ),
+        active_history=True,
     )
 
     permission_sets = relationship(
@@ -150,6 +156,13 @@ Index(
     unique=True,
 )
 
+Index(
+    "portfolio_role_user_status_portfolio",
+    PortfolioRole.user_id,
+    PortfolioRole.status,
+    PortfolioRole.portfolio_id,
+)
+
 
 listen(
     PortfolioRole.permission_sets,
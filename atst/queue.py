@@ -19,7 +19,20 @@ def update_celery(celery, app):
             "task": "atst.jobs.dispatch_provision_user",
             "schedule": 60,
         },
+        "beat-create_audit_event_partitions": {
+            "task": "atst.jobs.create_audit_event_partitions",
+            "schedule": 24 * 60 * 60,
+        },
+        "beat-archive_audit_event_partitions": {
+            "task": "atst.jobs.archive_audit_event_partitions",
+            "schedule": 24 * 60 * 60,
+        },
     }
+    if app.config.get("AUDIT_LOG_ASYNC"):
+        celery.conf.CELERYBEAT_SCHEDULE["beat-load_audit_events"] = {
+            "task": "atst.jobs.load_audit_events",
+            "schedule": 10,
+        }
 
     class ContextTask(celery.Task):
         def __call__(self, *args, **kwargs):
@@ -8,7 +8,6 @@ from atst.domain.application_roles import ApplicationRoles
 from atst.domain.audit_log import AuditLog
 from atst.domain.csp.cloud import GeneralCSPException
 from atst.domain.common import Paginator
-from atst.domain.environment_roles import EnvironmentRoles
 from atst.domain.invitations import ApplicationInvitations
 from atst.forms.application_member import NewForm as NewMemberForm, UpdateMemberForm
 from atst.forms.application import NameAndDescriptionForm, EditEnvironmentForm
@@ -104,8 +103,7 @@ def get_members_data(application):
     members_data = []
     for member in application.members:
         permission_sets = filter_perm_sets_data(member)
-        roles = EnvironmentRoles.get_for_application_member(member.id)
-        environment_roles = filter_env_roles_data(roles)
+        environment_roles = filter_env_roles_data(member.environment_roles)
         env_roles_form_data = filter_env_roles_form_data(
             member, application.environments
         )
@@ -1,13 +1,22 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from uuid import UUID
+
 from flask import (
     Blueprint,
+    Response,
     render_template,
     redirect,
+    stream_with_context,
     url_for,
     request,
     current_app as app,
 )
+
 from atst.domain.users import Users
-from atst.domain.audit_log import AuditLog
+from atst.domain.audit_log import AuditLog, EXPORT_BATCH_SIZE
 from atst.domain.common import Paginator
 from atst.domain.exceptions import NotFoundError
 from atst.domain.authz.decorator import user_can_access_decorator as user_can
@@ -32,6 +41,125 @@ def activity_history():
         return redirect("/")
 
 
+EXPORT_FIELDS = [
+    "id",
+    "time_created",
+    "user_id",
+    "portfolio_id",
+    "application_id",
+    "resource_type",
+    "resource_id",
+    "display_name",
+    "action",
+    "changed_state",
+    "event_details",
+]
+
+
+def _batches(logs):
+    batch = []
+    for log in logs:
+        batch.append(log)
+        if len(batch) == EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _csv_export(logs):
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=EXPORT_FIELDS)
+
+    def _flush():
+        chunk = output.getvalue()
+        output.seek(0)
+        output.truncate()
+        return chunk
+
+    writer.writeheader()
+    yield _flush()
+    for batch in _batches(logs):
+        writer.writerows(
+            dict(
+                log,
+                changed_state=json.dumps(log["changed_state"]),
+                event_details=json.dumps(log["event_details"]),
+            )
+            for log in batch
+        )
+        yield _flush()
+
+
+def _jsonl_export(logs):
+    for batch in _batches(logs):
+        yield "".join(json.dumps(log) + "\n" for log in batch)
+
+
+EXPORT_FORMATS = {
+    "csv": (_csv_export, "text/csv"),
+    "jsonl": (_jsonl_export, "application/x-ndjson"),
+}
+
+
+def _export_filter(args, name, parse):
+    value = args.get(name)
+    if not value:
+        return None
+
+    try:
+        return parse(value)
+    except ValueError:
+        raise ValueError("Invalid {}: {}".format(name, value))
+
+
+def _parse_time(value):
+    time = datetime.fromisoformat(value)
+    return time if time.tzinfo else time.replace(tzinfo=timezone.utc)
+
+
+def _bad_export_request(message):
+    return (render_template("error.html", message=message, code=400), 400)
+
+
+@bp.route("/activity-history/export")
+@user_can(Permissions.VIEW_AUDIT_LOG, message="export activity log")
+def export_activity_history():
+    if not app.config.get("USE_AUDIT_LOG", False):
+        return redirect("/")
+
+    export_format = request.args.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return _bad_export_request("Invalid format: {}".format(export_format))
+
+    try:
+        filters = {
+            "portfolio_id": _export_filter(request.args, "portfolio_id", UUID),
+            "application_id": _export_filter(request.args, "application_id", UUID),
+            "user_id": _export_filter(request.args, "user_id", UUID),
+            "start": _export_filter(request.args, "start", _parse_time),
+            "end": _export_filter(request.args, "end", _parse_time),
+        }
+    except ValueError as err:
+        return _bad_export_request(str(err))
+
+    export, mimetype = EXPORT_FORMATS[export_format]
+    logs = AuditLog.export_events(**filters)
+    # the events are read while the response is sent, and never all held in
+    # memory, so the request context is kept around for the database session
+    return Response(
+        stream_with_context(export(logs)),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": "attachment; filename=activity-history.{}".format(
+                export_format
+            ),
+            # sent as it is generated, rather than buffered by nginx
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
 @bp.route("/ccpo-users")
 @user_can(Permissions.VIEW_CCPO_USER, message="view ccpo users")
 def users():
@@ -8,6 +8,7 @@ from atst.domain.reports import Reports
 from atst.domain.portfolios import Portfolios
 from atst.models.permissions import Permissions
 from atst.domain.authz.decorator import user_can_access_decorator as user_can
+from atst.utils.conditional_get import conditional_get
 from atst.utils.flash import formatted_flash as flash
 
 
@@ -32,6 +33,7 @@ def create_portfolio():
 
 @portfolios_bp.route("/portfolios/<portfolio_id>/reports")
 @user_can(Permissions.VIEW_PORTFOLIO_REPORTS, message="view portfolio reports")
+@conditional_get
 def reports(portfolio_id):
     portfolio = Portfolios.get(g.current_user, portfolio_id)
 
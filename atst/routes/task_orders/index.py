@@ -6,10 +6,12 @@ from atst.domain.portfolios import Portfolios
 from atst.domain.task_orders import TaskOrders
 from atst.forms.task_order import SignatureForm
 from atst.models import Permissions
+from atst.utils.conditional_get import conditional_get
 
 
 @task_orders_bp.route("/task_orders/<task_order_id>/review")
 @user_can(Permissions.VIEW_TASK_ORDER_DETAILS, message="review task order details")
+@conditional_get
 def review_task_order(task_order_id):
     task_order = TaskOrders.get(task_order_id)
     if task_order.is_draft:
@@ -25,6 +27,7 @@ def review_task_order(task_order_id):
 
 @task_orders_bp.route("/portfolios/<portfolio_id>/task_orders")
 @user_can(Permissions.VIEW_PORTFOLIO_FUNDING, message="view portfolio funding")
+@conditional_get
 def portfolio_funding(portfolio_id):
     portfolio = Portfolios.get(g.current_user, portfolio_id)
     task_orders = TaskOrders.sort_by_status(portfolio.task_orders)
@@ -0,0 +1,71 @@
+from functools import wraps
+from hashlib import sha256
+
+from flask import current_app as app, g, make_response, request, session
+
+from atst.domain.authz.principal import get_principal
+from atst.domain.portfolios import Portfolios
+from atst.utils.clock import Clock
+
+
+def portfolio_etag(user, portfolio):
+    """
+    A validator for a page showing the portfolio's funding. Besides the
+    portfolio's data it covers everything else the page depends on: the
+    user and their permissions, which decide what they may see, and the
+    date, which decides whether a task order is active or expired.
+
+    Returns the ETag and the time the portfolio's data last changed.
+    """
+    versions = Portfolios.funding_versions(portfolio)
+    principal = get_principal(user)
+    scope = (
+        user.id,
+        user.time_updated,
+        principal.atat,
+        sorted(principal.portfolios.items()),
+        sorted(principal.applications.items()),
+        sorted(principal.pending),
+    )
+    validator = repr((request.path, Clock.today(), versions, scope))
+    last_modified = max(
+        (time_updated for (time_updated, _count) in versions if time_updated),
+        default=None,
+    )
+
+    return sha256(validator.encode()).hexdigest(), last_modified
+
+
+def conditional_get(f):
+    """
+    Answer a GET for a portfolio page with 304 Not Modified, without
+    rendering it, when the client's copy is still current. Responses are
+    marked private and must be revalidated, so they are only ever reused by
+    the user's own browser.
+
+    Only `If-None-Match` is honoured: a Last-Modified date alone can't tell
+    that the user's permissions have changed. Requests with pending flash
+    messages are always rendered so the messages are shown.
+    """
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if request.method != "GET" or g.portfolio is None or session.get("_flashes"):
+            return f(*args, **kwargs)
+
+        etag, last_modified = portfolio_etag(g.current_user, g.portfolio)
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+
+        return response
+
+    return decorated_function
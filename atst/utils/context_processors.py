@@ -1,4 +1,5 @@
 from flask import g
+from sqlalchemy.orm import selectinload
 from sqlalchemy.orm.exc import NoResultFound
 
 from atst.database import db
@@ -7,7 +8,9 @@ from atst.domain.exceptions import NotFoundError
 from atst.domain.portfolios.scopes import ScopedPortfolio
 from atst.models import (
     Application,
+    ApplicationRole,
     Environment,
+    EnvironmentRole,
     Permissions,
     Portfolio,
     PortfolioInvitation,
@@ -16,7 +19,44 @@ from atst.models import (
 )
 
 
-def get_resources_from_context(view_args):
+# the application's members, as listed by get_members_data
+_APPLICATION_MEMBER_LOADERS = [
+    selectinload(Application.environments)
+    .selectinload(Environment.roles)
+    .selectinload(EnvironmentRole.application_role)
+    .selectinload("user"),
+    selectinload(Application.roles).selectinload("user"),
+    selectinload(Application.roles).selectinload(ApplicationRole.permission_sets),
+    selectinload(Application.roles).selectinload(ApplicationRole.environment_roles),
+    selectinload(Application.roles).selectinload("invitations"),
+]
+
+# Relationships that an endpoint is known to use, loaded together with its
+# resources so that rendering the page doesn't lazy load them one at a time.
+# Options may only refer to the entities queried for the endpoint's view args.
+RESOURCE_LOADERS = {
+    "applications.portfolio_applications": [
+        selectinload(Portfolio.applications).selectinload(Application.environments)
+    ],
+    "portfolios.reports": [
+        selectinload(Portfolio.task_orders).selectinload(TaskOrder.clins),
+        selectinload(Portfolio.applications).selectinload(Application.environments),
+    ],
+    "task_orders.portfolio_funding": [
+        selectinload(Portfolio.task_orders).selectinload(TaskOrder.clins)
+    ],
+    "task_orders.review_task_order": [selectinload(TaskOrder.clins)],
+    "applications.settings": _APPLICATION_MEMBER_LOADERS,
+    "applications.view_new_application_step_3": _APPLICATION_MEMBER_LOADERS,
+    "portfolios.admin": [
+        selectinload(Portfolio.roles).selectinload("user"),
+        selectinload(Portfolio.roles).selectinload(PortfolioRole.permission_sets),
+        selectinload(Portfolio.roles).selectinload("invitations"),
+    ],
+}
+
+
+def get_resources_from_context(view_args, endpoint=None):
     query = None
 
     if "portfolio_token" in view_args:
@@ -58,22 +98,23 @@ def get_resources_from_context(view_args):
         )
 
     if query:
+        query = query.options(*RESOURCE_LOADERS.get(endpoint, []))
         try:
             return query.only_return_tuples(True).one()
         except NoResultFound:
             raise NotFoundError("portfolio")
 
 
-def assign_resources(view_args):
+def assign_resources(view_args, endpoint=None):
     g.portfolio = None
     g.application = None
     g.task_order = None
 
-    resources = get_resources_from_context(view_args)
+    resources = get_resources_from_context(view_args, endpoint)
     if resources:
         for resource in resources:
             if isinstance(resource, Portfolio):
-                g.portfolio = ScopedPortfolio(g.current_user, resource)
+                g.portfolio = ScopedPortfolio.for_request(g.current_user, resource)
             elif isinstance(resource, Application):
                 g.application = resource
             elif isinstance(resource, TaskOrder):
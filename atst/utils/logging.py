@@ -33,6 +33,9 @@ class JsonFormatter(logging.Formatter):
         ("severity", lambda r: r.levelname),
         ("tags", lambda r: r.__dict__.get("tags")),
         ("audit_event", lambda r: r.__dict__.get("audit_event")),
+        ("sql", lambda r: r.__dict__.get("sql")),
+        ("audit_stream", lambda r: r.__dict__.get("audit_stream")),
+        ("crl_refresh", lambda r: r.__dict__.get("crl_refresh")),
     ]
 
     def __init__(self, *args, source="atst", **kwargs):
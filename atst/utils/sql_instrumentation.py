@@ -0,0 +1,126 @@
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# statements run at least this many times in one request are reported as
+# repeated, which usually means a relationship is lazy loaded in a loop
+REPEATED_STATEMENT_THRESHOLD = 5
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|%\(\w+\)s|%s|\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement):
+    """
+    Reduce a statement to its shape: literals and bound parameters become
+    `?` and lists of them become `(?)`, so that the same query run for
+    different rows has the same fingerprint.
+    """
+    statement = _LITERALS.sub("?", statement)
+    statement = _LISTS.sub("(?)", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+class QueryStats(object):
+    """
+    The SQL statements executed while handling a single request.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = None
+        self.slowest_duration = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        if self.slowest is None or duration > self.slowest_duration:
+            self.slowest = statement
+            self.slowest_duration = duration
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold=REPEATED_STATEMENT_THRESHOLD):
+        return {
+            statement: count
+            for statement, count in self.fingerprints.most_common()
+            if count >= threshold
+        }
+
+    def to_dictionary(self):
+        return {
+            "count": self.count,
+            "duration_ms": round(self.duration * 1000, 3),
+            "slowest": self.slowest and fingerprint(self.slowest),
+            "slowest_ms": round(self.slowest_duration * 1000, 3),
+            "repeated": self.repeated(),
+        }
+
+    def server_timing(self):
+        return 'db;dur={:.3f};desc="{} queries"'.format(
+            self.duration * 1000, self.count
+        )
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+
+    duration = time.perf_counter() - start_times.pop()
+    stats = has_request_context() and g.get("query_stats")
+    if stats:
+        stats.record(statement, duration)
+
+
+def instrument_sql(app):
+    """
+    Record the statements each request executes and log a summary when it
+    finishes, tagged "n+1" if any statement was repeated. With
+    SQL_SERVER_TIMING set, the total is also sent as a `Server-Timing`
+    header. Nothing is registered unless SQL_INSTRUMENTATION is set.
+    """
+    if not app.config.get("SQL_INSTRUMENTATION"):
+        return
+
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    server_timing = app.config.get("SQL_SERVER_TIMING")
+
+    @app.before_request
+    def _start_query_stats():
+        g.query_stats = QueryStats()
+
+    @app.after_request
+    def _report_query_stats(response):
+        stats = g.pop("query_stats", None)
+        if stats is None:
+            return response
+
+        summary = stats.to_dictionary()
+        tags = ["sql", "n+1"] if summary["repeated"] else ["sql"]
+        app.logger.info(
+            "{} queries in {}ms".format(summary["count"], summary["duration_ms"]),
+            extra={"tags": tags, "sql": summary},
+        )
+        if server_timing:
+            response.headers.add("Server-Timing", stats.server_timing())
+
+        return response
+
+    @app.teardown_request
+    def _discard_query_stats(*args):
+        g.pop("query_stats", None)
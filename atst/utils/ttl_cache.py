@@ -0,0 +1,86 @@
+import json
+import threading
+import time
+
+from redis.exceptions import RedisError
+
+
+class TTLCache(object):
+    """
+    A small cache whose entries expire after `ttl` seconds. Entries are kept
+    in process and, if a Redis client is given, also in Redis so that they are
+    shared between workers. Redis errors are treated as cache misses. Values
+    stored in Redis must be JSON serializable.
+    """
+
+    def __init__(self, ttl, redis=None, key_prefix="ttlcache", max_entries=10000):
+        self.ttl = ttl
+        self.redis = redis
+        self.key_prefix = key_prefix
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry:
+            expires, value = entry
+            if expires > time.monotonic():
+                return value
+            self._entries.pop(key, None)
+
+        if self.redis is None:
+            return default
+
+        try:
+            pipeline = self.redis.pipeline()
+            pipeline.get(self._redis_key(key))
+            pipeline.pttl(self._redis_key(key))
+            data, ttl_ms = pipeline.execute()
+        except RedisError:
+            return default
+
+        if data is None:
+            return default
+
+        value = json.loads(data)
+        if ttl_ms and ttl_ms > 0:
+            self._set_local(key, value, ttl_ms / 1000)
+        return value
+
+    def set(self, key, value):
+        self._set_local(key, value, self.ttl)
+        if self.redis is not None:
+            try:
+                self.redis.setex(
+                    name=self._redis_key(key), value=json.dumps(value), time=self.ttl
+                )
+            except RedisError:
+                pass
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+        if self.redis is not None:
+            try:
+                self.redis.delete(self._redis_key(key))
+            except RedisError:
+                pass
+
+    def _set_local(self, key, value, ttl):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._evict()
+            self._entries[key] = (time.monotonic() + ttl, value)
+
+    def _evict(self):
+        now = time.monotonic()
+        for key, (expires, _) in list(self._entries.items()):
+            if expires <= now:
+                del self._entries[key]
+
+        # still full: drop the oldest entries
+        while len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def _redis_key(self, key):
+        return "{}:{}".format(self.key_prefix, key)
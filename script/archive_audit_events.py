@@ -0,0 +1,45 @@
+"""
+Create the upcoming monthly partitions of the audit log and archive the ones
+older than the retention period, as the daily Celery tasks do, e.g.:
+
+    python script/archive_audit_events.py --retention-months 12
+"""
+import os
+import sys
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(parent_dir)
+
+import argparse
+
+from atst.app import make_config, make_app
+from atst.domain.audit_partitions import AuditEventPartitions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Create and archive audit log partitions."
+    )
+    parser.add_argument("--retention-months", type=int)
+    parser.add_argument("--archive-dir")
+    args = parser.parse_args()
+
+    config = make_config({"DISABLE_CRL_CHECK": True, "DEBUG": False})
+    app = make_app(config)
+    with app.app_context():
+        for name in AuditEventPartitions.create():
+            print("Created {}".format(name))
+
+        retention_months = (
+            args.retention_months
+            if args.retention_months is not None
+            else app.config["AUDIT_LOG_RETENTION_MONTHS"]
+        )
+        if retention_months:
+            archive_dir = args.archive_dir or app.config["AUDIT_LOG_ARCHIVE_DIR"]
+            for path in AuditEventPartitions.archive(archive_dir, retention_months):
+                print("Archived {}".format(path))
+
+
+if __name__ == "__main__":
+    main()
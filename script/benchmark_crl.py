@@ -0,0 +1,384 @@
+#! .venv/bin/python
+"""
+Benchmark CRL checking and CRL sync against synthetic CRLs.
+
+Generates a root and intermediate CA, CRLs with the requested number of
+revoked serials, and measures:
+
+- cold store/index build: the first `crl_check` for a fresh CRLCache
+- warm check latency: repeated `crl_check` calls from one thread
+- concurrent check latency: `crl_check` from several threads at once
+- memory per worker: RSS growth of a fresh process after its first check
+- sync throughput: `sync_crls` against a local HTTP server
+
+Results are written as JSON so that runs on different commits can be
+compared, e.g.:
+
+    python script/benchmark_crl.py --sizes 10000,100000 --output before.json
+"""
+# Add root project dir to the python path
+import os
+import sys
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(parent_dir)
+
+import argparse
+import json
+import logging
+import multiprocessing
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.x509.oid import NameOID
+
+from atst.domain.authnid.crl import CRLCache
+from atst.domain.authnid.crl.util import (
+    load_ca_certificates,
+    sync_crls,
+    write_crl_index,
+)
+
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+
+
+def _key():
+    return rsa.generate_private_key(
+        public_exponent=65537, key_size=2048, backend=default_backend()
+    )
+
+
+def _name(cn):
+    return x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, cn)])
+
+
+def _certificate(key, cn, signer_key, signer_cn, serial=None, ca=False):
+    now = datetime.utcnow()
+    builder = (
+        x509.CertificateBuilder()
+        .subject_name(_name(cn))
+        .issuer_name(_name(signer_cn))
+        .public_key(key.public_key())
+        .serial_number(serial or x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=30))
+    )
+    if ca:
+        builder = builder.add_extension(
+            x509.BasicConstraints(ca=True, path_length=None), critical=True
+        )
+    return builder.sign(signer_key, hashes.SHA256(), default_backend())
+
+
+def make_pki(work_dir):
+    """
+    Write a root and intermediate CA chain to `work_dir` and return the
+    intermediate key and a client certificate it issued.
+    """
+    root_key = _key()
+    root = _certificate(root_key, "Benchmark Root", root_key, "Benchmark Root", ca=True)
+    intermediate_key = _key()
+    intermediate = _certificate(
+        intermediate_key, "Benchmark CA", root_key, "Benchmark Root", ca=True
+    )
+    client = _certificate(
+        _key(), "BENCH.MARK.G.1234567890", intermediate_key, "Benchmark CA", serial=1
+    )
+
+    chain_path = os.path.join(work_dir, "ca-chain.pem")
+    with open(chain_path, "wb") as chain_file:
+        chain_file.write(root.public_bytes(Encoding.PEM))
+        chain_file.write(intermediate.public_bytes(Encoding.PEM))
+
+    return (chain_path, intermediate_key, client)
+
+
+def make_crl(signer_key, size, path):
+    # builds the revoked list up front: adding entries to the builder one at
+    # a time copies the list on every call
+    now = datetime.utcnow()
+    serials = set()
+    while len(serials) < size:
+        # the client certificate has serial 1, so it is never revoked
+        serials.add(random.randrange(2, 2 ** 63))
+    revoked = [
+        x509.RevokedCertificateBuilder()
+        .serial_number(serial)
+        .revocation_date(now)
+        .build(default_backend())
+        for serial in serials
+    ]
+    crl = x509.CertificateRevocationListBuilder(
+        issuer_name=_name("Benchmark CA"),
+        last_update=now - timedelta(days=1),
+        next_update=now + timedelta(days=7),
+        revoked_certificates=revoked,
+    ).sign(signer_key, hashes.SHA256(), default_backend())
+
+    with open(path, "wb") as crl_file:
+        crl_file.write(crl.public_bytes(Encoding.DER))
+
+    return crl.issuer.public_bytes(default_backend()).hex()
+
+
+def make_crl_dir(work_dir, name, crl_path):
+    crl_dir = os.path.join(work_dir, name)
+    os.makedirs(crl_dir)
+    shutil.copy(crl_path, crl_dir)
+    return crl_dir
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _latencies(latencies):
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "mean_us": statistics.mean(latencies) * 1e6,
+        "p50_us": latencies[len(latencies) // 2] * 1e6,
+        "p99_us": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6,
+        "max_us": latencies[-1] * 1e6,
+    }
+
+
+def _rss():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _memory_worker(chain_path, crl_dir, crl_list, client_pem, queue):
+    before = _rss()
+    cache = CRLCache(chain_path, crl_dir, crl_list=crl_list)
+    cache.crl_check(client_pem)
+    queue.put(_rss() - before)
+
+
+def measure_memory(chain_path, crl_dir, crl_list, client_pem):
+    """
+    RSS growth of a fresh worker process after its first check, which is
+    roughly what each web worker pays for the CRL.
+    """
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    process = context.Process(
+        target=_memory_worker, args=(chain_path, crl_dir, crl_list, client_pem, queue)
+    )
+    process.start()
+    growth = queue.get()
+    process.join()
+    return growth
+
+
+def measure_checks(chain_path, crl_dir, crl_list, client_pem, iterations, threads):
+    cache = CRLCache(chain_path, crl_dir, crl_list=crl_list)
+    cold = _timed(lambda: cache.crl_check(client_pem))
+
+    warm = []
+    for _ in range(iterations):
+        warm.append(_timed(lambda: cache.crl_check(client_pem)))
+
+    def _worker(_):
+        return [_timed(lambda: cache.crl_check(client_pem)) for _ in range(iterations)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        concurrent = [
+            latency
+            for result in executor.map(_worker, range(threads))
+            for latency in result
+        ]
+    elapsed = time.perf_counter() - start
+
+    return {
+        "cold_s": cold,
+        "warm": _latencies(warm),
+        "concurrent": dict(
+            _latencies(concurrent),
+            threads=threads,
+            checks_per_s=len(concurrent) / elapsed,
+        ),
+        "memory_bytes": measure_memory(chain_path, crl_dir, crl_list, client_pem),
+    }
+
+
+class QuietHTTPRequestHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def measure_sync(work_dir, crl_paths, ca_certificates, concurrency):
+    serve_dir = os.path.join(work_dir, "serve")
+    os.makedirs(serve_dir)
+    for crl_path in crl_paths:
+        shutil.copy(crl_path, serve_dir)
+
+    handler = partial(QuietHTTPRequestHandler, directory=serve_dir)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:{}".format(server.server_address[1])
+
+    crl_list = [
+        ("{}/{}".format(url, os.path.basename(path)), issuer)
+        for path, issuer in crl_paths.items()
+    ]
+    total_bytes = sum(os.path.getsize(path) for path in crl_paths)
+    tmp_dir = os.path.join(work_dir, "sync-tmp")
+    final_dir = os.path.join(work_dir, "sync-final")
+    os.makedirs(tmp_dir)
+    os.makedirs(final_dir)
+    logger = logging.getLogger("benchmark")
+
+    try:
+        full = _timed(
+            lambda: sync_crls(
+                tmp_dir,
+                final_dir,
+                ca_certificates,
+                crl_list,
+                concurrency=concurrency,
+                logger=logger,
+            )
+        )
+        unchanged = _timed(
+            lambda: sync_crls(
+                tmp_dir,
+                final_dir,
+                ca_certificates,
+                crl_list,
+                concurrency=concurrency,
+                logger=logger,
+            )
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return {
+        "crls": len(crl_list),
+        "bytes": total_bytes,
+        "concurrency": concurrency,
+        "full_sync_s": full,
+        "full_sync_mb_per_s": total_bytes / full / 1e6,
+        "unchanged_sync_s": unchanged,
+    }
+
+
+def _git_commit():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], cwd=parent_dir, stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, iterations, threads, concurrency, work_dir):
+    chain_path, signer_key, client = make_pki(work_dir)
+    ca_certificates = load_ca_certificates(chain_path)
+    client_pem = client.public_bytes(Encoding.PEM)
+    results = []
+    crl_paths = {}
+
+    for size in sizes:
+        crl_path = os.path.join(work_dir, "bench-{}.crl".format(size))
+        generate = time.perf_counter()
+        issuer = make_crl(signer_key, size, crl_path)
+        generate = time.perf_counter() - generate
+        crl_paths[crl_path] = issuer
+        crl_list = [(os.path.basename(crl_path), issuer)]
+
+        store_dir = make_crl_dir(work_dir, "store-{}".format(size), crl_path)
+        index_dir = make_crl_dir(work_dir, "index-{}".format(size), crl_path)
+        index_build = _timed(
+            partial(
+                write_crl_index,
+                os.path.join(index_dir, os.path.basename(crl_path)),
+                ca_certificates,
+            )
+        )
+
+        results.append(
+            {
+                "revoked_serials": size,
+                "crl_bytes": os.path.getsize(crl_path),
+                "generate_s": generate,
+                "index_build_s": index_build,
+                "store": measure_checks(
+                    chain_path, store_dir, crl_list, client_pem, iterations, threads
+                ),
+                "index": measure_checks(
+                    chain_path, index_dir, crl_list, client_pem, iterations, threads
+                ),
+            }
+        )
+
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "iterations": iterations,
+        "threads": threads,
+        "checks": results,
+        "sync": measure_sync(work_dir, crl_paths, ca_certificates, concurrency),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CRL checks and sync.")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="comma-separated numbers of revoked serials per CRL",
+    )
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="crl-benchmark-")
+    try:
+        results = run(
+            [int(size) for size in args.sizes.split(",")],
+            args.iterations,
+            args.threads,
+            args.concurrency,
+            work_dir,
+        )
+    finally:
+        shutil.rmtree(work_dir)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+#! .venv/bin/python
+"""
+Benchmark PortfoliosQuery.get_for_user against a synthetic data set.
+
+Inside a transaction that is rolled back at the end, generates portfolios
+with applications, users, and portfolio and application roles. It then
+compares the previous nested IN query with the current UNION query, with
+and without the composite role indexes. For each it records the Postgres
+plan and the latency for a sample of users.
+
+Results are written as JSON so that runs on different commits can be
+compared, e.g.:
+
+    python script/benchmark_portfolios_query.py --output before.json
+"""
+# Add root project dir to the python path
+import os
+import sys
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(parent_dir)
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+from sqlalchemy import or_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from atst.app import make_config, make_app
+from atst.database import db
+from atst.domain.portfolios.query import PortfoliosQuery
+from atst.models import (
+    Application,
+    ApplicationRole,
+    Portfolio,
+    PortfolioRole,
+    User,
+)
+from atst.models.application_role import Status as ApplicationRoleStatus
+from atst.models.portfolio_role import Status as PortfolioRoleStatus
+
+
+BENCHMARK_NAME = "Benchmark Portfolio"
+BENCHMARK_DOD_ID_START = 9000000000
+
+
+def legacy_get_for_user(user):
+    """
+    PortfoliosQuery.get_for_user before it was rewritten as a UNION.
+    """
+    return (
+        db.session.query(Portfolio)
+        .filter(
+            or_(
+                Portfolio.id.in_(
+                    db.session.query(Portfolio.id)
+                    .join(Application)
+                    .filter(Portfolio.id == Application.portfolio_id)
+                    .filter(
+                        Application.id.in_(
+                            db.session.query(Application.id)
+                            .join(ApplicationRole)
+                            .filter(ApplicationRole.application_id == Application.id)
+                            .filter(ApplicationRole.user_id == user.id)
+                            .filter(
+                                ApplicationRole.status == ApplicationRoleStatus.ACTIVE
+                            )
+                            .filter(ApplicationRole.deleted == False)
+                            .subquery()
+                        )
+                    )
+                ),
+                Portfolio.id.in_(
+                    db.session.query(Portfolio.id)
+                    .join(PortfolioRole)
+                    .filter(PortfolioRole.user == user)
+                    .filter(PortfolioRole.status == PortfolioRoleStatus.ACTIVE)
+                    .subquery()
+                ),
+            )
+        )
+        .filter(Portfolio.deleted == False)
+        .order_by(Portfolio.name.asc())
+    )
+
+
+def current_get_for_user(user):
+    return PortfoliosQuery._filter_for_user(db.session.query(Portfolio), user)
+
+
+QUERIES = {"legacy": legacy_get_for_user, "current": current_get_for_user}
+
+# the composite indexes added for the current query
+ROLE_INDEXES = [
+    "application_role_user_status_deleted_application",
+    "portfolio_role_user_status_portfolio",
+]
+
+
+def generate(
+    portfolios, applications_per_portfolio, users, portfolio_roles, application_roles
+):
+    """
+    Insert the synthetic data set. Roles are spread evenly over users; 90%
+    of them are active.
+    """
+    execute = db.session.execute
+    execute(
+        """
+        INSERT INTO users (dod_id, first_name, last_name)
+        SELECT (:start + i)::text, 'Benchmark', 'User ' || i
+        FROM generate_series(1, :users) AS i
+        """,
+        {"start": BENCHMARK_DOD_ID_START, "users": users},
+    )
+    execute(
+        """
+        INSERT INTO portfolios (name, defense_component)
+        SELECT :name || ' ' || i, 'army'
+        FROM generate_series(1, :portfolios) AS i
+        """,
+        {"name": BENCHMARK_NAME, "portfolios": portfolios},
+    )
+    execute(
+        """
+        INSERT INTO applications (name, portfolio_id)
+        SELECT 'Application ' || i, p.id
+        FROM portfolios p, generate_series(1, :per_portfolio) AS i
+        WHERE p.name LIKE :name || ' %'
+        """,
+        {"name": BENCHMARK_NAME, "per_portfolio": applications_per_portfolio},
+    )
+
+    roles_sql = """
+        WITH resources AS (
+            SELECT id, row_number() OVER (ORDER BY id) - 1 AS n
+            FROM {table} WHERE {filter}
+        ), benchmark_users AS (
+            SELECT id, row_number() OVER (ORDER BY id) - 1 AS n
+            FROM users WHERE first_name = 'Benchmark'
+        ), total AS (
+            SELECT count(*) AS count FROM resources
+        )
+        INSERT INTO {roles_table} ({column}, user_id, status)
+        SELECT DISTINCT ON (r.id, u.id)
+            r.id,
+            u.id,
+            CASE WHEN random() < 0.9 THEN 'ACTIVE' ELSE 'PENDING' END
+        FROM generate_series(0, :roles - 1) AS i
+        CROSS JOIN total
+        JOIN resources r ON r.n = i % total.count
+        JOIN benchmark_users u ON u.n = (i / total.count * 7919 + i) % :users
+        """
+    execute(
+        roles_sql.format(
+            table="portfolios",
+            filter="name LIKE :name || ' %'",
+            roles_table="portfolio_roles",
+            column="portfolio_id",
+        ),
+        {"name": BENCHMARK_NAME, "roles": portfolio_roles, "users": users},
+    )
+    execute(
+        roles_sql.format(
+            table="applications",
+            filter=(
+                "portfolio_id IN "
+                "(SELECT id FROM portfolios WHERE name LIKE :name || ' %')"
+            ),
+            roles_table="application_roles",
+            column="application_id",
+        ),
+        {"name": BENCHMARK_NAME, "roles": application_roles, "users": users},
+    )
+    execute("ANALYZE users, portfolios, applications")
+    execute("ANALYZE portfolio_roles, application_roles")
+
+
+def sample_users(count):
+    return (
+        db.session.query(User)
+        .filter(User.first_name == "Benchmark")
+        .order_by(User.dod_id)
+        .limit(count)
+        .all()
+    )
+
+
+class Explain(Executable, ClauseElement):
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kwargs):
+    return "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + compiler.process(
+        element.statement, **kwargs
+    )
+
+
+def explain(query):
+    return db.session.execute(Explain(query.statement)).scalar()[0]
+
+
+def _latencies(latencies):
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "mean_ms": statistics.mean(latencies) * 1e3,
+        "p50_ms": latencies[len(latencies) // 2] * 1e3,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3,
+        "max_ms": latencies[-1] * 1e3,
+    }
+
+
+def measure(users, iterations):
+    results = {}
+    for name, build_query in QUERIES.items():
+        latencies = []
+        portfolio_counts = []
+        for _ in range(iterations):
+            for user in users:
+                start = time.perf_counter()
+                portfolios = build_query(user).all()
+                latencies.append(time.perf_counter() - start)
+                portfolio_counts.append(len(portfolios))
+                db.session.expunge_all()
+
+        plan = explain(build_query(users[0]))
+        results[name] = {
+            "latency": _latencies(latencies),
+            "mean_portfolios_per_user": statistics.mean(portfolio_counts),
+            "plan_execution_ms": plan["Execution Time"],
+            "plan": plan["Plan"],
+        }
+
+    return results
+
+
+def _git_commit():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], cwd=parent_dir, stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    connection = db.engine.connect()
+    transaction = connection.begin()
+    db.session = db.create_scoped_session(options=dict(bind=connection, binds={}))
+
+    try:
+        start = time.perf_counter()
+        generate(
+            args.portfolios,
+            args.applications_per_portfolio,
+            args.users,
+            args.portfolio_roles,
+            args.application_roles,
+        )
+        generate_s = time.perf_counter() - start
+
+        users = sample_users(args.sample_users)
+        results = {"with_indexes": measure(users, args.iterations)}
+
+        # DDL is transactional in Postgres, so the rollback restores these
+        for index in ROLE_INDEXES:
+            db.session.execute("DROP INDEX {}".format(index))
+        results["without_indexes"] = measure(users, args.iterations)
+    finally:
+        db.session.remove()
+        transaction.rollback()
+        connection.close()
+
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "portfolios": args.portfolios,
+        "applications": args.portfolios * args.applications_per_portfolio,
+        "users": args.users,
+        "portfolio_roles": args.portfolio_roles,
+        "application_roles": args.application_roles,
+        "generate_s": generate_s,
+        "queries": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark PortfoliosQuery.get_for_user."
+    )
+    parser.add_argument("--portfolios", type=int, default=10000)
+    parser.add_argument("--applications-per-portfolio", type=int, default=3)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--portfolio-roles", type=int, default=40000)
+    parser.add_argument("--application-roles", type=int, default=60000)
+    parser.add_argument("--sample-users", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    config = make_config({"DISABLE_CRL_CHECK": True, "DEBUG": False})
+    app = make_app(config)
+    with app.app_context():
+        results = run(args)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
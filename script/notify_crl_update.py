@@ -0,0 +1,27 @@
+#! .venv/bin/python
+# Add root project dir to the python path
+import os
+import sys
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(parent_dir)
+
+import redis
+from atst.app import make_config
+from atst.domain.authnid.crl.util import load_crl_manifest, CRL_UPDATE_CHANNEL
+
+
+def notify_crl_update(redis_client, crl_dir):
+    manifest = load_crl_manifest(crl_dir)
+    receivers = redis_client.publish(CRL_UPDATE_CHANNEL, manifest["version"])
+    print(
+        "Published CRL manifest version {} to {} workers".format(
+            manifest["version"], receivers
+        )
+    )
+
+
+if __name__ == "__main__":
+    config = make_config({"DISABLE_CRL_CHECK": True, "DEBUG": False})
+    crl_dir = sys.argv[1] if len(sys.argv) > 1 else config["CRL_STORAGE_CONTAINER"]
+    notify_crl_update(redis.Redis.from_url(config["REDIS_URI"]), crl_dir)
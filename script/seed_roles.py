@@ -11,6 +11,7 @@ from atst.app import make_config, make_app
 from atst.database import db
 from atst.models import PermissionSet
 from atst.domain.permission_sets import (
+    PermissionSets,
     ATAT_PERMISSION_SETS,
     PORTFOLIO_PERMISSION_SETS,
     APPLICATION_PERMISSION_SETS,
@@ -42,6 +43,7 @@ def seed_roles():
             print("Added new permission_set {}".format(permission_set.name))
 
     db.session.commit()
+    PermissionSets.clear_cache()
 
 
 if __name__ == "__main__":
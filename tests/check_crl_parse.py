@@ -1,7 +1,7 @@
 import os
 import pytest
 
-from atst.domain.authnid.crl.util import crl_local_path, CRL_LIST
+from atst.domain.authnid.crl.util import load_crl_manifest, CRL_LIST
 
 from tests.utils import parse_for_issuer_and_next_update
 
@@ -11,6 +11,8 @@ CRL_DIR = "crls"
 
 @pytest.mark.parametrize("crl_uri, issuer", CRL_LIST)
 def test_crl_scan_against_parse(crl_uri, issuer):
-    crl_path = crl_local_path(CRL_DIR, crl_uri)
+    manifest = load_crl_manifest(CRL_DIR)
+    entry = next(entry for entry in manifest["crls"] if entry["uri"] == crl_uri)
+    crl_path = os.path.join(CRL_DIR, entry["path"])
     parsed_der = parse_for_issuer_and_next_update(crl_path)
     assert issuer == parsed_der.hex()
@@ -1,19 +1,25 @@
 import os
 import pytest
+import threading
 import alembic.config
 import alembic.command
 from logging.config import dictConfig
 from werkzeug.datastructures import FileStorage
 from collections import OrderedDict
 from unittest.mock import Mock
+from uuid import uuid4
 
 from atst.app import make_app, make_config
 from atst.database import db as _db
+from atst.domain.audit_stream import AuditStream
+from atst.domain.authnid.crl.util import load_ca_certificates
 import tests.factories as factories
 from tests.mocks import PDF_FILENAME, PDF_FILENAME2
 from tests.utils import FakeLogger, FakeNotificationSender
 
 from datetime import datetime, timedelta
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography import x509
 from cryptography.hazmat.backends import default_backend
@@ -297,6 +303,11 @@ def ca_file(make_x509, ca_key, tmpdir, serialize_pki_object_to_disk):
     return ca_out
 
 
+@pytest.fixture
+def ca_certificates(ca_file):
+    return load_ca_certificates(str(ca_file))
+
+
 @pytest.fixture
 def expired_crl_file(make_crl, ca_key, tmpdir, serialize_pki_object_to_disk):
     crl = make_crl(ca_key, last_update_days=-7, next_update_days=-1)
@@ -315,6 +326,32 @@ def crl_file(make_crl, ca_key, tmpdir, serialize_pki_object_to_disk):
     return crl_out
 
 
+class QuietHTTPRequestHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def crl_server(tmpdir):
+    """
+    Serves the files in a temporary directory over HTTP on localhost, standing
+    in for the DISA CRL distribution point.
+    """
+    serve_dir = tmpdir.mkdir("crl-server")
+    handler = partial(QuietHTTPRequestHandler, directory=str(serve_dir))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    server.serve_dir = serve_dir
+    server.url = "http://127.0.0.1:{}".format(server.server_address[1])
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
 @pytest.fixture
 def mock_logger(app):
     real_logger = app.logger
@@ -335,6 +372,24 @@ def notification_sender(app):
     app.notification_sender = real_notification_sender
 
 
+@pytest.fixture
+def audit_stream(app, monkeypatch):
+    """
+    Turns on asynchronous audit logging, with events added to a stream of
+    their own.
+    """
+    stream = AuditStream(
+        app.redis, key="audit-events-test-{}".format(uuid4()), batch_size=2
+    )
+    monkeypatch.setattr(app, "audit_stream", stream)
+    monkeypatch.setitem(app.config, "USE_AUDIT_LOG", True)
+    monkeypatch.setitem(app.config, "AUDIT_LOG_ASYNC", True)
+
+    yield stream
+
+    app.redis.delete(stream.key)
+
+
 # This is the only effective means I could find to disable logging. Setting a
 # `celery_enable_logging` fixture to return False should work according to the
 # docs, but doesn't:
@@ -1,6 +1,7 @@
 import pytest
 
 from atst.domain.authnid import AuthenticationContext
+from atst.domain.authnid.utils import ParsedCertificate
 from atst.domain.authnid.crl import (
     CRLCache,
     CRLRevocationException,
@@ -21,6 +22,7 @@ class MockCRLCache:
         self.expired = expired
 
     def crl_check(self, cert):
+        self.checked = cert
         if self.valid:
             return True
         elif self.expired == True:
@@ -94,3 +96,22 @@ def test_user_cert_has_no_email():
     user = auth_context.get_user()
 
     assert user.email == None
+
+
+def test_certificate_is_parsed_once(monkeypatch):
+    parses = []
+    real_init = ParsedCertificate.__init__
+
+    def counting_init(self, cert):
+        parses.append(cert)
+        real_init(self, cert)
+
+    monkeypatch.setattr(ParsedCertificate, "__init__", counting_init)
+    crl_cache = MockCRLCache()
+    auth_context = AuthenticationContext(crl_cache, "SUCCESS", DOD_SDN, CERT)
+    auth_context.authenticate()
+    user = auth_context.get_user()
+
+    assert len(parses) == 1
+    assert crl_cache.checked is auth_context.certificate
+    assert user.email == FIXTURE_EMAIL_ADDRESS
@@ -3,6 +3,9 @@ import pytest
 import re
 import os
 import shutil
+import threading
+import time
+import pendulum
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.serialization import Encoding
 from OpenSSL import crypto
@@ -14,12 +17,17 @@ from atst.domain.authnid.crl import (
     NoOpCRLCache,
 )
 from atst.domain.authnid.crl.util import (
+    crl_index_path,
     load_crl_locations_cache,
     serialize_crl_locations_cache,
+    write_crl_index,
+    CRLIndex,
     CRLParseError,
     JSON_CACHE,
 )
 
+from atst.utils.ttl_cache import TTLCache
+
 from tests.mocks import FIXTURE_EMAIL_ADDRESS, DOD_CN
 from tests.utils import FakeLogger, parse_for_issuer_and_next_update, make_crl_list
 
@@ -109,6 +117,180 @@ def test_can_dynamically_update_crls(
         assert cache.crl_check(client_pem)
 
 
+def test_reuses_store_until_crl_changes(
+    ca_key,
+    ca_file,
+    crl_file,
+    rsa_key,
+    make_x509,
+    make_crl,
+    serialize_pki_object_to_disk,
+):
+    crl_dir = os.path.dirname(crl_file)
+    client_cert = make_x509(rsa_key(), signer_key=ca_key, cn="chewbacca")
+    parsed = crypto.load_certificate(
+        crypto.FILETYPE_PEM, client_cert.public_bytes(Encoding.PEM)
+    )
+    crl_list = make_crl_list(client_cert, crl_file)
+    cache = CRLCache(ca_file, crl_dir, crl_list=crl_list, store_class=MockX509Store)
+
+    store = cache._get_store(parsed)
+    assert cache._get_store(parsed) is store
+
+    revoked_crl = make_crl(ca_key, expired_serials=[client_cert.serial_number])
+    serialize_pki_object_to_disk(revoked_crl, crl_file, encoding=Encoding.DER)
+
+    assert cache._get_store(parsed) is not store
+
+
+def test_caches_verification_until_crl_changes(
+    monkeypatch,
+    ca_key,
+    ca_file,
+    crl_file,
+    rsa_key,
+    make_x509,
+    make_crl,
+    serialize_pki_object_to_disk,
+):
+    crl_dir = os.path.dirname(crl_file)
+    client_cert = make_x509(rsa_key(), signer_key=ca_key, cn="chewbacca")
+    client_pem = client_cert.public_bytes(Encoding.PEM)
+    crl_list = make_crl_list(client_cert, crl_file)
+    cache = CRLCache(
+        ca_file, crl_dir, crl_list=crl_list, verification_cache=TTLCache(60)
+    )
+    assert cache.crl_check(client_pem)
+
+    with monkeypatch.context() as m:
+        m.setattr(
+            crypto,
+            "X509StoreContext",
+            lambda store, cert: pytest.fail("store was used"),
+        )
+        assert cache.crl_check(client_pem)
+
+    revoked_crl = make_crl(ca_key, expired_serials=[client_cert.serial_number])
+    serialize_pki_object_to_disk(revoked_crl, crl_file, encoding=Encoding.DER)
+
+    with pytest.raises(CRLRevocationException):
+        cache.crl_check(client_pem)
+
+
+def test_background_refresh_caches_verification_under_checked_version(
+    ca_key,
+    ca_file,
+    crl_file,
+    rsa_key,
+    make_x509,
+    make_crl,
+    serialize_pki_object_to_disk,
+):
+    crl_dir = os.path.dirname(crl_file)
+    client_cert = make_x509(rsa_key(), signer_key=ca_key, cn="chewbacca")
+    client_pem = client_cert.public_bytes(Encoding.PEM)
+    crl_list = make_crl_list(client_cert, crl_file)
+    cache = CRLCache(
+        ca_file, crl_dir, crl_list=crl_list, verification_cache=TTLCache(60)
+    )
+    cache.refresh_in_background(3600)
+    try:
+        parsed = crypto.load_certificate(crypto.FILETYPE_PEM, client_pem)
+        cache._get_store(parsed)
+
+        revoked_crl = make_crl(ca_key, expired_serials=[client_cert.serial_number])
+        serialize_pki_object_to_disk(revoked_crl, crl_file, encoding=Encoding.DER)
+
+        # checked against the stale store, so recorded under its version
+        # rather than the version now on disk
+        assert cache.crl_check(client_pem)
+
+        cache.refresh()
+
+        with pytest.raises(CRLRevocationException):
+            cache.crl_check(client_pem)
+    finally:
+        cache.stop_background_refresh()
+
+
+def test_cached_verification_expires_with_the_crl(
+    monkeypatch, ca_key, ca_file, crl_file, rsa_key, make_x509
+):
+    crl_dir = os.path.dirname(crl_file)
+    client_cert = make_x509(rsa_key(), signer_key=ca_key, cn="chewbacca")
+    client_pem = client_cert.public_bytes(Encoding.PEM)
+    crl_list = make_crl_list(client_cert, crl_file)
+    cache = CRLCache(
+        ca_file, crl_dir, crl_list=crl_list, verification_cache=TTLCache(60)
+    )
+    assert cache.crl_check(client_pem)
+
+    contexts = []
+    store_context = crypto.X509StoreContext
+
+    def _store_context(store, cert):
+        contexts.append(store)
+        return store_context(store, cert)
+
+    monkeypatch.setattr(crypto, "X509StoreContext", _store_context)
+    after_next_update = pendulum.now().add(days=60).timestamp()
+    monkeypatch.setattr(time, "time", lambda: after_next_update)
+    assert cache.crl_check(client_pem)
+    assert contexts
+
+
+def test_cached_index_verification_is_not_used_once_the_crl_expires(
+    monkeypatch, app, ca_key, ca_file, crl_file, rsa_key, make_x509, ca_certificates
+):
+    client_cert = make_x509(rsa_key(), signer_key=ca_key, cn="chewbacca")
+    client_pem = client_cert.public_bytes(Encoding.PEM)
+    write_crl_index(str(crl_file), ca_certificates)
+    crl_dir = os.path.dirname(crl_file)
+    crl_list = make_crl_list(client_cert, crl_file)
+    cache = IndexOnlyCRLCache(
+        ca_file, crl_dir, crl_list=crl_list, verification_cache=TTLCache(60)
+    )
+    assert cache.crl_check(client_pem)
+
+    after_next_update = pendulum.now().add(days=60)
+    monkeypatch.setattr(pendulum, "now", lambda *args: after_next_update)
+    monkeypatch.setattr(time, "time", after_next_update.timestamp)
+    with pytest.raises(CRLInvalidException):
+        cache.crl_check(client_pem)
+
+
+def test_concurrent_checks_build_store_once(
+    ca_key, ca_file, crl_file, rsa_key, make_x509
+):
+    class CountingCRLCache(CRLCache):
+        builds = 0
+
+        def _build_store(self, *args):
+            CountingCRLCache.builds += 1
+            time.sleep(0.05)
+            return super()._build_store(*args)
+
+    crl_dir = os.path.dirname(crl_file)
+    client_cert = make_x509(rsa_key(), signer_key=ca_key, cn="chewbacca")
+    parsed = crypto.load_certificate(
+        crypto.FILETYPE_PEM, client_cert.public_bytes(Encoding.PEM)
+    )
+    crl_list = make_crl_list(client_cert, crl_file)
+    cache = CountingCRLCache(
+        ca_file, crl_dir, crl_list=crl_list, store_class=MockX509Store
+    )
+
+    threads = [
+        threading.Thread(target=cache._get_store, args=(parsed,)) for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert CountingCRLCache.builds == 1
+
+
 def test_throws_error_for_missing_issuer(app):
     cache = CRLCache(
         "ssl/server-certs/ca-chain.pem", app.config["CRL_STORAGE_CONTAINER"]
@@ -186,3 +368,189 @@ def test_load_crl_locations_cache(crl_file):
     serialize_crl_locations_cache(dir_)
     cache = load_crl_locations_cache(dir_)
     assert isinstance(cache, dict)
+
+
+def test_crl_index_lookup(
+    ca_key, crl_file, make_crl, serialize_pki_object_to_disk, ca_certificates
+):
+    revoked = [1, 255, 256, 2 ** 100]
+    crl = make_crl(ca_key, expired_serials=revoked)
+    serialize_pki_object_to_disk(crl, crl_file, encoding=Encoding.DER)
+
+    index = CRLIndex(write_crl_index(str(crl_file), ca_certificates))
+    assert len(index) == len(revoked)
+    for serial in revoked:
+        assert index.is_revoked(serial)
+    for serial in [0, 2, 257, 2 ** 100 + 1, 2 ** 200]:
+        assert not index.is_revoked(serial)
+    assert not index.is_expired()
+
+
+def test_crl_index_rejects_bad_files(tmpdir):
+    bad_index = tmpdir.join("bad.crl.idx")
+    bad_index.write_binary(b"not an index")
+    with pytest.raises(CRLParseError):
+        CRLIndex(str(bad_index))
+
+    empty_index = tmpdir.join("empty.crl.idx")
+    empty_index.write_binary(b"")
+    with pytest.raises(CRLParseError):
+        CRLIndex(str(empty_index))
+
+    bad_crl = tmpdir.join("bad.crl")
+    bad_crl.write_binary(b"not a crl")
+    with pytest.raises(CRLParseError):
+        write_crl_index(str(bad_crl), {})
+
+
+def test_crl_index_is_only_written_for_verified_crls(
+    ca_key, crl_file, rsa_key, make_crl, serialize_pki_object_to_disk, ca_certificates
+):
+    # a CRL in the CA's name, signed by another key
+    forged = make_crl(rsa_key())
+    serialize_pki_object_to_disk(forged, crl_file, encoding=Encoding.DER)
+    with pytest.raises(CRLParseError):
+        write_crl_index(str(crl_file), ca_certificates)
+
+    other_issuer = make_crl(ca_key, cn="OTHER")
+    serialize_pki_object_to_disk(other_issuer, crl_file, encoding=Encoding.DER)
+    with pytest.raises(CRLParseError):
+        write_crl_index(str(crl_file), ca_certificates)
+
+    crl = make_crl(ca_key)
+    serialize_pki_object_to_disk(crl, crl_file, encoding=Encoding.DER)
+    issuer = crl.issuer.public_bytes(default_backend()).hex()
+    with pytest.raises(CRLParseError):
+        write_crl_index(str(crl_file), ca_certificates, issuer="00" + issuer)
+    assert write_crl_index(str(crl_file), ca_certificates, issuer=issuer)
+
+
+class IndexOnlyCRLCache(CRLCache):
+    def _load_crl(self, crl_location):
+        raise AssertionError("CRL should not be parsed when an index exists")
+
+
+def test_crl_validation_with_index(
+    app,
+    ca_key,
+    ca_file,
+    crl_file,
+    rsa_key,
+    make_x509,
+    make_crl,
+    serialize_pki_object_to_disk,
+    ca_certificates,
+):
+    good_cert = make_x509(rsa_key(), signer_key=ca_key, cn="luke")
+    bad_cert = make_x509(rsa_key(), signer_key=ca_key, cn="darth")
+
+    crl = make_crl(ca_key, expired_serials=[bad_cert.serial_number])
+    serialize_pki_object_to_disk(crl, crl_file, encoding=Encoding.DER)
+    write_crl_index(str(crl_file), ca_certificates)
+    crl_dir = os.path.dirname(crl_file)
+
+    crl_list = make_crl_list(good_cert, crl_file)
+    cache = IndexOnlyCRLCache(ca_file, crl_dir, crl_list=crl_list)
+    assert cache.crl_check(good_cert.public_bytes(Encoding.PEM).decode())
+    with pytest.raises(CRLRevocationException):
+        cache.crl_check(bad_cert.public_bytes(Encoding.PEM).decode())
+
+
+def test_crl_validation_with_index_rejects_untrusted_cert(
+    app,
+    ca_file,
+    crl_file,
+    rsa_key,
+    make_x509,
+    make_crl,
+    serialize_pki_object_to_disk,
+    ca_certificates,
+):
+    other_key = rsa_key()
+    cert = make_x509(rsa_key(), signer_key=other_key, cn="han")
+    write_crl_index(str(crl_file), ca_certificates)
+    crl_dir = os.path.dirname(crl_file)
+
+    crl_list = make_crl_list(cert, crl_file)
+    cache = IndexOnlyCRLCache(ca_file, crl_dir, crl_list=crl_list)
+    with pytest.raises(CRLRevocationException):
+        cache.crl_check(cert.public_bytes(Encoding.PEM).decode())
+
+
+def test_unreadable_crl_index_falls_back_to_crl(
+    ca_key,
+    ca_file,
+    crl_file,
+    rsa_key,
+    make_x509,
+    make_crl,
+    serialize_pki_object_to_disk,
+):
+    client_cert = make_x509(rsa_key(), signer_key=ca_key, cn="chewbacca")
+    crl = make_crl(ca_key, expired_serials=[client_cert.serial_number])
+    serialize_pki_object_to_disk(crl, crl_file, encoding=Encoding.DER)
+    with open(crl_index_path(str(crl_file)), "wb"):
+        pass
+
+    crl_list = make_crl_list(client_cert, crl_file)
+    cache = CRLCache(ca_file, os.path.dirname(crl_file), crl_list=crl_list)
+    with pytest.raises(CRLRevocationException):
+        cache.crl_check(client_cert.public_bytes(Encoding.PEM))
+
+
+def test_stale_crl_index_is_ignored(
+    ca_key,
+    ca_file,
+    crl_file,
+    rsa_key,
+    make_x509,
+    make_crl,
+    serialize_pki_object_to_disk,
+    ca_certificates,
+):
+    crl_dir = os.path.dirname(crl_file)
+    client_cert = make_x509(rsa_key(), signer_key=ca_key, cn="chewbacca")
+    client_pem = client_cert.public_bytes(Encoding.PEM)
+    write_crl_index(str(crl_file), ca_certificates)
+    crl_list = make_crl_list(client_cert, crl_file)
+    cache = CRLCache(ca_file, crl_dir, crl_list=crl_list)
+    assert cache.crl_check(client_pem)
+
+    # replace the CRL without regenerating its index
+    revoked_crl = make_crl(ca_key, expired_serials=[client_cert.serial_number])
+    serialize_pki_object_to_disk(revoked_crl, crl_file, encoding=Encoding.DER)
+
+    with pytest.raises(CRLRevocationException):
+        cache.crl_check(client_pem)
+
+
+def test_expired_crl_index_raises_CRLInvalidException_with_failover_config_false(
+    app, ca_file, expired_crl_file, ca_key, make_x509, rsa_key, ca_certificates
+):
+    client_cert = make_x509(rsa_key(), signer_key=ca_key, cn="chewbacca")
+    client_pem = client_cert.public_bytes(Encoding.PEM)
+    write_crl_index(str(expired_crl_file), ca_certificates)
+    crl_dir = os.path.dirname(expired_crl_file)
+    crl_list = make_crl_list(client_cert, expired_crl_file)
+    crl_cache = IndexOnlyCRLCache(ca_file, crl_dir, crl_list=crl_list)
+    with pytest.raises(CRLInvalidException):
+        crl_cache.crl_check(client_pem)
+
+
+def test_expired_crl_index_passes_with_failover_config_true(
+    ca_file,
+    expired_crl_file,
+    ca_key,
+    make_x509,
+    rsa_key,
+    crl_failover_open_app,
+    ca_certificates,
+):
+    client_cert = make_x509(rsa_key(), signer_key=ca_key, cn="chewbacca")
+    client_pem = client_cert.public_bytes(Encoding.PEM)
+    write_crl_index(str(expired_crl_file), ca_certificates)
+    crl_dir = os.path.dirname(expired_crl_file)
+    crl_list = make_crl_list(client_cert, expired_crl_file)
+    crl_cache = IndexOnlyCRLCache(ca_file, crl_dir, crl_list=crl_list)
+
+    assert crl_cache.crl_check(client_pem)
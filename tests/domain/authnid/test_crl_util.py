@@ -0,0 +1,481 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.x509.oid import NameOID
+from OpenSSL import crypto
+
+from atst.domain.authnid.crl import CRLCache, CRLRevocationException
+
+from atst.domain.authnid.crl.util import (
+    crl_index_path,
+    crl_sync_lock,
+    load_crl_manifest,
+    sync_crls,
+    CRL_UPDATE_CHANNEL,
+    CRLIndex,
+)
+
+from tests.utils import FakeLogger
+
+
+def set_mtime(path, hours_from_now):
+    mtime = time.time() + hours_from_now * 3600
+    os.utime(str(path), (mtime, mtime))
+
+
+def serve_crl(crl_server, crl, name, hours_from_now=1):
+    served = crl_server.serve_dir.join(name)
+    served.write_binary(crl.public_bytes(Encoding.DER))
+    # make sure the served file is newer than anything already published
+    set_mtime(served, hours_from_now)
+    issuer = crl.issuer.public_bytes(default_backend()).hex()
+    return ("{}/{}".format(crl_server.url, name), issuer)
+
+
+@pytest.fixture
+def ca_signing_key(rsa_key, make_x509, ca_certificates):
+    """
+    Make a key for a new CA, whose certificate is added to `ca_certificates`.
+    """
+
+    def _ca_signing_key(cn):
+        key = rsa_key()
+        certificate = make_x509(key, cn=cn, signer_cn=cn)
+        subject = certificate.subject.public_bytes(default_backend())
+        ca_certificates.setdefault(subject, []).append(certificate)
+        return key
+
+    return _ca_signing_key
+
+
+def make_served_crls(crl_server, ca_signing_key, make_crl, count):
+    return [
+        serve_crl(
+            crl_server,
+            make_crl(
+                ca_signing_key("ATAT {}".format(i)),
+                cn="ATAT {}".format(i),
+                expired_serials=[i + 1],
+            ),
+            "crl-{}.crl".format(i),
+        )
+        for i in range(count)
+    ]
+
+
+def sync(tmpdir, ca_certificates, crl_list, **kwargs):
+    tmp_dir = tmpdir.ensure("crl-tmp", dir=True)
+    final_dir = tmpdir.ensure("crls", dir=True)
+    kwargs.setdefault("logger", FakeLogger())
+    return sync_crls(
+        str(tmp_dir), str(final_dir), ca_certificates, crl_list=crl_list, **kwargs
+    )
+
+
+def test_sync_crls_downloads_concurrently(
+    crl_server, make_crl, tmpdir, ca_certificates, ca_signing_key
+):
+    crl_list = make_served_crls(crl_server, ca_signing_key, make_crl, 6)
+    logger = FakeLogger()
+
+    manifest = sync(tmpdir, ca_certificates, crl_list, concurrency=3, logger=logger)
+
+    assert manifest["version"] == 1
+    assert [entry["uri"] for entry in manifest["crls"]] == [uri for uri, _ in crl_list]
+    synced = [m for m in logger.messages if m.startswith("successfully synced")]
+    assert len(synced) == len(crl_list)
+    assert all("bytes in" in message for message in synced)
+
+
+def test_sync_crls_publishes_content_hashed_crls(
+    crl_server, make_crl, tmpdir, ca_certificates, ca_signing_key
+):
+    crl_list = make_served_crls(crl_server, ca_signing_key, make_crl, 2)
+    sync(tmpdir, ca_certificates, crl_list)
+
+    final_dir = tmpdir.join("crls")
+    manifest = load_crl_manifest(str(final_dir))
+    for i, ((uri, issuer), entry) in enumerate(zip(crl_list, manifest["crls"])):
+        assert entry["uri"] == uri
+        assert entry["issuer"] == issuer
+        assert entry["path"] == "{}.crl".format(entry["sha256"])
+        published = final_dir.join(entry["path"])
+        assert published.size() == entry["size"]
+        index = CRLIndex(crl_index_path(str(published)))
+        assert index.next_update == entry["next_update"]
+        assert index.is_revoked(i + 1)
+
+
+def test_sync_crls_waits_for_a_sync_already_running(
+    crl_server, make_crl, tmpdir, ca_certificates, ca_signing_key
+):
+    crl_list = make_served_crls(crl_server, ca_signing_key, make_crl, 1)
+    final_dir = tmpdir.ensure("crls", dir=True)
+    results = []
+
+    with crl_sync_lock(str(final_dir)):
+        thread = threading.Thread(
+            target=lambda: results.append(sync(tmpdir, ca_certificates, crl_list))
+        )
+        thread.start()
+        thread.join(0.5)
+        assert thread.is_alive()
+        assert not final_dir.join("crl_manifest.json").exists()
+
+    thread.join()
+    assert results[0]["version"] == 1
+
+
+def test_sync_crls_skips_unmodified_crls(
+    crl_server, make_crl, tmpdir, ca_certificates, ca_signing_key
+):
+    crl_list = make_served_crls(crl_server, ca_signing_key, make_crl, 2)
+    first = sync(tmpdir, ca_certificates, crl_list)
+    # pretend the published CRLs were written after the served ones
+    for entry in first["crls"]:
+        set_mtime(tmpdir.join("crls", entry["path"]), 2)
+
+    logger = FakeLogger()
+    second = sync(tmpdir, ca_certificates, crl_list, logger=logger)
+
+    assert second == first
+    skipped = [m for m in logger.messages if m.startswith("no updates")]
+    assert len(skipped) == len(crl_list)
+
+
+def test_sync_crls_only_republishes_changed_crls(
+    crl_server, make_crl, tmpdir, ca_certificates, ca_signing_key
+):
+    crl_list = make_served_crls(crl_server, ca_signing_key, make_crl, 2)
+    first = sync(tmpdir, ca_certificates, crl_list)
+    for entry in first["crls"]:
+        set_mtime(tmpdir.join("crls", entry["path"]), 2)
+
+    crl_list[1] = serve_crl(
+        crl_server, make_crl(ca_signing_key("ATAT 1"), cn="ATAT 1"), "crl-1.crl", 3
+    )
+    second = sync(tmpdir, ca_certificates, crl_list)
+
+    assert second["version"] == first["version"] + 1
+    assert second["crls"][0] == first["crls"][0]
+    assert second["crls"][1]["sha256"] != first["crls"][1]["sha256"]
+    # the previous version is kept for workers still reading it
+    assert tmpdir.join("crls", first["crls"][1]["path"]).exists()
+
+    crl_list[1] = serve_crl(
+        crl_server, make_crl(ca_signing_key("ATAT 1"), cn="ATAT 1"), "crl-1.crl", 4
+    )
+    sync(tmpdir, ca_certificates, crl_list)
+
+    assert not tmpdir.join("crls", first["crls"][1]["path"]).exists()
+    assert tmpdir.join("crls", first["crls"][0]["path"]).exists()
+
+
+def test_sync_crls_keeps_published_crl_when_download_fails(
+    crl_server, make_crl, tmpdir, ca_certificates, ca_signing_key
+):
+    crl_list = make_served_crls(crl_server, ca_signing_key, make_crl, 1)
+    crl_list.append(("{}/missing.crl".format(crl_server.url), "abcd"))
+    logger = FakeLogger()
+
+    first = sync(tmpdir, ca_certificates, crl_list, logger=logger)
+
+    assert [entry["issuer"] for entry in first["crls"]] == [crl_list[0][1]]
+    assert any("missing.crl" in message for message in logger.messages)
+
+    crl_server.serve_dir.join("crl-0.crl").remove()
+    second = sync(tmpdir, ca_certificates, crl_list)
+
+    assert second == first
+
+
+def test_sync_crls_rejects_crls_not_signed_by_a_known_ca(
+    crl_server, rsa_key, make_crl, tmpdir, ca_certificates, ca_signing_key
+):
+    crl_list = make_served_crls(crl_server, ca_signing_key, make_crl, 1)
+    first = sync(tmpdir, ca_certificates, crl_list)
+
+    # a CRL in the same CA's name, signed by another key
+    forged = make_crl(rsa_key(), cn="ATAT 0")
+    crl_list[0] = serve_crl(crl_server, forged, "crl-0.crl", 2)
+    logger = FakeLogger()
+    second = sync(tmpdir, ca_certificates, crl_list, logger=logger)
+
+    assert second == first
+    assert any(
+        "not signed by a known certificate authority" in message
+        for message in logger.messages
+    )
+
+
+def test_crl_cache_reloads_only_changed_crls(
+    app,
+    crl_server,
+    ca_key,
+    ca_file,
+    rsa_key,
+    make_x509,
+    make_crl,
+    tmpdir,
+    ca_certificates,
+    ca_signing_key,
+):
+    other_key = ca_signing_key("OTHER")
+    client_cert = make_x509(rsa_key(), signer_key=ca_key, cn="chewbacca")
+    client_pem = client_cert.public_bytes(Encoding.PEM)
+    crl_list = [
+        serve_crl(crl_server, make_crl(ca_key), "atat.crl"),
+        serve_crl(crl_server, make_crl(other_key, cn="OTHER"), "other.crl"),
+    ]
+    sync(tmpdir, ca_certificates, crl_list)
+
+    cache = CRLCache(ca_file, str(tmpdir.join("crls")))
+    assert cache.manifest_version == 1
+    assert cache.crl_check(client_pem)
+    other_cert = make_x509(rsa_key(), signer_key=other_key, signer_cn="OTHER")
+    other_index = cache._get_index(
+        crypto.X509.from_cryptography(other_cert).get_issuer()
+    )
+
+    assert other_index is not None
+
+    revoked_crl = make_crl(ca_key, expired_serials=[client_cert.serial_number])
+    crl_list[0] = serve_crl(crl_server, revoked_crl, "atat.crl", 2)
+    sync(tmpdir, ca_certificates, crl_list)
+
+    with pytest.raises(CRLRevocationException):
+        cache.crl_check(client_pem)
+    assert cache.manifest_version == 2
+    assert (
+        cache._get_index(crypto.X509.from_cryptography(other_cert).get_issuer())
+        is other_index
+    )
+
+
+def test_background_refresh_keeps_builds_off_request_path(
+    crl_server, ca_key, ca_file, rsa_key, make_x509, make_crl, tmpdir, ca_certificates
+):
+    client_cert = make_x509(rsa_key(), signer_key=ca_key, cn="chewbacca")
+    client_pem = client_cert.public_bytes(Encoding.PEM)
+    crl_list = [serve_crl(crl_server, make_crl(ca_key), "atat.crl")]
+    sync(tmpdir, ca_certificates, crl_list)
+
+    cache = CRLCache(ca_file, str(tmpdir.join("crls")))
+    cache.refresh_in_background(3600)
+    try:
+        assert cache.crl_check(client_pem)
+
+        revoked_crl = make_crl(ca_key, expired_serials=[client_cert.serial_number])
+        crl_list[0] = serve_crl(crl_server, revoked_crl, "atat.crl", 2)
+        sync(tmpdir, ca_certificates, crl_list)
+
+        # requests keep using what is cached until the refresher swaps it
+        assert cache.crl_check(client_pem)
+        assert cache.manifest_version == 1
+
+        cache.refresh()
+
+        assert cache.manifest_version == 2
+        assert cache.refresh_stats["refreshes"] == 1
+        assert cache.refresh_stats["rebuilt"] == 1
+        assert cache.refresh_stats["last_duration"] >= 0
+        with pytest.raises(CRLRevocationException):
+            cache.crl_check(client_pem)
+    finally:
+        cache.stop_background_refresh()
+
+
+def test_background_refresh_logs_stats(
+    crl_server, ca_key, ca_file, make_crl, tmpdir, ca_certificates
+):
+    crl_list = [serve_crl(crl_server, make_crl(ca_key), "atat.crl")]
+    sync(tmpdir, ca_certificates, crl_list)
+
+    logger = FakeLogger()
+    cache = CRLCache(ca_file, str(tmpdir.join("crls")), logger=logger)
+    cache.refresh()
+    cache.refresh()
+
+    stats = [extra["crl_refresh"] for extra in logger.extras if "crl_refresh" in extra]
+    assert [s["refreshes"] for s in stats] == [1, 2]
+    assert all(s["failures"] == 0 for s in stats)
+    assert logger.extras[-1]["tags"] == ["authorization", "crl"]
+
+
+def test_background_refresh_wakes_on_crl_update(
+    app,
+    crl_server,
+    ca_key,
+    ca_file,
+    rsa_key,
+    make_x509,
+    make_crl,
+    tmpdir,
+    ca_certificates,
+):
+    client_cert = make_x509(rsa_key(), signer_key=ca_key, cn="chewbacca")
+    client_pem = client_cert.public_bytes(Encoding.PEM)
+    crl_list = [serve_crl(crl_server, make_crl(ca_key), "atat.crl")]
+    sync(tmpdir, ca_certificates, crl_list)
+
+    cache = CRLCache(ca_file, str(tmpdir.join("crls")))
+    cache.refresh_in_background(3600, redis=app.redis)
+    try:
+        assert cache.crl_check(client_pem)
+        wait_for(lambda: app.redis.pubsub_numsub(CRL_UPDATE_CHANNEL)[0][1] > 0)
+
+        revoked_crl = make_crl(ca_key, expired_serials=[client_cert.serial_number])
+        crl_list[0] = serve_crl(crl_server, revoked_crl, "atat.crl", 2)
+        sync(tmpdir, ca_certificates, crl_list)
+        app.redis.publish(CRL_UPDATE_CHANNEL, 2)
+
+        wait_for(lambda: cache.manifest_version == 2)
+        with pytest.raises(CRLRevocationException):
+            cache.crl_check(client_pem)
+    finally:
+        cache.stop_background_refresh()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def make_base_crl(ca_key, crl_server, crl_number, serials):
+    delta_uri = "{}/atat-delta.crl".format(crl_server.url)
+    builder = crl_builder(serials).add_extension(x509.CRLNumber(crl_number), False)
+    builder = builder.add_extension(
+        x509.FreshestCRL(
+            [
+                x509.DistributionPoint(
+                    [x509.UniformResourceIdentifier(delta_uri)], None, None, None
+                )
+            ]
+        ),
+        False,
+    )
+    return builder.sign(ca_key, hashes.SHA256(), default_backend())
+
+
+def make_delta_crl(ca_key, crl_number, base_crl_number, serials, removed=()):
+    builder = crl_builder(serials, removed, next_update_days=1)
+    builder = builder.add_extension(x509.CRLNumber(crl_number), False)
+    builder = builder.add_extension(x509.DeltaCRLIndicator(base_crl_number), True)
+    return builder.sign(ca_key, hashes.SHA256(), default_backend())
+
+
+def crl_builder(serials, removed=(), next_update_days=7):
+    now = datetime.utcnow()
+    revoked = [
+        x509.RevokedCertificateBuilder()
+        .serial_number(serial)
+        .revocation_date(now)
+        .build(default_backend())
+        for serial in serials
+    ] + [
+        x509.RevokedCertificateBuilder()
+        .serial_number(serial)
+        .revocation_date(now)
+        .add_extension(x509.CRLReason(x509.ReasonFlags.remove_from_crl), False)
+        .build(default_backend())
+        for serial in removed
+    ]
+    return x509.CertificateRevocationListBuilder(
+        issuer_name=x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "ATAT")]),
+        last_update=now - timedelta(days=1),
+        next_update=now + timedelta(days=next_update_days),
+        revoked_certificates=revoked,
+    )
+
+
+@pytest.fixture
+def client_certs(ca_key, rsa_key, make_x509):
+    return [make_x509(rsa_key(), signer_key=ca_key, cn=cn) for cn in ("a", "b", "c")]
+
+
+def checks(cache, certs):
+    results = []
+    for cert in certs:
+        try:
+            results.append(cache.crl_check(cert.public_bytes(Encoding.PEM)))
+        except CRLRevocationException:
+            results.append(False)
+    return results
+
+
+def test_sync_merges_delta_crl(
+    monkeypatch, crl_server, ca_key, ca_file, client_certs, tmpdir, ca_certificates
+):
+    a, b, c = client_certs
+    base = make_base_crl(ca_key, crl_server, 10, [a.serial_number])
+    crl_list = [serve_crl(crl_server, base, "atat.crl")]
+    serve_crl(
+        crl_server, make_delta_crl(ca_key, 11, 10, [b.serial_number]), "atat-delta.crl"
+    )
+
+    manifest = sync(tmpdir, ca_certificates, crl_list)
+
+    (entry,) = manifest["crls"]
+    assert entry["crl_number"] == 10
+    assert entry["delta_uri"] == "{}/atat-delta.crl".format(crl_server.url)
+    assert tmpdir.join("crls", entry["delta"]["index"]).check()
+
+    cache = CRLCache(ca_file, str(tmpdir.join("crls")))
+    assert checks(cache, client_certs) == [False, False, True]
+
+    # the full CRL store applies the delta as well
+    monkeypatch.setattr(cache, "_get_index", lambda issuer: None)
+    assert checks(cache, client_certs) == [False, False, True]
+
+
+def test_deltas_only_sync_skips_current_base_crl(
+    crl_server, ca_key, ca_file, client_certs, tmpdir, ca_certificates
+):
+    a, b, c = client_certs
+    base = make_base_crl(ca_key, crl_server, 10, [a.serial_number])
+    crl_list = [serve_crl(crl_server, base, "atat.crl")]
+    serve_crl(crl_server, make_delta_crl(ca_key, 11, 10, []), "atat-delta.crl")
+    first = sync(tmpdir, ca_certificates, crl_list)
+    cache = CRLCache(ca_file, str(tmpdir.join("crls")))
+    assert checks(cache, client_certs) == [False, True, True]
+
+    newer_base = make_base_crl(ca_key, crl_server, 11, [b.serial_number])
+    serve_crl(crl_server, newer_base, "atat.crl", 2)
+    delta = make_delta_crl(ca_key, 12, 10, [c.serial_number], removed=[a.serial_number])
+    serve_crl(crl_server, delta, "atat-delta.crl", 2)
+    logger = FakeLogger()
+    second = sync(tmpdir, ca_certificates, crl_list, deltas_only=True, logger=logger)
+
+    assert second["version"] == 2
+    assert second["crls"][0]["sha256"] == first["crls"][0]["sha256"]
+    assert "updating CRL from {}".format(crl_list[0][0]) not in logger.messages
+    assert checks(cache, client_certs) == [True, True, False]
+
+
+def test_delta_crl_for_newer_base_fetches_base(
+    crl_server, ca_key, ca_file, client_certs, tmpdir, ca_certificates
+):
+    a, b, c = client_certs
+    base = make_base_crl(ca_key, crl_server, 10, [])
+    crl_list = [serve_crl(crl_server, base, "atat.crl")]
+    serve_crl(crl_server, make_delta_crl(ca_key, 11, 10, []), "atat-delta.crl")
+    sync(tmpdir, ca_certificates, crl_list)
+
+    newer_base = make_base_crl(ca_key, crl_server, 12, [a.serial_number])
+    serve_crl(crl_server, newer_base, "atat.crl", 2)
+    delta = make_delta_crl(ca_key, 13, 12, [b.serial_number])
+    serve_crl(crl_server, delta, "atat-delta.crl", 2)
+    manifest = sync(tmpdir, ca_certificates, crl_list, deltas_only=True)
+
+    assert manifest["crls"][0]["crl_number"] == 12
+    cache = CRLCache(ca_file, str(tmpdir.join("crls")))
+    assert checks(cache, client_certs) == [False, False, True]
@@ -1,6 +1,6 @@
 import pytest
 import atst.domain.authnid.utils as utils
-from tests.mocks import DOD_SDN, FIXTURE_EMAIL_ADDRESS
+from tests.mocks import DOD_CN, DOD_SDN, FIXTURE_EMAIL_ADDRESS
 
 
 def test_parse_sdn():
@@ -37,3 +37,22 @@ def test_parse_cert_with_no_san():
         email = utils.email_from_certificate(cert_file)
     (message,) = excinfo.value.args
     assert "subjectAltName" in message
+
+
+def test_parsed_certificate():
+    cert_file = open("tests/fixtures/{}.crt".format(FIXTURE_EMAIL_ADDRESS), "rb").read()
+    certificate = utils.ParsedCertificate(cert_file)
+
+    assert certificate.common_name == DOD_CN
+    assert certificate.dod_id == "5892460358"
+    assert certificate.sdn_info == utils.parse_sdn(DOD_SDN)
+    assert certificate.email == FIXTURE_EMAIL_ADDRESS
+    assert certificate.issuer_der == certificate.x509.get_issuer().der()
+    assert certificate.serial_number == certificate.x509.get_serial_number()
+    assert len(certificate.fingerprint) == 64
+    assert utils.ParsedCertificate.load(certificate) is certificate
+
+
+def test_parsed_certificate_with_no_email():
+    cert_file = open("tests/fixtures/no-san.crt", "rb").read()
+    assert utils.ParsedCertificate(cert_file).email is None
@@ -1,3 +1,8 @@
+import base64
+import json
+import math
+from datetime import datetime, timezone
+
 import pytest
 
 from atst.domain.applications import Applications
@@ -6,6 +11,7 @@ from atst.domain.exceptions import UnauthorizedError
 from atst.domain.permission_sets import PermissionSets
 from atst.domain.portfolios import Portfolios
 from atst.domain.users import Users
+from atst.models import AuditEvent
 from atst.models.portfolio_role import Status as PortfolioRoleStatus
 from tests.factories import (
     ApplicationFactory,
@@ -133,3 +139,140 @@ def test_get_all_includes_ccpo_user_changes():
     Users.revoke_ccpo_perms(user)
 
     assert len(AuditLog.get_all_events()) == len(initial_audit_log) + 2
+
+
+@pytest.fixture
+def portfolio_events():
+    portfolio = PortfolioFactory.create()
+    application = ApplicationFactory.create(portfolio=portfolio)
+    for _ in range(23):
+        AuditLog.log_system_event(
+            resource=application, action="create", portfolio=portfolio
+        )
+
+    # events created in the same transaction share a time_created
+    events = AuditLog.get_portfolio_events(portfolio)
+    return portfolio, [event.id for event in events]
+
+
+def _page(portfolio, page, cursor=None):
+    return AuditLog.get_portfolio_events(
+        portfolio, pagination_opts={"page": page, "per_page": 5, "cursor": cursor}
+    )
+
+
+def test_audit_log_pages_follow_cursors(portfolio_events):
+    portfolio, event_ids = portfolio_events
+
+    pages = [_page(portfolio, 1)]
+    last_page = pages[0].pages
+    for page in range(2, last_page + 1):
+        params = pages[-1].page_params(page)
+        pages.append(_page(portfolio, params["page"], params.get("cursor")))
+
+    assert pages[0].total == len(event_ids)
+    assert last_page == math.ceil(len(event_ids) / 5)
+    assert [event.id for page in pages for event in page] == event_ids
+
+    previous = _page(portfolio, 4, pages[-1].page_params(4).get("cursor"))
+    assert [event.id for event in previous] == event_ids[15:20]
+
+
+def test_audit_log_page_cursors_skip_pages_in_the_window(portfolio_events):
+    portfolio, event_ids = portfolio_events
+
+    second = _page(portfolio, 2)
+    fourth = _page(portfolio, 4, second.page_params(4)["cursor"])
+    assert [event.id for event in fourth] == event_ids[15:20]
+
+    third = _page(portfolio, 3, fourth.page_params(3)["cursor"])
+    assert [event.id for event in third] == event_ids[10:15]
+    assert third.page_params(3) == {
+        "page": 3,
+        "cursor": fourth.page_params(3)["cursor"],
+    }
+    assert third.page_params(1) == {"page": 1}
+
+
+def test_audit_log_pages_without_a_valid_cursor(portfolio_events):
+    portfolio, event_ids = portfolio_events
+
+    for cursor in [None, "not a cursor", "WzEsIFtdXQ=="]:
+        assert [event.id for event in _page(portfolio, 3, cursor)] == event_ids[10:15]
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        [2, 5],
+        [2, ["notadate", "x"]],
+        [2, ["2020-01-01T00:00:00+00:00", "not a uuid"]],
+        [2, [1, 2]],
+        ["2", []],
+        {"page": 2},
+        2,
+    ],
+)
+def test_audit_log_pages_ignore_tampered_cursors(portfolio_events, cursor):
+    portfolio, event_ids = portfolio_events
+    cursor = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+    assert [event.id for event in _page(portfolio, 3, cursor)] == event_ids[10:15]
+
+
+def test_audit_log_pages_large_results_without_counting(portfolio_events, monkeypatch):
+    portfolio, event_ids = portfolio_events
+    monkeypatch.setattr("atst.domain.common.query.EXACT_COUNT_LIMIT", 10)
+
+    pages = [_page(portfolio, 1)]
+    while pages[-1].has_next:
+        params = pages[-1].page_params(pages[-1].page + 1)
+        pages.append(_page(portfolio, params["page"], params.get("cursor")))
+
+    assert pages[0].total is None
+    assert pages[0].pages is None
+    assert len(pages) == math.ceil(len(event_ids) / 5)
+    assert [event.id for page in pages for event in page] == event_ids
+
+    params = pages[-1].page_params(len(pages) - 1)
+    previous = _page(portfolio, params["page"], params.get("cursor"))
+    assert [event.id for event in previous] == [event.id for event in pages[-2]]
+    assert previous.has_next
+
+
+def test_export_events(session):
+    portfolio = PortfolioFactory.create()
+    user = UserFactory.create()
+    times = [datetime(2020, 1, day, tzinfo=timezone.utc) for day in range(1, 4)]
+    for time_created, user_id, portfolio_id in [
+        (times[1], None, portfolio.id),
+        (times[0], user.id, portfolio.id),
+        (times[2], None, None),
+    ]:
+        session.add(
+            AuditEvent(
+                user_id=user_id,
+                portfolio_id=portfolio_id,
+                resource_type="portfolio",
+                resource_id=portfolio.id,
+                action="update",
+                time_created=time_created,
+            )
+        )
+    session.commit()
+
+    # leaves out the events logged by the factories when USE_AUDIT_LOG is set
+    before_now = {"end": datetime(2021, 1, 1, tzinfo=timezone.utc)}
+    logs = list(AuditLog.export_events(portfolio_id=portfolio.id, **before_now))
+    assert [log["time_created"] for log in logs] == [
+        times[0].isoformat(),
+        times[1].isoformat(),
+    ]
+    assert logs[0]["user_id"] == str(user.id)
+    assert logs[0]["resource_id"] == str(portfolio.id)
+    assert logs[1]["user_id"] is None
+
+    in_range = AuditLog.export_events(start=times[1], end=times[2])
+    assert [log["time_created"] for log in in_range] == [times[1].isoformat()]
+    (log,) = AuditLog.export_events(user_id=user.id, end=times[1])
+    assert log["time_created"] == times[0].isoformat()
@@ -0,0 +1,96 @@
+import gzip
+import json
+from datetime import date, datetime, timezone
+from uuid import uuid4
+
+import pytest
+
+from atst.domain.audit_log import AuditLog
+from atst.domain.audit_partitions import AuditEventPartitions
+from atst.models import AuditEvent
+
+
+@pytest.fixture
+def today(monkeypatch):
+    def _today(day):
+        monkeypatch.setattr("atst.domain.audit_partitions.Clock.today", lambda: day)
+
+    return _today
+
+
+def create_event(session, time_created):
+    event = AuditEvent(
+        resource_type="user",
+        resource_id=uuid4(),
+        action="create",
+        time_created=time_created,
+    )
+    session.add(event)
+    session.commit()
+    return event
+
+
+def partition_of(session, event):
+    return session.execute(
+        "SELECT tableoid::regclass::text FROM audit_events WHERE id = :id",
+        {"id": event.id},
+    ).scalar()
+
+
+def test_create_partitions(session, today):
+    event = create_event(session, datetime(2031, 6, 10, tzinfo=timezone.utc))
+    assert partition_of(session, event) == "audit_events_default"
+
+    today(date(2031, 5, 15))
+    assert AuditEventPartitions.create() == [
+        "audit_events_p2031_05",
+        "audit_events_p2031_06",
+        "audit_events_p2031_07",
+        "audit_events_p2031_08",
+    ]
+    assert AuditEventPartitions.create() == []
+
+    assert partition_of(session, event) == "audit_events_p2031_06"
+    assert AuditLog.get_by_resource(event.resource_id) == [event]
+
+
+def test_archive_partitions(session, today, tmpdir):
+    today(date(2031, 5, 15))
+    AuditEventPartitions.create()
+    old_event = create_event(session, datetime(2031, 5, 31, tzinfo=timezone.utc))
+    new_event = create_event(session, datetime(2031, 6, 1, tzinfo=timezone.utc))
+    old_event_id, old_resource_id = old_event.id, old_event.resource_id
+
+    today(date(2031, 9, 1))
+    archives = AuditEventPartitions.archive(str(tmpdir), retention_months=3)
+
+    assert str(tmpdir.join("audit_events_p2031_05.jsonl.gz")) in archives
+    assert "audit_events_p2031_05" not in AuditEventPartitions.attached()
+    assert "audit_events_p2031_06" in AuditEventPartitions.attached()
+    assert AuditEventPartitions.detached() == []
+
+    with gzip.open(str(tmpdir.join("audit_events_p2031_05.jsonl.gz")), "rt") as archive:
+        (row,) = [json.loads(line) for line in archive]
+    assert row["id"] == str(old_event_id)
+    assert row["resource_id"] == str(old_resource_id)
+    assert row["action"] == "create"
+
+    assert AuditLog.get_by_resource(old_resource_id) == []
+    assert AuditLog.get_by_resource(new_event.resource_id) == [new_event]
+
+
+def test_archive_exports_partitions_left_detached(session, today, tmpdir):
+    today(date(2031, 5, 15))
+    AuditEventPartitions.create()
+    event_id = create_event(session, datetime(2031, 7, 4, tzinfo=timezone.utc)).id
+    session.execute("ALTER TABLE audit_events DETACH PARTITION audit_events_p2031_07")
+    assert AuditEventPartitions.detached() == ["audit_events_p2031_07"]
+
+    archives = AuditEventPartitions.archive(str(tmpdir), retention_months=3)
+
+    path = str(tmpdir.join("audit_events_p2031_07.jsonl.gz"))
+    assert path in archives
+    assert "audit_events_p2031_06" in AuditEventPartitions.attached()
+    assert AuditEventPartitions.detached() == []
+    with gzip.open(path, "rt") as archive:
+        assert [json.loads(line)["id"] for line in archive] == [str(event_id)]
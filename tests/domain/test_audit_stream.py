@@ -0,0 +1,173 @@
+import pytest
+from redis import Redis
+from redis.exceptions import ConnectionError
+
+from atst.domain.audit_log import AuditLog
+from atst.domain.users import Users
+from atst.models import AuditEventOutbox
+
+from tests.factories import UserFactory
+
+
+def display_names(resource_id):
+    return [event.display_name for event in AuditLog.get_by_resource(resource_id)]
+
+
+def test_events_are_published_when_their_transaction_commits(audit_stream, session):
+    user = UserFactory.build()
+    session.add(user)
+    session.flush()
+    assert session.query(AuditEventOutbox).count() == 1
+    assert audit_stream.redis.xlen(audit_stream.key) == 0
+
+    session.commit()
+    assert audit_stream.redis.xlen(audit_stream.key) == 1
+    # the outbox row is deleted by the worker that saves the event
+    assert session.query(AuditEventOutbox).count() == 1
+    assert AuditLog.get_by_resource(user.id) == []
+
+    assert audit_stream.load("worker") == 1
+    (event,) = AuditLog.get_by_resource(user.id)
+    assert event.action == "create"
+    assert event.resource_type == "user"
+    assert event.display_name == user.full_name
+    assert audit_stream.redis.xlen(audit_stream.key) == 0
+    assert session.query(AuditEventOutbox).count() == 0
+
+
+def test_events_keep_their_order_when_a_worker_crashes(audit_stream, session):
+    user = UserFactory.create(first_name="Anakin", last_name="Skywalker")
+    for name in ["Luke", "Leia", "Ben"]:
+        Users.update(user, {"first_name": name})
+
+    # the first two events are delivered to a worker that never saves them
+    audit_stream.create_group()
+    crashed = audit_stream._read("crashed-worker")
+    assert len(crashed) == 2
+
+    audit_stream.claim_idle_ms = 60 * 1000
+    assert audit_stream.load("worker") == 2
+    assert display_names(user.id) == ["Ben Skywalker", "Leia Skywalker"]
+
+    audit_stream.claim_idle_ms = 0
+    assert audit_stream.load("worker") == 2
+    assert display_names(user.id) == [
+        "Ben Skywalker",
+        "Leia Skywalker",
+        "Luke Skywalker",
+        "Anakin Skywalker",
+    ]
+    assert audit_stream.lag()["pending"] == 0
+
+
+def test_events_are_saved_once_when_a_worker_crashes_before_acknowledging(
+    audit_stream, session, monkeypatch
+):
+    user = UserFactory.create()
+
+    def _crash(entry_ids):
+        raise ConnectionError()
+
+    with monkeypatch.context() as m:
+        m.setattr(audit_stream, "_acknowledge", _crash)
+        with pytest.raises(ConnectionError):
+            audit_stream.load("crashed-worker")
+
+    assert len(AuditLog.get_by_resource(user.id)) == 1
+    assert audit_stream.lag()["pending"] == 1
+
+    audit_stream.claim_idle_ms = 0
+    audit_stream.load("worker")
+    assert len(AuditLog.get_by_resource(user.id)) == 1
+    assert audit_stream.lag()["pending"] == 0
+
+
+def test_events_are_saved_to_the_outbox_when_redis_is_unavailable(
+    audit_stream, session
+):
+    redis = audit_stream.redis
+    audit_stream.redis = Redis(port=1)
+    user = UserFactory.create()
+    audit_stream.redis = redis
+
+    assert session.query(AuditEventOutbox).count() == 1
+    assert audit_stream.lag()["outbox_length"] == 1
+    assert audit_stream.load("worker") == 0
+
+    audit_stream.claim_idle_ms = 0
+    assert audit_stream.load("worker") == 1
+    (event,) = AuditLog.get_by_resource(user.id)
+    assert event.action == "create"
+    assert event.stream_id.startswith("outbox:")
+    assert session.query(AuditEventOutbox).count() == 0
+
+
+def test_events_are_discarded_when_their_transaction_rolls_back(audit_stream, session):
+    session.add(UserFactory.build())
+    session.flush()
+    session.rollback()
+
+    assert session.query(AuditEventOutbox).count() == 0
+    assert audit_stream.redis.xlen(audit_stream.key) == 0
+
+
+def test_events_are_kept_when_the_process_dies_before_publishing_them(
+    audit_stream, session, monkeypatch
+):
+    with monkeypatch.context() as m:
+        m.setattr(audit_stream, "publish", lambda outbox_rows: None)
+        user = UserFactory.create()
+
+    assert audit_stream.redis.xlen(audit_stream.key) == 0
+    audit_stream.claim_idle_ms = 0
+    assert audit_stream.load("worker") == 1
+    (event,) = AuditLog.get_by_resource(user.id)
+    assert event.action == "create"
+
+
+def test_events_are_saved_once_when_loaded_from_the_stream_and_the_outbox(
+    audit_stream, session
+):
+    user = UserFactory.create()
+    assert audit_stream.redis.xlen(audit_stream.key) == 1
+    assert session.query(AuditEventOutbox).count() == 1
+
+    audit_stream.claim_idle_ms = 0
+    assert audit_stream._load_outbox() == 1
+    audit_stream.load("worker")
+    assert len(AuditLog.get_by_resource(user.id)) == 1
+    assert session.query(AuditEventOutbox).count() == 0
+    assert audit_stream.redis.xlen(audit_stream.key) == 0
+
+
+def test_lag(audit_stream, session):
+    UserFactory.create()
+    UserFactory.create()
+
+    lag = audit_stream.lag()
+    assert lag["stream_length"] == 2
+    assert lag["pending"] == 0
+    assert lag["oldest_age_seconds"] >= 0
+    assert lag["outbox_length"] == 2
+
+    audit_stream.create_group()
+    audit_stream._read("worker")
+    assert audit_stream.lag()["pending"] == 2
+
+    audit_stream.claim_idle_ms = 0
+    audit_stream.load("worker")
+    assert audit_stream.lag() == {
+        "stream_length": 0,
+        "pending": 0,
+        "oldest_age_seconds": 0,
+        "outbox_length": 0,
+        "outbox_oldest_age_seconds": 0,
+    }
+
+
+def test_events_are_saved_synchronously_by_default(app, session, monkeypatch):
+    monkeypatch.setitem(app.config, "USE_AUDIT_LOG", True)
+    user = UserFactory.create()
+
+    (event,) = AuditLog.get_by_resource(user.id)
+    assert event.stream_id is None
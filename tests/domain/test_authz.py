@@ -1,6 +1,7 @@
 import pytest
 
 from tests.factories import (
+    ApplicationFactory,
     ApplicationRoleFactory,
     TaskOrderFactory,
     UserFactory,
@@ -8,9 +9,11 @@ from tests.factories import (
     PortfolioRoleFactory,
 )
 from atst.domain.authz import Authorization, user_can_access
+from atst.domain.authz.principal import Principal, clear_principals
 from atst.domain.authz.decorator import user_can_access_decorator
 from atst.domain.permission_sets import PermissionSets
 from atst.domain.exceptions import UnauthorizedError
+from atst.models.application_role import Status as ApplicationRoleStatus
 from atst.models.permissions import Permissions
 from atst.domain.portfolio_roles import PortfolioRoles
 
@@ -100,6 +103,81 @@ def test_user_can_access():
         )
 
 
+def test_principal_is_loaded_once_per_request(request_ctx, monkeypatch):
+    portfolio = PortfolioFactory.create()
+    app_role = ApplicationRoleFactory.create(application__portfolio=portfolio)
+    user = app_role.user
+
+    loads = []
+    load = Principal.load.__func__
+
+    def _load(cls, user):
+        loads.append(user.id)
+        return load(cls, user)
+
+    monkeypatch.setattr(Principal, "load", classmethod(_load))
+
+    assert Authorization.has_application_permission(
+        user, app_role.application, Permissions.VIEW_APPLICATION
+    )
+    assert not Authorization.has_portfolio_permission(
+        user, portfolio, Permissions.VIEW_PORTFOLIO
+    )
+    assert not Authorization.has_atat_permission(user, Permissions.VIEW_AUDIT_LOG)
+    assert loads == [user.id]
+
+    clear_principals()
+    assert Authorization.has_application_permission(
+        user, app_role.application, Permissions.VIEW_APPLICATION
+    )
+    assert loads == [user.id, user.id]
+
+
+def test_principal_is_invalidated_when_roles_change(request_ctx):
+    portfolio = PortfolioFactory.create()
+    user = UserFactory.create()
+
+    assert not Authorization.has_portfolio_permission(
+        user, portfolio, Permissions.VIEW_PORTFOLIO
+    )
+
+    PortfolioRoleFactory.create(user=user, portfolio=portfolio)
+    assert Authorization.has_portfolio_permission(
+        user, portfolio, Permissions.VIEW_PORTFOLIO
+    )
+
+
+def test_allowed_application_ids():
+    portfolio = PortfolioFactory.create()
+    applications = [ApplicationFactory.create(portfolio=portfolio) for _ in range(3)]
+    other_application = ApplicationFactory.create()
+    application_ids = [app.id for app in applications] + [other_application.id]
+
+    assert Authorization.allowed_application_ids(
+        portfolio.owner, Permissions.VIEW_APPLICATION, application_ids
+    ) == {app.id for app in applications}
+
+    user = UserFactory.create()
+    ApplicationRoleFactory.create(
+        user=user, application=applications[0], status=ApplicationRoleStatus.ACTIVE
+    )
+    ApplicationRoleFactory.create(
+        user=user, application=applications[1], status=ApplicationRoleStatus.PENDING
+    )
+    assert Authorization.allowed_application_ids(
+        user, Permissions.VIEW_APPLICATION, application_ids
+    ) == {applications[0].id, applications[1].id}
+    assert Authorization.allowed_application_ids(
+        user, Permissions.VIEW_APPLICATION, application_ids, active_only=True
+    ) == {applications[0].id}
+    assert (
+        Authorization.allowed_application_ids(
+            user, Permissions.DELETE_APPLICATION, application_ids
+        )
+        == set()
+    )
+
+
 @pytest.fixture
 def set_current_user(request_ctx):
     def _set_current_user(user):
@@ -1,6 +1,10 @@
 import pytest
+from redis import Redis
+from sqlalchemy import event
+
 from atst.domain.permission_sets import PermissionSets
 from atst.domain.exceptions import NotFoundError
+from atst.models.permissions import permissions_mask
 from atst.utils import first_or_none
 
 
@@ -35,3 +39,144 @@ def test_get_many():
 def test_get_many_nonexistent():
     with pytest.raises(NotFoundError):
         PermissionSets.get_many(["nonexistent", "not real"])
+
+
+def test_permission_sets_have_masks():
+    for permission_set in PermissionSets.get_all():
+        assert permission_set.permissions_mask == permissions_mask(
+            permission_set.permissions
+        )
+
+
+def test_permission_sets_are_cached(session):
+    PermissionSets.get_all()
+
+    statements = []
+
+    def _count(*args):
+        statements.append(args)
+
+    event.listen(session.bind, "before_cursor_execute", _count)
+    try:
+        permission_set = PermissionSets.get(PermissionSets.PORTFOLIO_POC)
+        PermissionSets.get_many(
+            [PermissionSets.VIEW_PORTFOLIO, PermissionSets.VIEW_AUDIT_LOG]
+        )
+        PermissionSets.get_all()
+    finally:
+        event.remove(session.bind, "before_cursor_execute", _count)
+
+    assert statements == []
+    assert permission_set in session
+    assert permission_set not in session.dirty
+
+
+def test_permission_set_cache_is_cleared_on_change(session):
+    permission_set = PermissionSets.get(PermissionSets.VIEW_AUDIT_LOG)
+    display_name = permission_set.display_name
+    permission_set.display_name = "Audit Log Viewer"
+    session.flush()
+
+    assert PermissionSets.get(PermissionSets.VIEW_AUDIT_LOG).display_name == (
+        "Audit Log Viewer"
+    )
+
+    permission_set.display_name = display_name
+    session.flush()
+    assert PermissionSets.get(PermissionSets.VIEW_AUDIT_LOG).display_name == (
+        display_name
+    )
+
+
+def rename_audit_log_viewer(session, display_name):
+    # bypasses the ORM, as another worker's change would
+    session.execute(
+        "UPDATE permission_sets SET display_name = :display_name WHERE name = :name",
+        {"display_name": display_name, "name": PermissionSets.VIEW_AUDIT_LOG},
+    )
+
+
+def test_permission_set_cache_is_cleared_in_every_worker(app, session, monkeypatch):
+    display_name = PermissionSets.get(PermissionSets.VIEW_AUDIT_LOG).display_name
+    session.expunge_all()
+    rename_audit_log_viewer(session, "Audit Log Viewer")
+    # another worker clearing its cache, as script/seed_roles.py does
+    app.redis.incr(PermissionSets.CACHE_VERSION_KEY)
+
+    # the version is only checked once the interval has passed
+    assert PermissionSets.get(PermissionSets.VIEW_AUDIT_LOG).display_name == (
+        display_name
+    )
+
+    monkeypatch.setattr(PermissionSets, "VERSION_CHECK_INTERVAL", 0)
+    session.expunge_all()
+    assert PermissionSets.get(PermissionSets.VIEW_AUDIT_LOG).display_name == (
+        "Audit Log Viewer"
+    )
+
+    PermissionSets.clear_cache()
+
+
+def test_permission_set_cache_version_is_checked_once_per_interval(
+    app, session, monkeypatch
+):
+    PermissionSets.clear_cache()
+    PermissionSets.get_all()
+
+    gets = []
+    real_get = app.redis.get
+
+    def _get(key):
+        gets.append(key)
+        return real_get(key)
+
+    monkeypatch.setattr(app.redis, "get", _get)
+    PermissionSets.get(PermissionSets.PORTFOLIO_POC)
+    PermissionSets.get_all()
+    assert gets == []
+
+    monkeypatch.setattr(PermissionSets, "VERSION_CHECK_INTERVAL", 0)
+    PermissionSets.get(PermissionSets.PORTFOLIO_POC)
+    assert gets == [PermissionSets.CACHE_VERSION_KEY]
+
+
+def test_committed_changes_clear_the_cache_in_every_worker(app, session):
+    version = app.redis.get(PermissionSets.CACHE_VERSION_KEY)
+    permission_set = PermissionSets.get(PermissionSets.VIEW_AUDIT_LOG)
+    permission_set.display_name = "Audit Log Viewer"
+    session.flush()
+    assert app.redis.get(PermissionSets.CACHE_VERSION_KEY) == version
+
+    session.commit()
+    assert app.redis.get(PermissionSets.CACHE_VERSION_KEY) != version
+
+    PermissionSets.clear_cache()
+
+
+def test_permission_set_cache_is_kept_when_redis_is_unavailable(
+    app, session, monkeypatch
+):
+    display_name = PermissionSets.get(PermissionSets.VIEW_AUDIT_LOG).display_name
+    monkeypatch.setattr(app, "redis", Redis(port=1))
+    monkeypatch.setattr(PermissionSets, "VERSION_CHECK_INTERVAL", 0)
+    rename_audit_log_viewer(session, "Audit Log Viewer")
+    session.expunge_all()
+
+    assert PermissionSets.get(PermissionSets.VIEW_AUDIT_LOG).display_name == (
+        display_name
+    )
+
+    PermissionSets._drop_local_cache()
+    session.expunge_all()
+    assert PermissionSets.get(PermissionSets.VIEW_AUDIT_LOG).display_name == (
+        "Audit Log Viewer"
+    )
+
+    PermissionSets.clear_cache()
+
+
+def test_get_many_with_duplicate_names():
+    with pytest.raises(NotFoundError):
+        PermissionSets.get_many(
+            [PermissionSets.VIEW_PORTFOLIO, PermissionSets.VIEW_PORTFOLIO]
+        )
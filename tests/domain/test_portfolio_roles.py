@@ -69,3 +69,22 @@ def test_make_ppoc():
             portfolio_id=portfolio.id, user_id=original_owner.id
         ).permissions
     )
+
+
+def test_users_with_permission():
+    portfolio = PortfolioFactory.create()
+    viewer = PortfolioRoleFactory.create(portfolio=portfolio).user
+    disabled = PortfolioRoleFactory.create(
+        portfolio=portfolio, status=PortfolioRoleStatus.DISABLED
+    ).user
+    PortfolioRoleFactory.create()
+
+    assert set(
+        PortfolioRoles.users_with_permission(portfolio.id, Permissions.VIEW_PORTFOLIO)
+    ) == {portfolio.owner, viewer}
+    assert disabled not in PortfolioRoles.users_with_permission(
+        portfolio.id, Permissions.VIEW_PORTFOLIO
+    )
+    assert PortfolioRoles.users_with_permission(
+        portfolio.id, Permissions.EDIT_PORTFOLIO_POC
+    ) == [portfolio.owner]
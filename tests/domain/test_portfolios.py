@@ -1,6 +1,7 @@
 import pytest
 from uuid import uuid4
 
+from atst.domain.authz import Authorization
 from atst.domain.exceptions import NotFoundError, UnauthorizedError
 from atst.domain.portfolios import (
     Portfolios,
@@ -131,6 +132,32 @@ def test_scoped_portfolio_returns_all_applications_for_portfolio_owner(
     assert len(scoped_portfolio.applications[0].environments) == 3
 
 
+def test_scoped_portfolio_applications_are_computed_once_per_request(
+    request_ctx, monkeypatch, portfolio, portfolio_owner
+):
+    ApplicationFactory.create(portfolio=portfolio)
+    checks = []
+    has_portfolio_permission = Authorization.has_portfolio_permission
+
+    def _has_portfolio_permission(*args):
+        checks.append(args)
+        return has_portfolio_permission(*args)
+
+    monkeypatch.setattr(
+        Authorization, "has_portfolio_permission", _has_portfolio_permission
+    )
+
+    scoped_portfolio = Portfolios.get(portfolio_owner, portfolio.id)
+    assert Portfolios.get(portfolio_owner, portfolio.id) is scoped_portfolio
+    assert len(scoped_portfolio.applications) == 1
+    assert len(scoped_portfolio.applications) == 1
+    assert len(checks) == 1
+
+    ApplicationFactory.create(portfolio=portfolio)
+    assert len(scoped_portfolio.applications) == 2
+    assert len(checks) == 2
+
+
 def test_for_user_returns_portfolios_for_applications_user_invited_to():
     bob = UserFactory.create()
     portfolio = PortfolioFactory.create()
@@ -171,6 +198,26 @@ def test_for_user_returns_all_portfolios_for_ccpo(portfolio, portfolio_owner):
     assert len(sams_portfolios) == 2
 
 
+def test_names_for_user():
+    bob = UserFactory.create()
+    portfolio = PortfolioFactory.create(name="B Portfolio")
+    other_portfolio = PortfolioFactory.create(name="A Portfolio")
+    PortfolioRoleFactory.create(
+        user=bob, portfolio=portfolio, status=PortfolioRoleStatus.ACTIVE
+    )
+    ApplicationRoleFactory.create(
+        application=ApplicationFactory.create(portfolio=other_portfolio),
+        user=bob,
+        status=ApplicationRoleStatus.ACTIVE,
+    )
+    PortfolioFactory.create()
+
+    assert Portfolios.names_for_user(bob) == [
+        (other_portfolio.id, other_portfolio.name),
+        (portfolio.id, portfolio.name),
+    ]
+
+
 def test_can_create_portfolios_with_matching_names():
     portfolio_name = "Great Portfolio"
     PortfolioFactory.create(name=portfolio_name)
@@ -0,0 +1,104 @@
+import pytest
+from redis.exceptions import ConnectionError
+
+from atst.domain.portfolios import Portfolios
+from atst.domain.portfolios.sidebar import LazyList, SidebarPortfolios
+from atst.domain.portfolio_roles import PortfolioRoles
+from atst.models.portfolio_role import Status as PortfolioRoleStatus
+from atst.utils.ttl_cache import TTLCache
+
+from tests.factories import PortfolioFactory, PortfolioRoleFactory, UserFactory
+
+
+@pytest.fixture
+def sidebar_portfolios(app, monkeypatch):
+    cache = TTLCache(60, redis=app.redis, key_prefix="test-sidebar-portfolios")
+    sidebar_portfolios = SidebarPortfolios(cache, redis=app.redis)
+    monkeypatch.setattr(app, "sidebar_portfolios", sidebar_portfolios)
+
+    yield sidebar_portfolios
+
+    for key in app.redis.scan_iter("test-sidebar-portfolios:*"):
+        app.redis.delete(key)
+
+
+@pytest.fixture
+def count_loads(monkeypatch):
+    loads = []
+    names_for_user = Portfolios.names_for_user
+
+    def _names_for_user(user):
+        loads.append(user)
+        return names_for_user(user)
+
+    monkeypatch.setattr(Portfolios, "names_for_user", _names_for_user)
+    return loads
+
+
+def test_lists_are_cached(sidebar_portfolios, count_loads):
+    portfolio = PortfolioFactory.create()
+
+    assert sidebar_portfolios.for_user(portfolio.owner) == [
+        (str(portfolio.id), portfolio.name)
+    ]
+    assert sidebar_portfolios.for_user(portfolio.owner)[0].name == portfolio.name
+    assert len(count_loads) == 1
+
+
+def test_role_changes_invalidate_the_users_list(sidebar_portfolios, count_loads):
+    portfolio = PortfolioFactory.create()
+    other_portfolio = PortfolioFactory.create()
+    user = UserFactory.create()
+    portfolio_role = PortfolioRoleFactory.create(
+        user=user, portfolio=portfolio, status=PortfolioRoleStatus.ACTIVE
+    )
+
+    assert sidebar_portfolios.for_user(user) == [(str(portfolio.id), portfolio.name)]
+    sidebar_portfolios.for_user(other_portfolio.owner)
+
+    PortfolioRoles.disable(portfolio_role)
+
+    assert sidebar_portfolios.for_user(user) == []
+    sidebar_portfolios.for_user(other_portfolio.owner)
+    assert count_loads == [user, other_portfolio.owner, user]
+
+
+def test_portfolio_changes_invalidate_all_lists(
+    sidebar_portfolios, count_loads, session
+):
+    portfolio = PortfolioFactory.create()
+    sidebar_portfolios.for_user(portfolio.owner)
+
+    portfolio.name = "Renamed"
+    session.commit()
+
+    assert sidebar_portfolios.for_user(portfolio.owner)[0].name == "Renamed"
+    assert len(count_loads) == 2
+
+
+def test_lists_are_not_cached_without_redis(
+    sidebar_portfolios, count_loads, monkeypatch
+):
+    portfolio = PortfolioFactory.create()
+
+    def _raise(*args, **kwargs):
+        raise ConnectionError()
+
+    monkeypatch.setattr(sidebar_portfolios.redis, "mget", _raise)
+
+    assert sidebar_portfolios.for_user(portfolio.owner)
+    assert sidebar_portfolios.for_user(portfolio.owner)
+    assert len(count_loads) == 2
+
+
+def test_lazy_list_is_only_loaded_when_used():
+    loads = []
+
+    def _load():
+        loads.append(True)
+        return ["a", "b"]
+
+    lazy = LazyList(_load)
+    assert loads == []
+    assert lazy and len(lazy) == 2 and list(lazy) == ["a", "b"] and lazy[0] == "a"
+    assert loads == [True]
@@ -1,5 +1,17 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
 from atst.database import db
-from tests.factories import UserFactory
+from tests.factories import (
+    ApplicationFactory,
+    ApplicationRoleFactory,
+    EnvironmentFactory,
+    EnvironmentRoleFactory,
+    UserFactory,
+)
+from atst.domain.audit_log import AuditLog
+from atst.models import CSPRole, EnvironmentRole
 from atst.models.mixins.auditable import AuditableMixin
 from atst.domain.users import Users
 
@@ -51,3 +63,69 @@ def test_logging_audit_event_on_update(mock_logger):
     assert event_log["action"] == "update"
 
     assert "update" in mock_logger.extras[1]["tags"]
+
+
+@pytest.fixture
+def statements():
+    executed = []
+
+    def _before_cursor_execute(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    yield executed
+    event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+
+
+def test_audit_events_are_saved_with_one_insert_per_flush(
+    app, session, monkeypatch, statements
+):
+    monkeypatch.setitem(app.config, "USE_AUDIT_LOG", True)
+
+    users = [UserFactory.build() for _ in range(3)]
+    session.add_all(users)
+    session.commit()
+
+    inserts = [s for s in statements if s.startswith("INSERT INTO audit_events")]
+    assert len(inserts) == 1
+    for user in users:
+        assert [event.action for event in AuditLog.get_by_resource(user.id)] == [
+            "create"
+        ]
+
+
+def test_audit_event_context_is_loaded_in_batches(mock_logger, session, statements):
+    application = ApplicationFactory.create()
+    environment_role_ids = [
+        EnvironmentRoleFactory.create(
+            environment=EnvironmentFactory.create(application=application),
+            application_role=ApplicationRoleFactory.create(application=application),
+            role=CSPRole.BASIC_ACCESS.value,
+        ).id
+        for _ in range(3)
+    ]
+    portfolio_name = application.portfolio.name
+    session.expunge_all()
+    environment_roles = [
+        session.query(EnvironmentRole).get(id_) for id_ in environment_role_ids
+    ]
+    mock_logger.messages.clear()
+    mock_logger.extras.clear()
+    statements.clear()
+
+    for environment_role in environment_roles:
+        environment_role.role = CSPRole.TECHNICAL_READ.value
+    session.commit()
+
+    selects = [s for s in statements if s.startswith("SELECT")]
+    assert len(selects) == 2
+    assert mock_logger.messages == ["Audit Event update"] * 3
+    details = {
+        extra["audit_event"]["resource_id"]: extra["audit_event"]["event_details"]
+        for extra in mock_logger.extras
+    }
+    for environment_role in environment_roles:
+        event_details = details[str(environment_role.id)]
+        assert environment_role.environment.name in event_details
+        assert portfolio_name in event_details
+        assert environment_role.application_role.user_name in event_details
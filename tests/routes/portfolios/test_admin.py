@@ -1,6 +1,10 @@
+import html
+import re
+
 from flask import url_for
 from unittest.mock import MagicMock
 
+from atst.domain.audit_log import AuditLog
 from atst.domain.permission_sets import PermissionSets
 from atst.domain.portfolio_roles import PortfolioRoles
 from atst.domain.portfolios import Portfolios
@@ -385,3 +389,47 @@ def test_remove_portfolio_member_ppoc(client, user_session):
         PortfolioRoles.get(portfolio_id=portfolio.id, user_id=portfolio.owner.id).status
         == PortfolioRoleStatus.ACTIVE
     )
+
+
+def test_activity_history_pages_link_with_cursors(
+    app, client, user_session, monkeypatch
+):
+    monkeypatch.setitem(app.config, "USE_AUDIT_LOG", True)
+    portfolio = PortfolioFactory.create()
+    for _ in range(5):
+        AuditLog.log_system_event(
+            resource=portfolio, action="create", portfolio=portfolio
+        )
+    user_session(portfolio.owner)
+
+    url = url_for("portfolios.admin", portfolio_id=portfolio.id, perPage=2)
+    response = client.get(url)
+    next_url = re.search(r'id="next"[^>]*href="([^"]+)"', response.data.decode())
+    assert "cursor=" in next_url.group(1)
+
+    # the page size isn't carried over by the pagination links
+    response = client.get(html.unescape(next_url.group(1)) + "&perPage=2")
+    assert response.status_code == 200
+    assert 'id="2" type="button" class="page usa-button usa-button-primary"' in (
+        response.data.decode()
+    )
+
+
+def test_activity_history_has_no_last_page_for_large_results(
+    app, client, user_session, monkeypatch
+):
+    monkeypatch.setitem(app.config, "USE_AUDIT_LOG", True)
+    monkeypatch.setattr("atst.domain.common.query.EXACT_COUNT_LIMIT", 3)
+    portfolio = PortfolioFactory.create()
+    for _ in range(5):
+        AuditLog.log_system_event(
+            resource=portfolio, action="create", portfolio=portfolio
+        )
+    user_session(portfolio.owner)
+
+    response = client.get(
+        url_for("portfolios.admin", portfolio_id=portfolio.id, perPage=2)
+    )
+    body = response.data.decode()
+    assert 'id="last"' not in body
+    assert "cursor=" in re.search(r'id="next"[^>]*href="([^"]+)"', body).group(1)
@@ -86,6 +86,20 @@ def test_portfolio_reports_with_mock_portfolio(client, user_session):
     assert portfolio.name in response.data.decode()
 
 
+def test_portfolio_reports_is_not_modified(client, user_session):
+    portfolio = PortfolioFactory.create(
+        applications=[{"name": "application1", "environments": [{"name": "prod"}]}]
+    )
+    user_session(portfolio.owner)
+    url = url_for("portfolios.reports", portfolio_id=portfolio.id)
+
+    etag = client.get(url).headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    ApplicationFactory.create(portfolio=portfolio)
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+
 def test_delete_portfolio_success(client, user_session):
     portfolio = PortfolioFactory.create()
     owner = portfolio.owner
@@ -54,3 +54,55 @@ def test_review_task_order_draft(client, user_session, task_order):
     )
     assert response.status_code == 302
     assert url_for("task_orders.edit", task_order_id=task_order.id) in response.location
+
+
+def test_portfolio_funding_is_not_modified(client, user_session, task_order):
+    portfolio = task_order.portfolio
+    user_session(portfolio.owner)
+    url = url_for("task_orders.portfolio_funding", portfolio_id=portfolio.id)
+
+    response = client.get(url)
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+    assert "private" in response.headers["Cache-Control"]
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+    CLINFactory.create(task_order=task_order)
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_portfolio_funding_etag_depends_on_user(client, user_session, task_order):
+    portfolio = task_order.portfolio
+    user = UserFactory.create()
+    PortfolioRoleFactory.create(
+        portfolio=portfolio,
+        user=user,
+        status=PortfolioStatus.ACTIVE,
+        permission_sets=PermissionSets.get_many(
+            [PermissionSets.VIEW_PORTFOLIO, PermissionSets.VIEW_PORTFOLIO_FUNDING]
+        ),
+    )
+    url = url_for("task_orders.portfolio_funding", portfolio_id=portfolio.id)
+
+    user_session(portfolio.owner)
+    etag = client.get(url).headers["ETag"]
+
+    user_session(user)
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_review_task_order_is_not_modified(client, user_session, task_order):
+    TaskOrders.sign(task_order=task_order, signer_dod_id=random_dod_id())
+    user_session(task_order.portfolio.owner)
+    url = url_for("task_orders.review_task_order", task_order_id=task_order.id)
+
+    etag = client.get(url).headers["ETag"]
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
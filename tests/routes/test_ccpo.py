@@ -1,9 +1,16 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+import pytest
 from flask import url_for
 
 from atst.domain.users import Users
+from atst.models import AuditEvent
 from atst.utils.localization import translate
 
-from tests.factories import UserFactory
+from tests.factories import PortfolioFactory, UserFactory
 
 
 def test_ccpo_users(user_session, client):
@@ -62,3 +69,70 @@ def test_remove_access(user_session, client):
 
     response = client.post(url_for("ccpo.remove_access", user_id=user.id))
     assert user not in Users.get_ccpo_users()
+
+
+@pytest.fixture
+def export_events(app, session, monkeypatch):
+    monkeypatch.setitem(app.config, "USE_AUDIT_LOG", True)
+    portfolio = PortfolioFactory.create()
+    for day, action in [(2, "update"), (1, "create")]:
+        session.add(
+            AuditEvent(
+                portfolio_id=portfolio.id,
+                resource_type="portfolio",
+                resource_id=portfolio.id,
+                action=action,
+                time_created=datetime(2020, 1, day, tzinfo=timezone.utc),
+            )
+        )
+    session.commit()
+
+    return {
+        "portfolio_id": portfolio.id,
+        "start": "2020-01-01",
+        "end": "2020-01-03T00:00:00+00:00",
+    }
+
+
+def test_export_activity_history_as_csv(user_session, client, export_events):
+    user_session(UserFactory.create_ccpo())
+    response = client.get(
+        url_for("ccpo.export_activity_history", **export_events), buffered=True
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert "activity-history.csv" in response.headers["Content-Disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.data.decode())))
+    assert [row["action"] for row in rows] == ["create", "update"]
+    assert rows[0]["portfolio_id"] == str(export_events["portfolio_id"])
+    assert json.loads(rows[0]["changed_state"]) is None
+
+
+def test_export_activity_history_as_jsonl(user_session, client, export_events):
+    user_session(UserFactory.create_ccpo())
+    response = client.get(
+        url_for("ccpo.export_activity_history", format="jsonl", **export_events),
+        buffered=True,
+    )
+
+    assert response.status_code == 200
+    logs = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [log["action"] for log in logs] == ["create", "update"]
+    assert logs[0]["portfolio_id"] == str(export_events["portfolio_id"])
+
+
+def test_export_activity_history_rejects_invalid_filters(
+    user_session, client, export_events
+):
+    user_session(UserFactory.create_ccpo())
+    for args in [{"format": "xml"}, {"portfolio_id": "1"}, {"start": "yesterday"}]:
+        response = client.get(url_for("ccpo.export_activity_history", **args))
+        assert response.status_code == 400
+        assert "Invalid {}".format(next(iter(args))) in response.data.decode()
+
+
+def test_export_activity_history_requires_ccpo(user_session, client, export_events):
+    user_session(UserFactory.create())
+    response = client.get(url_for("ccpo.export_activity_history", **export_events))
+    assert response.status_code == 404
@@ -85,7 +85,8 @@ def test_all_protected_routes_have_access_control(
     user_session(user)
 
     method = "get" if "GET" in rule.methods else "post"
-    getattr(client, method)(route)
+    # reading the whole response ends any stream that holds the request context
+    getattr(client, method)(route).get_data()
 
     assert (
         atst.domain.authz.decorator.check_access.call_count == 1
@@ -119,6 +120,7 @@ def get_url_assert_status(no_debug_client, user_session):
     def _get_url_assert_status(user, url, status):
         user_session(user)
         resp = no_debug_client.get(url)
+        resp.get_data()
         assert resp.status_code == status
 
     return _get_url_assert_status
@@ -145,6 +147,17 @@ def test_atst_activity_history_access(get_url_assert_status):
     get_url_assert_status(rando, url, 404)
 
 
+# ccpo.export_activity_history
+@pytest.mark.audit_log
+def test_atst_export_activity_history_access(get_url_assert_status):
+    ccpo = user_with(PermissionSets.VIEW_AUDIT_LOG)
+    rando = user_with()
+
+    url = url_for("ccpo.export_activity_history")
+    get_url_assert_status(ccpo, url, 200)
+    get_url_assert_status(rando, url, 404)
+
+
 # ccpo.users
 def test_ccpo_users_access(get_url_assert_status):
     ccpo = user_with(PermissionSets.MANAGE_CCPO_USERS)
@@ -15,14 +15,17 @@ from atst.jobs import (
     create_environment,
     dispatch_provision_user,
     do_provision_user,
+    load_audit_events,
 )
 from atst.models.utils import claim_for_update
+from atst.domain.audit_log import AuditLog
 from atst.domain.exceptions import ClaimFailedException
 from tests.factories import (
     EnvironmentFactory,
     EnvironmentRoleFactory,
     PortfolioFactory,
     ApplicationRoleFactory,
+    UserFactory,
 )
 from atst.models import EnvironmentRole, ApplicationRoleStatus
 
@@ -306,3 +309,14 @@ def test_do_provision_user(csp, session):
     )
     # I expect that the EnvironmentRole now has a csp_user_id
     assert environment_role.csp_user_id
+
+
+def test_load_audit_events(audit_stream, session, mock_logger):
+    user = UserFactory.create()
+
+    load_audit_events.run()
+
+    (event,) = AuditLog.get_by_resource(user.id)
+    assert event.action == "create"
+    assert mock_logger.extras[-1]["tags"] == ["audit_stream"]
+    assert mock_logger.extras[-1]["audit_stream"]["stream_length"] == 0
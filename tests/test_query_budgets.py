@@ -0,0 +1,255 @@
+from collections import namedtuple
+from contextlib import contextmanager
+import time
+
+import pytest
+from flask import url_for
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from atst.domain.permission_sets import PermissionSets
+from atst.models import (
+    ApplicationRole,
+    ApplicationRoleStatus,
+    CSPRole,
+    Environment,
+    EnvironmentRole,
+    PortfolioRole,
+    PortfolioRoleStatus,
+    User,
+)
+from atst.utils.sql_instrumentation import QueryStats
+
+from tests.factories import *
+from tests.test_access import sample_app
+
+
+APPLICATIONS = 50
+ENVIRONMENTS_PER_APPLICATION = 5
+MEMBERS = 200
+
+Budget = namedtuple("Budget", ["queries", "db_ms"], defaults=[500])
+
+# The most SQL each page may run against the large portfolio below. Query
+# counts are tight, so one more query per application, environment or
+# member fails; database time is only a backstop for pathological queries.
+QUERY_BUDGETS = {
+    "applications.portfolio_applications": Budget(queries=10),
+    "applications.settings": Budget(queries=19),
+    "applications.view_new_application_step_1": Budget(queries=10),
+    "applications.view_new_application_step_2": Budget(queries=11),
+    "applications.view_new_application_step_3": Budget(queries=17),
+    "atst.about": Budget(queries=3),
+    "atst.helpdocs": Budget(queries=3),
+    "atst.home": Budget(queries=5),
+    "atst.root": Budget(queries=3),
+    # loads the events and their users when USE_AUDIT_LOG is set
+    "ccpo.activity_history": Budget(queries=6),
+    "ccpo.add_new_user": Budget(queries=5),
+    # streams the events with a single query when USE_AUDIT_LOG is set
+    "ccpo.export_activity_history": Budget(queries=6),
+    "ccpo.users": Budget(queries=6),
+    "portfolios.admin": Budget(queries=19),
+    "portfolios.new_portfolio_step_1": Budget(queries=5),
+    "portfolios.reports": Budget(queries=12),
+    "task_orders.edit": Budget(queries=8),
+    "task_orders.form_step_five_confirm_signature": Budget(queries=11),
+    "task_orders.form_step_four_review": Budget(queries=11),
+    "task_orders.form_step_one_add_pdf": Budget(queries=10),
+    "task_orders.form_step_three_add_clins": Budget(queries=10),
+    "task_orders.form_step_two_add_number": Budget(queries=10),
+    "task_orders.portfolio_funding": Budget(queries=10),
+    "task_orders.review_task_order": Budget(queries=10),
+    "users.user": Budget(queries=5),
+}
+
+# The same for a portfolio member who isn't a CCPO user, on the pages they can
+# view, where what they see is worked out from their own roles.
+MEMBER_QUERY_BUDGETS = {
+    "applications.portfolio_applications": Budget(queries=10),
+    "applications.settings": Budget(queries=19),
+    "atst.home": Budget(queries=3),
+    "users.user": Budget(queries=3),
+}
+
+_NO_BUDGET_REQUIRED = [
+    "applications.accept_invitation",  # needs an invitation token
+    "applications.access_environment",  # redirects to the CSP
+    "atst.catch_all",  # redirects to the home page
+    "atst.csp_environment_access",  # internal redirect
+    "atst.jedi_csp_calculator",  # internal redirect
+    "atst.login_redirect",  # needs a login certificate
+    "atst.logout",  # ends the session
+    "dev.dev_new_user",  # dev tool
+    "dev.login_dev",  # dev tool
+    "dev.messages",  # dev tool
+    "dev.test_email",  # dev tool
+    "portfolios.accept_invitation",  # needs an invitation token
+    "static",
+    "task_orders.download_link",  # file storage
+    "task_orders.download_task_order_pdf",  # file storage
+    "task_orders.upload_token",  # file storage
+]
+
+
+def budgeted_routes(app):
+    return [
+        rule
+        for rule in app.url_map.iter_rules()
+        if "GET" in rule.methods and rule.endpoint not in _NO_BUDGET_REQUIRED
+    ]
+
+
+_BUDGETED_ROUTES = budgeted_routes(sample_app)
+
+
+@pytest.mark.parametrize("rule", _BUDGETED_ROUTES, ids=lambda rule: rule.rule)
+def test_all_routes_have_a_query_budget(rule):
+    assert rule.endpoint in QUERY_BUDGETS, "no query budget for {}".format(
+        rule.endpoint
+    )
+
+
+@pytest.fixture
+def large_portfolio(session):
+    """
+    A portfolio with APPLICATIONS applications of ENVIRONMENTS_PER_APPLICATION
+    environments each, and MEMBERS members. Every member has a role in the
+    first application with access to each of its environments, and a role in
+    one other application. The portfolio's owner is a CCPO user; "member" is
+    one of the members, who can only view the portfolio.
+    """
+    owner = UserFactory.create_ccpo()
+    portfolio = PortfolioFactory.create(owner=owner)
+    task_order = TaskOrderFactory.create(portfolio=portfolio)
+    CLINFactory.create(task_order=task_order)
+
+    applications = [
+        ApplicationFactory.build(portfolio=portfolio) for _ in range(APPLICATIONS)
+    ]
+    for application in applications:
+        application.environments = [
+            Environment(name="environment {}".format(i), creator=owner)
+            for i in range(ENVIRONMENTS_PER_APPLICATION)
+        ]
+
+    portfolio_permission_sets = PermissionSets.get_many([PermissionSets.VIEW_PORTFOLIO])
+    application_permission_sets = PermissionSets.get_many(
+        [PermissionSets.VIEW_APPLICATION]
+    )
+    members = [UserFactory.build() for _ in range(MEMBERS)]
+    for i, member in enumerate(members):
+        session.add(
+            PortfolioRole(
+                portfolio=portfolio,
+                user=member,
+                status=PortfolioRoleStatus.ACTIVE,
+                permission_sets=portfolio_permission_sets,
+            )
+        )
+        for application in {applications[0], applications[1 + i % (APPLICATIONS - 1)]}:
+            application_role = ApplicationRole(
+                application=application,
+                user=member,
+                status=ApplicationRoleStatus.ACTIVE,
+                permission_sets=application_permission_sets,
+            )
+            session.add_all(
+                EnvironmentRole(
+                    environment=environment,
+                    application_role=application_role,
+                    role=CSPRole.BASIC_ACCESS.value,
+                )
+                for environment in application.environments
+            )
+
+    session.add_all(applications)
+    session.commit()
+
+    return {
+        "owner": owner,
+        "member": members[0],
+        "portfolio_id": portfolio.id,
+        "application_id": applications[0].id,
+        "environment_id": applications[0].environments[0].id,
+        "task_order_id": task_order.id,
+    }
+
+
+@contextmanager
+def measure_queries():
+    stats = QueryStats()
+    start_times = []
+
+    def _before_cursor_execute(conn, cursor, statement, *args):
+        start_times.append(time.perf_counter())
+
+    def _after_cursor_execute(conn, cursor, statement, *args):
+        stats.record(statement, time.perf_counter() - start_times.pop())
+
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    try:
+        yield stats
+    finally:
+        event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def route_args(rule, resources):
+    args = {}
+    for argument in rule.arguments:
+        if argument == "doc":
+            args[argument] = "getting-started"
+        else:
+            args[argument] = resources[argument]
+
+    return args
+
+
+@pytest.mark.parametrize(
+    "viewer,budgets", [("owner", QUERY_BUDGETS), ("member", MEMBER_QUERY_BUDGETS)],
+)
+def test_routes_stay_within_query_budget(
+    viewer, budgets, large_portfolio, client, session, monkeypatch
+):
+    viewer_id = large_portfolio[viewer].id
+    # load the user the way a real request would, from an empty session
+    monkeypatch.setattr(
+        "atst.domain.auth.get_current_user",
+        lambda *args: session.query(User).get(viewer_id),
+    )
+
+    over_budget = []
+    for rule in _BUDGETED_ROUTES:
+        if rule.endpoint not in budgets:
+            continue
+
+        url = url_for(rule.endpoint, **route_args(rule, large_portfolio))
+        session.expunge_all()
+
+        with measure_queries() as stats:
+            response = client.get(url)
+
+        assert response.status_code < 400, "{} returned {}".format(
+            url, response.status_code
+        )
+
+        budget = budgets[rule.endpoint]
+        if stats.count > budget.queries or stats.duration * 1000 > budget.db_ms:
+            over_budget.append(
+                "{}: {} queries in {:.1f}ms, budget is {} queries in {}ms{}".format(
+                    url,
+                    stats.count,
+                    stats.duration * 1000,
+                    budget.queries,
+                    budget.db_ms,
+                    "".join(
+                        "\n    {} x {}".format(count, statement)
+                        for statement, count in stats.repeated().items()
+                    ),
+                )
+            )
+
+    assert not over_budget, "routes over their query budget:\n" + "\n".join(over_budget)
@@ -1,6 +1,7 @@
 from unittest.mock import Mock
 
 import pytest
+from sqlalchemy import inspect
 
 from atst.domain.permission_sets import PermissionSets
 from atst.models import Permissions
@@ -34,6 +35,36 @@ def test_get_resources_from_context():
     )
 
 
+def test_get_resources_from_context_loads_endpoint_relationships(session):
+    portfolio = PortfolioFactory.create()
+    task_order = TaskOrderFactory.create(portfolio=portfolio)
+    CLINFactory.create(task_order=task_order)
+    application = ApplicationFactory.create(portfolio=portfolio)
+    EnvironmentFactory.create(application=application)
+    ApplicationRoleFactory.create(application=application)
+    session.expire_all()
+
+    (portfolio,) = get_resources_from_context(
+        {"portfolio_id": portfolio.id}, "task_orders.portfolio_funding"
+    )
+    assert "task_orders" not in inspect(portfolio).unloaded
+    assert "clins" not in inspect(portfolio.task_orders[0]).unloaded
+    assert "applications" in inspect(portfolio).unloaded
+
+    session.expire_all()
+    (_, application) = get_resources_from_context(
+        {"application_id": application.id}, "applications.settings"
+    )
+    assert "environments" not in inspect(application).unloaded
+    assert "roles" not in inspect(application.environments[0]).unloaded
+    assert "user" not in inspect(application.roles[0]).unloaded
+    assert "permission_sets" not in inspect(application.roles[0]).unloaded
+
+    session.expire_all()
+    (_, application) = get_resources_from_context({"application_id": application.id})
+    assert "environments" in inspect(application).unloaded
+
+
 @pytest.fixture
 def set_g(monkeypatch):
     _g = Mock()
@@ -0,0 +1,85 @@
+import pytest
+from flask import url_for
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from atst.app import make_app, make_config
+from atst.utils.sql_instrumentation import (
+    QueryStats,
+    _after_cursor_execute,
+    _before_cursor_execute,
+    fingerprint,
+)
+
+from tests.factories import ApplicationFactory, PortfolioFactory
+from tests.utils import FakeLogger
+
+
+@pytest.fixture
+def instrumented_app():
+    config = make_config(
+        direct_config={"SQL_INSTRUMENTATION": True, "SQL_SERVER_TIMING": True}
+    )
+    _app = make_app(config)
+    _app.logger = FakeLogger()
+
+    ctx = _app.app_context()
+    ctx.push()
+
+    yield _app
+
+    ctx.pop()
+    event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def test_fingerprint_ignores_literals_and_parameters():
+    assert fingerprint(
+        "SELECT *\n  FROM users WHERE id = %(id_1)s AND name = 'bob' LIMIT 10"
+    ) == fingerprint("SELECT * FROM users WHERE id = %(id_2)s AND name = 'al' LIMIT 5")
+    assert (
+        fingerprint("SELECT * FROM users WHERE id IN (%(id_1)s, %(id_2)s)")
+        == "SELECT * FROM users WHERE id IN (?)"
+    )
+
+
+def test_query_stats():
+    stats = QueryStats()
+    for i in range(5):
+        stats.record("SELECT * FROM users WHERE id = {}".format(i), 0.001)
+    stats.record("SELECT * FROM portfolios", 0.01)
+
+    summary = stats.to_dictionary()
+    assert summary["count"] == 6
+    assert summary["duration_ms"] == pytest.approx(15)
+    assert summary["slowest"] == "SELECT * FROM portfolios"
+    assert summary["repeated"] == {"SELECT * FROM users WHERE id = ?": 5}
+    assert stats.server_timing() == 'db;dur=15.000;desc="6 queries"'
+
+
+def test_requests_are_instrumented(instrumented_app, session, monkeypatch):
+    portfolio = PortfolioFactory.create()
+    ApplicationFactory.create(portfolio=portfolio)
+    monkeypatch.setattr(
+        "atst.domain.auth.get_current_user", lambda *args: portfolio.owner
+    )
+
+    response = instrumented_app.test_client().get(
+        url_for("applications.portfolio_applications", portfolio_id=portfolio.id)
+    )
+
+    assert response.status_code == 200
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+    (extra,) = [
+        extra for extra in instrumented_app.logger.extras if "sql" in extra.get("tags")
+    ]
+    assert extra["sql"]["count"] > 0
+    assert extra["sql"]["slowest"]
+
+
+def test_instrumentation_is_disabled_by_default(client, user_session):
+    user_session()
+    response = client.get(url_for("atst.home"))
+
+    assert "Server-Timing" not in response.headers
+    assert not event.contains(Engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from atst.utils.ttl_cache import TTLCache
+
+
+@pytest.fixture
+def ttl_cache(app):
+    cache = TTLCache(60, redis=app.redis, key_prefix="test-ttlcache")
+    yield cache
+    for key in app.redis.scan_iter("test-ttlcache:*"):
+        app.redis.delete(key)
+
+
+def test_get_returns_cached_value(ttl_cache):
+    ttl_cache.set("chewbacca", {"dod_id": "1234567890"})
+    assert ttl_cache.get("chewbacca") == {"dod_id": "1234567890"}
+    assert ttl_cache.get("han") is None
+    assert ttl_cache.get("han", False) is False
+
+
+def test_entries_expire():
+    cache = TTLCache(0.01)
+    cache.set("chewbacca", True)
+    assert cache.get("chewbacca")
+    time.sleep(0.02)
+    assert cache.get("chewbacca") is None
+
+
+def test_entries_are_shared_through_redis(app, ttl_cache):
+    ttl_cache.set("chewbacca", True)
+    other_worker = TTLCache(60, redis=app.redis, key_prefix="test-ttlcache")
+
+    assert other_worker.get("chewbacca")
+    assert 0 < app.redis.ttl("test-ttlcache:chewbacca") <= 60
+
+    other_worker.delete("chewbacca")
+    assert (
+        TTLCache(60, redis=app.redis, key_prefix="test-ttlcache").get("chewbacca")
+        is None
+    )
+
+
+def test_redis_errors_are_cache_misses(monkeypatch, app):
+    def fail(*args, **kwargs):
+        raise ConnectionError()
+
+    cache = TTLCache(60, redis=app.redis, key_prefix="test-ttlcache")
+    monkeypatch.setattr(app.redis, "setex", fail)
+    monkeypatch.setattr(app.redis, "pipeline", fail)
+
+    cache.set("chewbacca", True)
+    assert cache.get("chewbacca")
+    assert cache.get("han") is None
+
+
+def test_oldest_entries_are_evicted_when_full():
+    cache = TTLCache(60, max_entries=2)
+    cache.set("chewbacca", 1)
+    cache.set("han", 2)
+    cache.set("leia", 3)
+
+    assert cache.get("chewbacca") is None
+    assert cache.get("han") == 2
+    assert cache.get("leia") == 3